@@ -9,10 +9,11 @@ from urllib.parse import quote
 from flask_cors import CORS, cross_origin
 import jwt
 import database.connect as database
+from database.migrations import migrate, check_schema_version
 from utils.api_response_wrapper import client_error_response
-from config.jwt import jwt_algorithm, jwt_private_key, jwt_public_key
-from config.flask import bind_host, flask_debug, port, flask_use_ssl, flask_key_path, flask_cert_path
-from config.database import database_uri
+from utils.compression import init_compression
+from utils.static_assets import init_static_assets, send_static_asset
+from config.runtime import runtime_config, watch_runtime_config, reload_on_sighup
 from routes.auth import auth_routes
 from routes.users import users_routes
 from routes.courses import courses_routes
@@ -43,9 +44,44 @@ db = client["database"]
 users = db["users"]
 professors = db["professors"]
 
-engine, Session, metadata = database.init_connection(database_uri(), echo=False)
-session = Session()
+# The settings and the JWT keys are read once, the keys are reloaded on SIGHUP
+# or when their files change
+config = runtime_config()
+watch_runtime_config(config.config_reload_interval)
+reload_on_sighup()
 
+# One engine (and connection pool) per worker process, the session
+# of each request is opened lazily and closed on teardown
+engine, _ = database.init_engine(
+    config.database_uri,
+    echo=False,
+    pool_size=config.database_pool_size,
+    max_overflow=config.database_max_overflow,
+    pool_pre_ping=config.database_pool_pre_ping,
+    pool_recycle=config.database_pool_recycle,
+    raiseload=config.database_raiseload,
+    replica_uris=config.database_replica_uris,
+    replica_lag=config.database_replica_lag,
+    sqlite_profile=config.database_sqlite_profile,
+    sqlite_busy_timeout=config.database_sqlite_busy_timeout,
+    membership_cache_size=config.database_membership_cache_size,
+    membership_cache_ttl=config.database_membership_cache_ttl,
+)
+# The schema is bootstrapped by scripts/migrate.py, the workers only
+# check the recorded schema version once when they boot
+if config.database_auto_migrate:
+    migrate(engine)
+check_schema_version(engine)
+database.init_app(app)
+# The JSON responses are compressed when the client accepts it, the assets of
+# the client are served precompressed, with long-lived cache headers
+init_compression(app, min_size=config.compression_min_size, level=config.compression_level)
+init_static_assets(app)
+
+
+# The GET handlers of these blueprints only read, they can use the read replicas
+for blueprint in (users_routes, courses_routes, apps_routes, entries_routes, analytics_routes):
+    database.read_from_replicas(blueprint)
 
 app.register_blueprint(auth_routes, url_prefix=f"{api_prefix}/auth")
 app.register_blueprint(users_routes, url_prefix=f"{api_prefix}/users")
@@ -64,7 +100,7 @@ def not_found(e):
             message="Resource not found",
         )
     elif flask_mode.lower() == "production":
-        return app.send_static_file('index.html')
+        return send_static_asset(app.static_folder, 'index.html')
     else:
         return e
 
@@ -84,12 +120,12 @@ def get_grades(username, course_number):
 
 
 if __name__ == "__main__":
-    if flask_use_ssl():
+    if config.flask_use_ssl:
         app.run(
-            debug=flask_debug(),
-            host=bind_host(),
-            port=port(),
-            ssl_context=(flask_cert_path(), flask_key_path()),
+            debug=config.flask_debug,
+            host=config.flask_host,
+            port=config.flask_port,
+            ssl_context=(config.flask_cert_path, config.flask_key_path),
         )
     else:
-        app.run(debug=flask_debug(), host=bind_host(), port=port())
+        app.run(debug=config.flask_debug, host=config.flask_host, port=config.flask_port)
@@ -5,6 +5,30 @@ of the database.
 Functions:
     database_uri(): This method will read the database URI from the
         `.env` file and return it as a string.
+    database_pool_size(): This method will read the size of the
+        connection pool kept by each worker process.
+    database_max_overflow(): This method will read how many connections
+        can be opened beyond the pool size.
+    database_pool_pre_ping(): This method will read if pooled connections
+        should be checked before being used.
+    database_pool_recycle(): This method will read the lifetime of a
+        pooled connection in seconds.
+    database_auto_migrate(): This method will read if the schema should
+        be migrated when the server starts.
+    database_raiseload(): This method will read if unplanned lazy loads
+        of relationships should raise an error.
+    database_replica_uris(): This method will read the URIs of the read
+        replicas of the database.
+    database_replica_lag(): This method will read how long the reads of a
+        client stay on the primary after it wrote.
+    database_sqlite_profile(): This method will read if the connection
+        profile for SQLite (WAL, pragmas) should be used.
+    database_sqlite_busy_timeout(): This method will read how long a SQLite
+        connection waits for a lock.
+    database_membership_cache_size(): This method will read how many users
+        the membership cache of each worker process keeps.
+    database_membership_cache_ttl(): This method will read how long the
+        membership cache keeps a user.
 
 Author:
     Jiacheng Zhao (John)
@@ -36,3 +60,195 @@ def database_uri() -> str:
     if obtained_database_uri is None:
         raise KeyError("DATABASE_URI not found in the environment.")
     return obtained_database_uri
+
+
+def database_pool_size() -> int:
+    """This method will read the number of connections kept open in the
+    connection pool of each worker process.
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        int: The pool size from the environment, defaults to 5.
+    """
+    return int(os.getenv("DATABASE_POOL_SIZE", "5"))
+
+
+def database_max_overflow() -> int:
+    """This method will read the number of connections that can be opened
+    beyond the pool size when the pool is exhausted.
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        int: The maximum overflow from the environment, defaults to 10.
+    """
+    return int(os.getenv("DATABASE_MAX_OVERFLOW", "10"))
+
+
+def database_pool_pre_ping() -> bool:
+    """This method will read the flag indicating if a pooled connection
+    should be tested for liveness before it is handed out.
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        bool: The pre-ping flag from the environment, defaults to True.
+    """
+    return os.getenv("DATABASE_POOL_PRE_PING", "True").upper() == "TRUE"
+
+
+def database_pool_recycle() -> int:
+    """This method will read the number of seconds after which a pooled
+    connection is replaced, so the database server does not drop it first.
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        int: The recycle time in seconds from the environment, defaults to 1800.
+            A negative value disables recycling.
+    """
+    return int(os.getenv("DATABASE_POOL_RECYCLE", "1800"))
+
+
+def database_auto_migrate() -> bool:
+    """This method will read the flag indicating if the database schema
+    should be bootstrapped or upgraded when the server starts, instead of
+    running `scripts/migrate.py` beforehand.
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        bool: The auto migrate flag from the environment, defaults to False.
+    """
+    return os.getenv("DATABASE_AUTO_MIGRATE", "False").upper() == "TRUE"
+
+
+def database_raiseload() -> bool:
+    """This method will read the flag indicating if a relationship that is
+    lazy loaded without being planned by the query should raise an error.
+    It is meant for tests and development, to catch N+1 query patterns.
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        bool: The raiseload flag from the environment, defaults to False.
+    """
+    return os.getenv("DATABASE_RAISELOAD", "False").upper() == "TRUE"
+
+
+def database_replica_uris() -> list:
+    """This method will read the URIs of the read replicas of the database,
+    given as a comma separated list. The read-only requests are sent to them
+    in turn, the other requests use `DATABASE_URI`.
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        list: The replica URIs from the environment, defaults to an empty list
+            (every request uses the primary database).
+    """
+    replica_uris = os.getenv("DATABASE_REPLICA_URIS", "")
+    return [uri.strip() for uri in replica_uris.split(",") if uri.strip()]
+
+
+def database_replica_lag() -> float:
+    """This method will read the number of seconds during which the reads of a
+    client are still sent to the primary database after the client wrote to it,
+    so the client reads its own writes while the replicas catch up.
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        float: The replica lag in seconds from the environment, defaults to 5.
+    """
+    return float(os.getenv("DATABASE_REPLICA_LAG", "5"))
+
+
+def database_sqlite_profile() -> bool:
+    """This method will read the flag indicating if the connections to a
+    file-based SQLite database should use the profile of
+    `database/sqlite_profile.py` (WAL journaling, busy timeout, memory map,
+    synchronous level and cache size).
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        bool: The SQLite profile flag from the environment, defaults to True.
+    """
+    return os.getenv("DATABASE_SQLITE_PROFILE", "True").upper() == "TRUE"
+
+
+def database_sqlite_busy_timeout() -> int:
+    """This method will read the number of milliseconds a connection to a
+    SQLite database waits for a lock held by another connection before
+    failing with "database is locked".
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        int: The busy timeout in milliseconds from the environment, defaults to 5000.
+    """
+    return int(os.getenv("DATABASE_SQLITE_BUSY_TIMEOUT", "5000"))
+
+
+def database_membership_cache_size() -> int:
+    """This method will read the number of users (and of apps) whose memberships
+    are kept by the membership cache of each worker process, which answers the
+    membership checks of the requests without querying the database.
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        int: The cache size from the environment, defaults to 10000.
+            Zero disables the cache.
+    """
+    return int(os.getenv("DATABASE_MEMBERSHIP_CACHE_SIZE", "10000"))
+
+
+def database_membership_cache_ttl() -> float:
+    """This method will read the number of seconds the membership cache keeps
+    the memberships of a user before reading them again.
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        float: The time to live in seconds from the environment, defaults to 300.
+    """
+    return float(os.getenv("DATABASE_MEMBERSHIP_CACHE_TTL", "300"))
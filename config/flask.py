@@ -10,6 +10,12 @@ Functions:
         debug mode.
     port(): This method will read the port from the `.env` file and return
         it as an integer.
+    config_reload_interval(): This method will read how often the `.env` file
+        and the JWT keys are checked for changes.
+    compression_min_size(): This method will read the size from which the
+        API responses are compressed.
+    compression_level(): This method will read the level of compression of
+        the API responses.
 """
 from dotenv import load_dotenv
 import os
@@ -153,3 +159,54 @@ def port() -> int:
     if obtained_port is None:
         raise KeyError("PORT not found in the environment.")
     return int(obtained_port)
+
+
+def config_reload_interval() -> float:
+    """This method will read the number of seconds between two checks of the
+    `.env` file and the JWT key files, the runtime configuration being
+    reloaded when one of them changed (see `config/runtime.py`).
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        float: The reload interval in seconds from the environment, defaults to 5.
+            Zero disables the checks, the configuration is then only reloaded
+            on SIGHUP.
+    """
+    return float(os.getenv("CONFIG_RELOAD_INTERVAL", "5"))
+
+
+def compression_min_size() -> int:
+    """This method will read the number of bytes from which the API responses
+    are compressed, when the client accepts it (see `utils/compression.py`).
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        int: The minimum size in bytes from the environment, defaults to 1024.
+            The streamed responses, whose size is not known, are always compressed.
+    """
+    return int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+
+def compression_level() -> int:
+    """This method will read the level of compression of the API responses,
+    from 1 (fastest) to 9 (smallest), used for gzip and mapped to the quality
+    of brotli.
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        int: The compression level from the environment, defaults to 6.
+            Zero disables the compression of the API responses.
+    """
+    return int(os.getenv("COMPRESSION_LEVEL", "6"))
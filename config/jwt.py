@@ -7,13 +7,28 @@ Functions:
         and return it as a string.
     jwt_public_key(file_path: str) -> str: This method will read the JWT public key from the file
         and return it as a string.
-    jwt_algorithm() -> str: This method will read the JWT algorithm used to sign the token. Right now,
-        it is set to RS256.
+    jwt_algorithm() -> str: This method will read the JWT algorithm used to sign the token
+        (RS256, ES256 or EdDSA).
+    jwt_key_files(directory: str) -> dict: This method will list the JWT key files of the key ring
+        by key id (kid).
+    jwt_signing_kid() -> str: This method will read the key id (kid) of the key signing the new tokens.
+    jwt_cache_size() -> int: This method will read how many verified tokens each worker keeps.
+    jwt_cache_max_age() -> float: This method will read how long a verified token is kept.
     
 Author:
     Jiacheng Zhao (John)
 """
 import os
+import re
+
+
+# The key id of the `jwt_private.pem` and `jwt_public.pem` pair, also used to
+# verify the tokens signed before the key ids were introduced
+DEFAULT_KID = "default"
+# The algorithms the keys can be generated and used for, RS256 by default
+SUPPORTED_ALGORITHMS = ("RS256", "ES256", "EdDSA")
+# `jwt_private.pem` or `jwt_private.<kid>.pem`, same for the public keys
+_KEY_FILE_PATTERN = re.compile(r"^jwt_(private|public)(?:\.([A-Za-z0-9_-]+))?\.pem$")
 
 
 def jwt_private_key(file_path="jwt_private.pem") -> str:
@@ -61,7 +76,91 @@ def jwt_public_key(file_path="jwt_public.pem") -> str:
 
 
 def jwt_algorithm() -> str:
-    """This method will read the JWT algorithm
+    """This method will read the JWT algorithm used to sign the new tokens.
+    The signing key must be a key of this algorithm, the tokens signed before
+    a switch are verified with the algorithm of the key which signed them.
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        str: The JWT algorithm from the environment, defaults to RS256.
+    
+    
+    Raises:
+        ValueError: If the algorithm is not one of SUPPORTED_ALGORITHMS.
+    """
+    algorithm = os.getenv("JWT_ALGORITHM", "RS256")
+    if algorithm not in SUPPORTED_ALGORITHMS:
+        raise ValueError(f"JWT_ALGORITHM must be one of {', '.join(SUPPORTED_ALGORITHMS)}, not {algorithm}.")
+    return algorithm
+
+
+def jwt_key_files(directory=None) -> dict:
+    """This method will list the JWT key files of the key ring by key id (kid).
+    The `jwt_private.pem` and `jwt_public.pem` pair has the kid `default`, the
+    other keys are named `jwt_private.<kid>.pem` and `jwt_public.<kid>.pem`.
+    A public key without its private key can still verify the tokens it signed,
+    while they expire after a rotation.
+    
+    
+    Args:
+        directory (str): The directory of the key files, defaults to the
+            `config/secret` directory.
+    
+    
+    Returns:
+        dict: The paths of the key files by kid, as
+            {kid: {"private": path or None, "public": path or None}}.
+    """
+    if directory is None:
+        directory = os.path.join(os.path.dirname(__file__), "secret")
+    key_files = {}
+    for file_name in sorted(os.listdir(directory)):
+        match = _KEY_FILE_PATTERN.match(file_name)
+        if match is None:
+            continue
+        kind, kid = match.group(1), match.group(2) or DEFAULT_KID
+        key_files.setdefault(kid, {"private": None, "public": None})[kind] = os.path.join(directory, file_name)
+    return key_files
+
+
+def jwt_signing_kid() -> str:
+    """This method will read the key id (kid) of the key signing the new tokens.
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        str: The signing kid from the environment, defaults to `default`
+            (the `jwt_private.pem` key).
+    """
+    return os.getenv("JWT_SIGNING_KID", DEFAULT_KID)
+
+
+def jwt_cache_size() -> int:
+    """This method will read the number of verified tokens kept by each worker
+    process, so a token presented again is not verified again.
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        int: The cache size from the environment, defaults to 4096.
+            Zero disables the cache.
+    """
+    return int(os.getenv("JWT_CACHE_SIZE", "4096"))
+
+
+def jwt_cache_max_age() -> float:
+    """This method will read the maximum number of seconds a verified token is
+    kept, the tokens are never kept after their expiration time.
     
     
     Args:
@@ -69,6 +168,6 @@ def jwt_algorithm() -> str:
     
     
     Returns:
-        str: The JWT algorithm.
+        float: The maximum age in seconds from the environment, defaults to 300.
     """
-    return "RS256"
\ No newline at end of file
+    return float(os.getenv("JWT_CACHE_MAX_AGE", "300"))
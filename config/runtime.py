@@ -0,0 +1,343 @@
+"""
+This file handles the runtime configuration: an immutable snapshot of the
+settings read from the environment (the `.env` file) and of the JWT key ring,
+built once and shared by the requests, instead of reading the environment and
+the key files on every call.
+
+The snapshot is replaced as a whole, never modified, when the configuration is
+reloaded: on SIGHUP, or when the `.env` file or a JWT key file changed. A request
+keeps using the snapshot it started with.
+
+
+Classes:
+    KeyRing: The parsed JWT keys by key id (kid), with the key signing the new tokens.
+    RuntimeConfig: The snapshot of the runtime configuration.
+
+
+Functions:
+    runtime_config(): This method will return the current snapshot, built on the first call.
+    reload_runtime_config(): This method will build a new snapshot and make it the current one.
+    watch_runtime_config(): This method will reload the snapshot when its files change.
+    reload_on_sighup(): This method will reload the snapshot when the process receives SIGHUP.
+
+
+Usage:
+    The database and Flask settings, and the size of the cache of the verified
+    tokens, are read when the server starts, a change of them needs a restart. The key ring is used by every token generated or
+    validated, so keys can be added, rotated and retired without restarting the
+    workers: add `jwt_private.<kid>.pem` and `jwt_public.<kid>.pem`, then set
+    `JWT_SIGNING_KID` to the new kid. Keep the old public key until the tokens
+    it signed expire.
+"""
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from dataclasses import dataclass, field
+from dotenv import load_dotenv
+from types import MappingProxyType
+import os
+import signal
+import threading
+import time
+from config import database as database_config
+from config import flask as flask_config
+from config.jwt import DEFAULT_KID, jwt_algorithm, jwt_cache_max_age, jwt_cache_size, jwt_key_files, jwt_signing_kid
+
+
+SECRET_DIR = os.path.join(os.path.dirname(__file__), "secret")
+DOTENV_PATH = os.path.join(SECRET_DIR, ".env")
+
+
+@dataclass(frozen=True)
+class KeyRing:
+    """
+    The parsed JWT keys by key id (kid). The algorithm of each key follows
+    from its type, so the keys of a previous algorithm keep verifying the
+    tokens they signed after a switch.
+
+    @attr signing_kid: str, the kid of the key signing the new tokens
+    @attr private_keys: Mapping, the private keys by kid
+    @attr public_keys: Mapping, the public keys by kid
+    @attr algorithms: Mapping, the algorithm of the keys by kid
+    """
+    signing_kid: str
+    private_keys: MappingProxyType
+    public_keys: MappingProxyType
+    algorithms: MappingProxyType
+
+    @property
+    def signing_key(self):
+        return self.private_keys[self.signing_kid]
+
+    @property
+    def signing_algorithm(self) -> str:
+        return self.algorithms[self.signing_kid]
+
+    def public_key(self, kid: str = None):
+        """
+        This method returns the public key with the given kid, or None if the
+        key ring has none. The tokens without kid were signed by the default key.
+
+        @param kid: str, the kid from the header of the token
+        """
+        return self.public_keys.get(DEFAULT_KID if kid is None else kid)
+
+    def key_algorithm(self, kid: str = None) -> str:
+        """
+        This method returns the algorithm of the key with the given kid, or None
+        if the key ring has none.
+
+        @param kid: str, the kid from the header of the token
+        """
+        return self.algorithms.get(DEFAULT_KID if kid is None else kid)
+
+
+@dataclass(frozen=True)
+class RuntimeConfig:
+    """
+    The snapshot of the runtime configuration. The settings the environment
+    may leave out (the Flask ones when the server is not run directly) are None.
+    """
+    database_uri: str
+    database_pool_size: int
+    database_max_overflow: int
+    database_pool_pre_ping: bool
+    database_pool_recycle: int
+    database_auto_migrate: bool
+    database_raiseload: bool
+    database_replica_uris: tuple
+    database_replica_lag: float
+    database_sqlite_profile: bool
+    database_sqlite_busy_timeout: int
+    database_membership_cache_size: int
+    database_membership_cache_ttl: float
+    flask_host: str
+    flask_debug: bool
+    flask_port: int
+    flask_use_ssl: bool
+    flask_cert_path: str
+    flask_key_path: str
+    config_reload_interval: float
+    compression_min_size: int
+    compression_level: int
+    jwt_cache_size: int
+    jwt_cache_max_age: float
+    key_ring: KeyRing
+    # When the snapshot was built, and the state of its files then
+    loaded_at: float = field(compare=False)
+    fingerprint: tuple = field(compare=False, repr=False)
+
+
+def _optional(getter):
+    # The Flask getters raise a KeyError for a missing setting
+    try:
+        return getter()
+    except KeyError:
+        return None
+
+
+def _read_pem(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def _key_algorithm(public_key) -> str:
+    # The JWT algorithm of a key, by its type
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return "RS256"
+    if isinstance(public_key, ec.EllipticCurvePublicKey) and isinstance(public_key.curve, ec.SECP256R1):
+        return "ES256"
+    if isinstance(public_key, ed25519.Ed25519PublicKey):
+        return "EdDSA"
+    raise ValueError(f"Unsupported JWT key type: {type(public_key).__name__}.")
+
+
+def _load_key_ring(directory: str) -> KeyRing:
+    private_keys = {}
+    public_keys = {}
+    for kid, paths in jwt_key_files(directory).items():
+        if paths["private"] is not None:
+            private_keys[kid] = serialization.load_pem_private_key(_read_pem(paths["private"]), password=None)
+        if paths["public"] is not None:
+            public_keys[kid] = serialization.load_pem_public_key(_read_pem(paths["public"]))
+        elif kid in private_keys:
+            public_keys[kid] = private_keys[kid].public_key()
+    algorithms = {kid: _key_algorithm(public_key) for kid, public_key in public_keys.items()}
+    signing_kid = jwt_signing_kid()
+    if signing_kid not in private_keys:
+        raise KeyError(f"The JWT private key of the signing kid '{signing_kid}' is not found in {directory}.")
+    if algorithms[signing_kid] != jwt_algorithm():
+        raise ValueError(
+            f"The JWT signing key '{signing_kid}' is for {algorithms[signing_kid]}, "
+            f"but JWT_ALGORITHM is {jwt_algorithm()}."
+        )
+    return KeyRing(
+        signing_kid=signing_kid,
+        private_keys=MappingProxyType(private_keys),
+        public_keys=MappingProxyType(public_keys),
+        algorithms=MappingProxyType(algorithms),
+    )
+
+
+def _fingerprint(directory: str) -> tuple:
+    # The modification time and size of the `.env` file and of the key files
+    paths = [os.path.join(directory, ".env")]
+    for key_paths in jwt_key_files(directory).values():
+        paths += [path for path in key_paths.values() if path is not None]
+    state = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            state.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            state.append((path, None, None))
+    return tuple(state)
+
+
+def load_runtime_config(directory: str = SECRET_DIR) -> RuntimeConfig:
+    """
+    This method will build a snapshot of the runtime configuration from the
+    `.env` file, the environment and the JWT key files.
+
+    @param directory: str, the directory of the `.env` file and the key files
+
+    @return: RuntimeConfig, the snapshot
+
+    @raise KeyError: if a required setting or the signing key is missing
+    @raise ValueError: if a setting or a key file cannot be parsed
+    """
+    fingerprint = _fingerprint(directory)
+    load_dotenv(os.path.join(directory, ".env"), override=True)
+    return RuntimeConfig(
+        database_uri=database_config.database_uri(),
+        database_pool_size=database_config.database_pool_size(),
+        database_max_overflow=database_config.database_max_overflow(),
+        database_pool_pre_ping=database_config.database_pool_pre_ping(),
+        database_pool_recycle=database_config.database_pool_recycle(),
+        database_auto_migrate=database_config.database_auto_migrate(),
+        database_raiseload=database_config.database_raiseload(),
+        database_replica_uris=tuple(database_config.database_replica_uris()),
+        database_replica_lag=database_config.database_replica_lag(),
+        database_sqlite_profile=database_config.database_sqlite_profile(),
+        database_sqlite_busy_timeout=database_config.database_sqlite_busy_timeout(),
+        database_membership_cache_size=database_config.database_membership_cache_size(),
+        database_membership_cache_ttl=database_config.database_membership_cache_ttl(),
+        flask_host=_optional(flask_config.bind_host),
+        flask_debug=_optional(flask_config.flask_debug),
+        flask_port=_optional(flask_config.port),
+        flask_use_ssl=flask_config.flask_use_ssl(),
+        flask_cert_path=_optional(flask_config.flask_cert_path),
+        flask_key_path=_optional(flask_config.flask_key_path),
+        config_reload_interval=flask_config.config_reload_interval(),
+        compression_min_size=flask_config.compression_min_size(),
+        compression_level=flask_config.compression_level(),
+        jwt_cache_size=jwt_cache_size(),
+        jwt_cache_max_age=jwt_cache_max_age(),
+        key_ring=_load_key_ring(directory),
+        loaded_at=time.time(),
+        fingerprint=fingerprint,
+    )
+
+
+# The current snapshot, replaced (never modified) by reload_runtime_config()
+_runtime_config = None
+_reload_lock = threading.Lock()
+# The interval of the watcher thread of this process, None if not watching,
+# and the generation of the thread, a thread stops once a newer one is started
+_watch_interval = None
+_watch_generation = 0
+
+
+def runtime_config() -> RuntimeConfig:
+    """
+    This method will return the current snapshot of the runtime configuration,
+    built on the first call.
+
+    @return: RuntimeConfig, the current snapshot
+    """
+    config = _runtime_config
+    if config is None:
+        config = reload_runtime_config()
+    return config
+
+
+def reload_runtime_config() -> RuntimeConfig:
+    """
+    This method will build a new snapshot of the runtime configuration and make
+    it the current one. If the new snapshot cannot be built, the current one is
+    kept and the error is raised.
+
+    @return: RuntimeConfig, the new snapshot
+    """
+    global _runtime_config
+    with _reload_lock:
+        config = load_runtime_config()
+        _runtime_config = config
+        return config
+
+
+def _reload_quietly(reason: str):
+    # A broken file must not stop the workers, they keep the last good snapshot
+    try:
+        reload_runtime_config()
+        print(f"Runtime configuration reloaded ({reason}).")
+    except Exception as e:
+        print(f"Failed to reload the runtime configuration ({reason}), keeping the previous one: {e}")
+
+
+def _watch(interval: float, generation: int):
+    while True:
+        time.sleep(interval)
+        if generation != _watch_generation:
+            return
+        config = _runtime_config
+        if config is not None and _fingerprint(SECRET_DIR) != config.fingerprint:
+            _reload_quietly("file changed")
+
+
+def _start_watcher():
+    global _watch_generation
+    _watch_generation += 1
+    threading.Thread(
+        target=_watch, args=(_watch_interval, _watch_generation), name="runtime-config-watcher", daemon=True
+    ).start()
+
+
+def watch_runtime_config(interval: float):
+    """
+    This method will check the `.env` file and the JWT key files every given
+    number of seconds in a background thread, and reload the snapshot when one
+    of them changed. The thread is started again in the processes forked from
+    this one.
+
+    @param interval: float, the number of seconds between two checks, zero or
+        less stops the checks
+    """
+    global _watch_interval, _watch_generation
+    runtime_config()
+    if interval <= 0:
+        _watch_interval = None
+        _watch_generation += 1
+        return
+    _watch_interval = interval
+    _start_watcher()
+
+
+def _restart_watcher_after_fork():
+    # The threads of the parent process do not run in the child (e.g. gunicorn
+    # workers forked after the app is preloaded)
+    if _watch_interval is not None:
+        _start_watcher()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_watcher_after_fork)
+
+
+def reload_on_sighup():
+    """
+    This method will reload the snapshot when the process receives SIGHUP. It
+    must be called from the main thread, and does nothing on platforms without
+    SIGHUP.
+    """
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda signum, frame: _reload_quietly("SIGHUP"))
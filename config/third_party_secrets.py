@@ -7,6 +7,14 @@ Functions:
     google_client_secrets(): This method will read the client secrets 
         provided by Google from the `secret/client_secret.json`
         file and return it as a dictionary object.
+    google_oauth_base_url(): This method will read the URL of the server standing
+        in for Google, if any.
+    google_oauth_timeout(): This method will read how long a request to Google
+        may take.
+    google_oauth_retries(): This method will read how many times a failed
+        request to Google is retried.
+    google_oauth_verify_id_token(): This method will read if the ID token of
+        Google is verified locally instead of asking Google for the user info.
 
 
 Author:
@@ -38,3 +46,66 @@ def google_client_secrets() -> dict:
     with open(client_secret_path, "r") as file:
         return json.load(file)
 
+
+def google_oauth_base_url() -> str:
+    """This method will read the URL of a server standing in for the Google
+    OAuth endpoints (token, user info and certificates), such as the one of
+    `scripts/fake_google_oauth.py`, to test the login offline.
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        str: The base URL from the environment, defaults to None (Google).
+    """
+    base_url = os.getenv("GOOGLE_OAUTH_BASE_URL", "")
+    return base_url.rstrip("/") if base_url else None
+
+
+def google_oauth_timeout() -> float:
+    """This method will read the number of seconds a request to Google may
+    take to connect, and then to respond, before it fails.
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        float: The timeout in seconds from the environment, defaults to 5.
+    """
+    return float(os.getenv("GOOGLE_OAUTH_TIMEOUT", "5"))
+
+
+def google_oauth_retries() -> int:
+    """This method will read the number of times a request to Google is
+    retried, with an exponential backoff, after a connection error or, for
+    the requests reading data, an error response of Google.
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        int: The number of retries from the environment, defaults to 2.
+    """
+    return int(os.getenv("GOOGLE_OAUTH_RETRIES", "2"))
+
+
+def google_oauth_verify_id_token() -> bool:
+    """This method will read the flag indicating if the ID token returned by
+    Google with the access token is verified locally, against the cached
+    certificates of Google, instead of asking Google for the user info.
+    
+    
+    Args:
+        None.
+    
+    
+    Returns:
+        bool: The flag from the environment, defaults to True.
+    """
+    return os.getenv("GOOGLE_OAUTH_VERIFY_ID_TOKEN", "True").upper() == "TRUE"
@@ -1,23 +1,252 @@
-from sqlalchemy.engine import create_engine
-from sqlalchemy import event, MetaData
-from sqlalchemy.orm import sessionmaker, scoped_session, Session
+from sqlalchemy.engine import create_engine, make_url
+from sqlalchemy import event, exists, func, insert, or_
+from sqlalchemy.orm import sessionmaker, scoped_session, Session, joinedload, raiseload, selectinload
+from flask import Blueprint, Flask, Response, g, has_request_context, request
 from . import models
+from .sqlite_profile import apply_sqlite_profile, is_sqlite_file, sqlite_connect_args
+from .context import RequestContext, resolve_request_context, cached_request_context, forget_request_context, _to_id
+from .counters import add_app_counters, bump_versions, count_enrollment, count_entries, read_app_versions, rebuild_counters
+from .search import index_entries, search_entries, search_terms
+from .membership import configure_membership_cache, forget_membership, membership_cache, membership_cache_stats
 import datetime
+import itertools
+import math
+import os
+import time
 
 
-def init_connection(uri, echo=False):
-    engine = create_engine(uri, echo=echo)
-    Session = sessionmaker(bind=engine)
-    metadata = MetaData()
-    metadata.bind = engine
-    metadata.reflect(bind=engine)
+# The columns read by the listing helpers (list_*), which return them as
+# read-only rows instead of ORM objects tracked by the session.
+COURSE_LISTING_COLUMNS = (models.Course.id, models.Course.identifier, models.Course.name)
+APP_LISTING_COLUMNS = (
+    models.App.id, models.App.name, models.App.intro, models.App.start_time, models.App.end_time,
+    models.App.num_entries, models.App.max_students, models.App.template,
+    func.coalesce(models.AppCounter.num_students, 0).label("num_students"),
+)
+ENTRY_LISTING_COLUMNS = (
+    models.Entry.id, models.Entry.content, models.Entry.create_at, models.Entry.update_at,
+    models.Entry.student_id, models.Entry.app_id,
+)
 
-    # Check if models are already defined in the database
-    for model in models.Model.__subclasses__():
-        if model.__tablename__ not in metadata.tables:
-            model.metadata.create_all(engine)
+# Number of rows fetched at once by the streamed listings (see stream_app_entries())
+STREAM_BATCH_SIZE = 500
 
-    return engine, Session, metadata
+# The engine and session factory are created once per worker process
+# by init_engine() and shared by every request handled in that process.
+_engine = None
+_Session = None
+# The engines of the read replicas, used in turn by the read-only requests
+_replica_engines = []
+_replica_cycle = None
+_replica_lag = 5.0
+
+# The cookie telling until when (as a timestamp) the reads of a client which
+# wrote to the database stay on the primary, so it reads its own writes
+READ_PRIMARY_COOKIE = "db_read_primary_until"
+
+
+class RoutingSession(Session):
+    """
+    The session used when read replicas are configured. Its statements are sent to
+    the replica chosen for the request in `info["read_replica"]`, if any, until the
+    session writes; writes and every statement after them use the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or getattr(clause, "is_dml", False):
+            self.info["wrote"] = True
+        replica = self.info.get("read_replica")
+        if replica is not None and not self.info.get("wrote"):
+            return replica
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+def init_engine(uri, echo=False, pool_size=5, max_overflow=10, pool_pre_ping=True, pool_recycle=1800, raiseload=False, replica_uris=(), replica_lag=5.0, sqlite_profile=True, sqlite_busy_timeout=5000, membership_cache_size=10000, membership_cache_ttl=300):
+    """
+    This function creates the process-wide engine and session factory. Calling it
+    again returns the ones created by the first call. When replica URIs are given,
+    an engine is created for each replica with the same options and the sessions
+    route their reads as described in RoutingSession.
+
+    @param uri: str, the database URI
+    @param echo: bool, if the emitted SQL should be logged
+    @param pool_size: int, the number of connections kept open in the pool
+    @param max_overflow: int, the number of connections allowed beyond the pool size
+    @param pool_pre_ping: bool, if a pooled connection should be checked before it is used
+    @param pool_recycle: int, the lifetime of a pooled connection in seconds
+    @param raiseload: bool, if a lazy load not planned by the query should raise an error (for tests)
+    @param replica_uris: list, the URIs of the read replicas
+    @param replica_lag: float, the seconds the reads of a client stay on the primary after it wrote
+    @param sqlite_profile: bool, if file-based SQLite databases use the profile of sqlite_profile.py
+    @param sqlite_busy_timeout: int, the milliseconds a SQLite connection waits for a lock
+    @param membership_cache_size: int, the number of users kept by the membership cache, zero disables it
+    @param membership_cache_ttl: float, the seconds a membership is kept by the membership cache
+    """
+    global _engine, _Session, _replica_engines, _replica_cycle, _replica_lag
+    if _engine is not None:
+        return _engine, _Session
+    engine_options = {
+        "echo": echo,
+        "pool_pre_ping": pool_pre_ping,
+        "pool_recycle": pool_recycle,
+    }
+    url = make_url(uri)
+    # In-memory SQLite databases use a single connection per thread,
+    # the queue pool options do not apply to them.
+    if not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")):
+        engine_options["pool_size"] = pool_size
+        engine_options["max_overflow"] = max_overflow
+    _engine = _create_engine(uri, engine_options, sqlite_profile, sqlite_busy_timeout)
+    _replica_engines = [
+        _create_engine(replica_uri, engine_options, sqlite_profile, sqlite_busy_timeout)
+        for replica_uri in replica_uris
+    ]
+    _replica_cycle = itertools.cycle(_replica_engines)
+    _replica_lag = replica_lag
+    _Session = sessionmaker(bind=_engine, class_=RoutingSession if _replica_engines else Session)
+    configure_membership_cache(membership_cache_size, membership_cache_ttl)
+    if raiseload:
+        event.listen(_Session, "do_orm_execute", _raise_on_unplanned_lazy_load)
+    return _engine, _Session
+
+
+def _create_engine(uri, engine_options: dict, sqlite_profile: bool, sqlite_busy_timeout: int):
+    if not (sqlite_profile and is_sqlite_file(uri)):
+        return create_engine(uri, **engine_options)
+    engine = create_engine(uri, connect_args=sqlite_connect_args(sqlite_busy_timeout), **engine_options)
+    apply_sqlite_profile(engine, busy_timeout=sqlite_busy_timeout)
+    return engine
+
+
+def _raise_on_unplanned_lazy_load(orm_execute_state):
+    # Make every relationship of the queried entities raise when it would be
+    # lazy loaded, except the ones loaded by the query options or eagerly by
+    # default ("joined" and "selectin" relationships in models.py)
+    if (
+        not orm_execute_state.is_select
+        or orm_execute_state.is_column_load
+        or orm_execute_state.is_relationship_load
+        or not orm_execute_state.all_mappers
+    ):
+        return
+    # Only the entities selected as a whole take loader options, the listings
+    # selecting columns (list_* helpers) have no relationship to load
+    entity_mappers = [
+        mapper for mapper in orm_execute_state.all_mappers
+        if any(
+            description["expr"] is description["entity"] and description["entity"] is mapper.class_
+            for description in orm_execute_state.statement.column_descriptions
+        )
+    ]
+    if len(entity_mappers) == 0:
+        return
+    options = [raiseload("*", sql_only=True)]
+    for mapper in entity_mappers:
+        for relationship in mapper.relationships:
+            if relationship.lazy == "joined":
+                options.append(joinedload(relationship.class_attribute))
+            elif relationship.lazy == "selectin":
+                options.append(selectinload(relationship.class_attribute))
+    orm_execute_state.statement = orm_execute_state.statement.options(*options)
+
+
+def get_engine():
+    """
+    This function returns the engine created by init_engine().
+    """
+    if _engine is None:
+        raise RuntimeError("The database engine is not initialized, call init_engine() first.")
+    return _engine
+
+
+def get_replica_engines() -> list:
+    """
+    This function returns the engines of the read replicas created by init_engine().
+    """
+    return list(_replica_engines)
+
+
+def _dispose_engine_after_fork():
+    # Connections opened by the parent process must not be reused by the
+    # child (e.g. gunicorn workers forked after the app is preloaded).
+    for engine in [_engine] + _replica_engines:
+        if engine is not None:
+            engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_dispose_engine_after_fork)
+
+
+def get_session() -> Session:
+    """
+    This function returns the session of the current request. The session is
+    opened on first use and closed when the request ends.
+    """
+    if _Session is None:
+        raise RuntimeError("The database engine is not initialized, call init_engine() first.")
+    if "db_session" not in g:
+        session = _Session()
+        if _replica_engines and g.get("db_read_replica", False) and not _reads_own_writes():
+            session.info["read_replica"] = next(_replica_cycle)
+        g.db_session = session
+    return g.db_session
+
+
+def _reads_own_writes() -> bool:
+    # If the client of the request wrote recently, its reads stay on the primary
+    if not has_request_context():
+        return False
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, "0")) > time.time()
+    except ValueError:
+        return False
+
+
+def read_from_replicas(blueprint: Blueprint) -> Blueprint:
+    """
+    This function lets the read-only (GET and HEAD) requests of a blueprint read from
+    the replicas, when replicas are configured. It must be called before the
+    blueprint is registered on the application.
+
+    @param blueprint: flask.Blueprint, the blueprint whose handlers only read on GET
+    """
+    @blueprint.before_request
+    def _use_read_replica():
+        if request.method in ("GET", "HEAD"):
+            g.db_read_replica = True
+    return blueprint
+
+
+def _remember_writes(response: Response) -> Response:
+    # Keep the next reads of a client which just wrote on the primary
+    session = g.get("db_session")
+    if _replica_engines and session is not None and session.info.get("wrote"):
+        response.set_cookie(
+            READ_PRIMARY_COOKIE,
+            str(time.time() + _replica_lag),
+            max_age=math.ceil(_replica_lag),
+            httponly=True,
+            samesite="Lax",
+        )
+    return response
+
+
+def _close_session(exception=None):
+    session = g.pop("db_session", None)
+    if session is not None:
+        session.close()
+
+
+def init_app(app: Flask):
+    """
+    This function registers the handlers closing the request-scoped session and
+    keeping the reads of a client on the primary after it wrote.
+
+    @param app: flask.Flask, the application to register the handlers on
+    """
+    app.after_request(_remember_writes)
+    app.teardown_appcontext(_close_session)
 
 
 def adding_user(session: Session, first_name: str, last_name: str, email: str, role: str="student") -> bool:
@@ -47,6 +276,9 @@ def adding_user(session: Session, first_name: str, last_name: str, email: str, r
             user.professors.append(professor)
         session.add(user)
         session.commit()
+        # The membership of the user may have changed
+        forget_request_context(session)
+        forget_membership(email)
         return True
     else:
         return False
@@ -59,6 +291,9 @@ def get_user(session, email) -> models.User:
     @param session: sqlalchemy.orm.session.Session, the session to use to check the user
     @param email: str, the email of the user
     """
+    context = cached_request_context(session, email)
+    if context is not None:
+        return context.user
     user: models.User = session.query(models.User).filter_by(email=email).first()
     if user is not None:
         return user
@@ -84,7 +319,7 @@ def get_student(session: Session, user_email: str) -> models.Student:
     user = get_user(session, user_email)
     if user is not None:
         if user.role == "student":
-            return user.students[0]
+            return session.query(models.Student).filter_by(id=user.id).first()
         else:
             return None
     else:
@@ -115,6 +350,9 @@ def adding_course(session: Session, course_name: str, course_number: int, profes
             course.professors.append(professor)
             session.add(course)
             session.commit()
+            # The membership of the user may have changed
+            forget_request_context(session)
+            forget_membership(professor_email)
             return True
         else:
             return False
@@ -122,6 +360,115 @@ def adding_course(session: Session, course_name: str, course_number: int, profes
         return False
 
 
+# The check_* helpers below answer from the membership cache when it holds the
+# membership (a cached membership is always true), and query the database otherwise
+def check_student_in_course(session: Session, course_id: int, student_id: int) -> bool:
+    """
+    This function checks if a student is enrolled in a course with an EXISTS query
+    on the course_student table, without loading the students of the course.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param course_id: int, the id of the course
+    @param student_id: int, the id of the student (the same as the id of the user)
+    """
+    membership = membership_cache().user_by_id(student_id)
+    if membership is not None and membership.role == "student" and membership.in_course(course_id):
+        return True
+    return session.query(
+        exists().where(
+            models.course_student_table.c.course_id == course_id,
+            models.course_student_table.c.student_id == student_id,
+        )
+    ).scalar()
+
+
+def check_professor_in_course(session: Session, course_id: int, professor_id: int) -> bool:
+    """
+    This function checks if a professor teaches a course with an EXISTS query
+    on the course_professor table, without loading the professors of the course.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param course_id: int, the id of the course
+    @param professor_id: int, the id of the professor (the same as the id of the user)
+    """
+    membership = membership_cache().user_by_id(professor_id)
+    if membership is not None and membership.role == "professor" and membership.in_course(course_id):
+        return True
+    return session.query(
+        exists().where(
+            models.course_professor_table.c.course_id == course_id,
+            models.course_professor_table.c.professor_id == professor_id,
+        )
+    ).scalar()
+
+
+def check_student_in_app(session: Session, app_id: int, student_id: int) -> bool:
+    """
+    This function checks if a student is enrolled in an app with an EXISTS query
+    on the app_student table, without loading the students of the app.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param app_id: int, the id of the app
+    @param student_id: int, the id of the student (the same as the id of the user)
+    """
+    membership = membership_cache().user_by_id(student_id)
+    if membership is not None and membership.role == "student" and app_id in membership.app_ids:
+        return True
+    return session.query(
+        exists().where(
+            models.app_student_table.c.app_id == app_id,
+            models.app_student_table.c.student_id == student_id,
+        )
+    ).scalar()
+
+
+def check_professor_in_app(session: Session, app_id: int, professor_id: int) -> bool:
+    """
+    This function checks if a professor teaches a course the app is bound to,
+    with an EXISTS query joining the course_app and course_professor tables.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param app_id: int, the id of the app
+    @param professor_id: int, the id of the professor (the same as the id of the user)
+    """
+    membership = membership_cache().user_by_id(professor_id)
+    app_course_ids = membership_cache().app_course_ids(app_id)
+    if membership is not None and membership.role == "professor" and app_course_ids is not None:
+        if membership.in_app(app_id, app_course_ids):
+            return True
+    return session.query(
+        exists().where(
+            models.course_app_table.c.app_id == app_id,
+            models.course_app_table.c.course_id == models.course_professor_table.c.course_id,
+            models.course_professor_table.c.professor_id == professor_id,
+        )
+    ).scalar()
+
+
+def _check_user_in_app(session: Session, app: models.App, user: models.User) -> bool:
+    """
+    This function checks if a student is enrolled in an app, or if a professor teaches
+    a course of the app, reusing the membership resolved for the request if possible.
+    """
+    context = cached_request_context(session, user.email)
+    if context is not None and context.app_id == app.id:
+        return context.in_app
+    if user.role == "student":
+        return check_student_in_app(session, app.id, user.id)
+    else:
+        return check_professor_in_app(session, app.id, user.id)
+
+
+def count_app_students(session: Session, app_id: int) -> int:
+    """
+    This function returns the number of students enrolled in an app, from its counters.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param app_id: int, the id of the app
+    """
+    return count_apps_students(session, [_to_id(app_id)])[_to_id(app_id)]
+
+
 def get_course(session: Session, course_id: int, user_email: str) -> models.Course:
     """
     This function returns a course from the database.
@@ -130,13 +477,22 @@ def get_course(session: Session, course_id: int, user_email: str) -> models.Cour
     user = get_user(session, user_email)
     if user is None:
         return None
+    # Reuse the membership resolved for the request
+    context = cached_request_context(session, user_email)
+    if context is not None and context.course_id is not None and context.course_id == _to_id(course_id):
+        if user.role not in ("student", "professor"):
+            raise ValueError(
+                f"User role {user.role} is not handled correctly. " +
+                "Please check if the role is correct."
+            )
+        return context.course if context.in_course else None
     # Get the course from the database
     course = session.query(models.Course).filter_by(id=course_id).first()
     # Check if the user is a student or a professor
     if user.role == "student":
         # Check the table course_student to get the course of the student
         if course is not None:
-            if user.students[0] in course.students:
+            if check_student_in_course(session, course.id, user.id):
                 return course
             else:
                 return None
@@ -145,7 +501,7 @@ def get_course(session: Session, course_id: int, user_email: str) -> models.Cour
     elif user.role == "professor":
         # Check the table course_professor to get the course of the professor
         if course is not None:
-            if user.professors[0] in course.professors:
+            if check_professor_in_course(session, course.id, user.id):
                 return course
             else:
                 return None
@@ -186,9 +542,16 @@ def join_course(session: Session, course_id: id, student_email: str) -> bool:
     course = session.query(models.Course).filter_by(id=course_id).first()
     student = session.query(models.Student).filter_by(email=student_email).first()
     if course is not None and student is not None:
-        if student not in course.students:
-            course.students.append(student)
+        if not check_student_in_course(session, course.id, student.id):
+            # Insert the association row directly, appending to
+            # course.students would load every student of the course
+            session.execute(
+                models.course_student_table.insert().values(course_id=course.id, student_id=student.id)
+            )
             session.commit()
+            # The membership of the user may have changed
+            forget_request_context(session)
+            forget_membership(student_email)
             return True
         else:
             return False
@@ -204,15 +567,42 @@ def get_courses(session: Session, user_email: str) -> list:
     if user is not None:
         if user.role == "student":
             # Use table course_student to get the courses of the student
-            # Check if the student has courses, otherwise, return []
-            return user.students[0].courses if user.students else []
+            return session.query(models.Course).join(
+                models.course_student_table,
+                models.course_student_table.c.course_id == models.Course.id
+            ).filter(models.course_student_table.c.student_id == user.id).all()
         else:
             # Use table course_professor to get the courses of the professor
-            return user.professors[0].courses if user.professors else []
+            return session.query(models.Course).join(
+                models.course_professor_table,
+                models.course_professor_table.c.course_id == models.Course.id
+            ).filter(models.course_professor_table.c.professor_id == user.id).all()
     else:
         return None
     
     
+def list_courses(session: Session, user_email: str) -> list:
+    """
+    This function returns the courses of a user as read-only rows of the
+    COURSE_LISTING_COLUMNS, without building ORM objects, for the listings.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param user_email: str, the email of the user
+
+    @return: list[sqlalchemy.engine.Row], rows with the attributes of COURSE_LISTING_COLUMNS
+    """
+    user = get_user(session, user_email)
+    if user is None:
+        return None
+    if user.role == "student":
+        table, user_column = models.course_student_table, models.course_student_table.c.student_id
+    else:
+        table, user_column = models.course_professor_table, models.course_professor_table.c.professor_id
+    return session.query(*COURSE_LISTING_COLUMNS).join(
+        table, table.c.course_id == models.Course.id
+    ).filter(user_column == user.id).all()
+
+
 def add_app(session: Session, course_id: int, user_email: str, name: str, intro: str, start_time: int, end_time: int, num_entries: int, max_students: int, template_link: str, stopwords: list):
     """
     This function adds an app to the database.
@@ -240,7 +630,12 @@ def add_app(session: Session, course_id: int, user_email: str, name: str, intro:
                     models.Stopword(word=stopword)
                 )
             session.add(app)
+            session.flush()
+            add_app_counters(session, app.id)
             session.commit()
+            # The membership of the user may have changed
+            forget_request_context(session)
+            forget_membership(app_id=app.id)
             return app
         else:
             return None
@@ -254,16 +649,160 @@ def get_apps(session: Session, course_id: int, user_email: str) -> list:
     """
     course = get_course(session, course_id, user_email)
     if course is not None:
-        return course.apps
+        # The stopwords of the apps are listed with them
+        return session.query(models.App).join(
+            models.course_app_table,
+            models.course_app_table.c.app_id == models.App.id
+        ).filter(
+            models.course_app_table.c.course_id == course.id
+        ).options(selectinload(models.App.stopwords)).all()
     else:
         return None
-    
+
+
+def list_apps(session: Session, course_id: int, user_email: str) -> list:
+    """
+    This function returns the apps of a course with their number of students as
+    read-only rows of the APP_LISTING_COLUMNS, without building ORM objects, for
+    the listings. The stopwords of the apps are read by list_apps_stopwords().
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param course_id: int, the id of the course
+    @param user_email: str, the email of the user
+
+    @return: list[sqlalchemy.engine.Row], rows with the attributes of APP_LISTING_COLUMNS
+    """
+    course = get_course(session, course_id, user_email)
+    if course is None:
+        return None
+    return session.query(*APP_LISTING_COLUMNS).join(
+        models.course_app_table,
+        models.course_app_table.c.app_id == models.App.id
+    ).outerjoin(
+        models.AppCounter,
+        models.AppCounter.app_id == models.App.id
+    ).filter(
+        models.course_app_table.c.course_id == course.id
+    ).all()
+
+
+def list_apps_stopwords(session: Session, app_ids: list) -> dict:
+    """
+    This function returns the words of the stopwords of each of the given apps,
+    with a single query.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param app_ids: list, the ids of the apps
+
+    @return: dict, the list of words keyed by the id of the app
+    """
+    words = {app_id: [] for app_id in app_ids}
+    if not app_ids:
+        return words
+    rows = session.query(models.Stopword.app_id, models.Stopword.word).filter(
+        models.Stopword.app_id.in_(app_ids)
+    ).order_by(models.Stopword.id).all()
+    for app_id, word in rows:
+        words[app_id].append(word)
+    return words
+
+
+def count_apps_students(session: Session, app_ids: list) -> dict:
+    """
+    This function returns the number of students enrolled in each of the given apps,
+    read from the counters of the apps in a single query.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param app_ids: list, the ids of the apps
+    """
+    counts = {app_id: 0 for app_id in app_ids}
+    if not app_ids:
+        return counts
+    rows = session.query(
+        models.AppCounter.app_id, models.AppCounter.num_students
+    ).filter(
+        models.AppCounter.app_id.in_(app_ids)
+    ).all()
+    for app_id, count in rows:
+        counts[app_id] = count
+    return counts
+
+
+def count_student_app_entries(session: Session, app_id: int, student_id: int) -> int:
+    """
+    This function returns the number of entries a student submitted to an app, from
+    the counters of the student in the app.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param app_id: int, the id of the app
+    @param student_id: int, the id of the student
+    """
+    count = session.query(models.AppStudentCounter.num_entries).filter_by(
+        app_id=app_id, student_id=student_id
+    ).scalar()
+    return count if count is not None else 0
+
+
+def reconcile_counters(session: Session) -> dict:
+    """
+    This function rebuilds the counters of the apps from the rows they count and
+    returns the number of counters fixed in each counters table.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    """
+    fixed = rebuild_counters(session)
+    session.commit()
+    return fixed
+
+
+def get_app_students(session: Session, app_id: int) -> list[models.Student]:
+    """
+    This function returns the students enrolled in an app.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param app_id: int, the id of the app
+    """
+    return session.query(models.Student).join(
+        models.app_student_table,
+        models.app_student_table.c.student_id == models.Student.id
+    ).filter(models.app_student_table.c.app_id == app_id).all()
+
+
+def get_student_course_ids(session: Session, student_id: int) -> list[int]:
+    """
+    This function returns the ids of the courses a student is enrolled in.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param student_id: int, the id of the student
+    """
+    rows = session.query(models.course_student_table.c.course_id).filter(
+        models.course_student_table.c.student_id == student_id
+    ).all()
+    return [row.course_id for row in rows]
+
+
+def get_student_app_ids(session: Session, student_id: int) -> list[int]:
+    """
+    This function returns the ids of the apps a student is enrolled in.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param student_id: int, the id of the student
+    """
+    rows = session.query(models.app_student_table.c.app_id).filter(
+        models.app_student_table.c.student_id == student_id
+    ).all()
+    return [row.app_id for row in rows]
+
 
 def get_app(session: Session, app_id: int, user_email: str) -> models.App:
     """
     This function returns an app from the database.
     """
-    app = session.query(models.App).filter_by(id=app_id).first()
+    # Reuse the app resolved for the request
+    context = cached_request_context(session, user_email)
+    if context is not None and context.app_id is not None and context.app_id == _to_id(app_id):
+        return context.app if context.app_visible else None
+    app = session.query(models.App).filter_by(id=app_id).options(selectinload(models.App.binded_courses)).first()
     if app is not None:
         course = get_course(session, app.binded_courses[0].id, user_email)
         if course is not None:
@@ -293,13 +832,17 @@ def edit_app(session: Session, app_id: int, app_name: str, user_email: str, intr
             app.num_entries = num_entries
             app.max_students = max_students
             app.template = template_link
-            # Get the stopwords of the app
+            # Get the stopwords of the app, loaded into the app (resolved by the
+            # preamble without them) as they are edited with it
+            app = session.query(models.App).filter_by(id=app.id).options(selectinload(models.App.stopwords)).one()
             app_stopwords = [stopword.word for stopword in app.stopwords]
+            stopwords_changed = False
             # Check if each item in app_stopwords is in stopwords
             # if not, disable the stopword
             for stopword in app_stopwords:
                 if stopword not in stopwords:
                     app.stopwords[app_stopwords.index(stopword)].enabled = False
+                    stopwords_changed = True
             # Check if each item in stopwords is in app_stopwords
             # if not, add the stopword
             for stopword in stopwords:
@@ -307,6 +850,8 @@ def edit_app(session: Session, app_id: int, app_name: str, user_email: str, intr
                     app.stopwords.append(
                         models.Stopword(word=stopword)
                     )
+                    stopwords_changed = True
+            bump_versions(session, app.id, app=True, stopwords=stopwords_changed)
             session.commit()
             return app
         else:
@@ -315,6 +860,32 @@ def edit_app(session: Session, app_id: int, app_name: str, user_email: str, intr
         return None
 
 
+def get_app_versions(session: Session, app_id: int):
+    """
+    This function returns the counters and the versions of an app (see
+    database/counters.py), or None if they are missing. The ETags of the responses
+    built from the app are derived from them.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param app_id: int, the id of the app
+
+    @return: sqlalchemy.engine.Row, the row with the num_students, num_entries, entries_version, app_version and stopwords_version of the app
+    """
+    rows = read_app_versions(session, app_ids=[_to_id(app_id)])
+    return rows[0] if len(rows) > 0 else None
+
+
+def get_course_apps_versions(session: Session, course_id: int) -> list:
+    """
+    This function returns the counters and the versions of the apps of a course,
+    ordered by app id (see get_app_versions()).
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param course_id: int, the id of the course
+    """
+    return read_app_versions(session, course_id=_to_id(course_id))
+
+
 def join_app(session: Session, app_id: int, student_email: str) -> bool:
     """
     This function adds a student to an app. If the student is already in the app, it returns False.
@@ -323,9 +894,17 @@ def join_app(session: Session, app_id: int, student_email: str) -> bool:
     app = session.query(models.App).filter_by(id=app_id).first()
     student = session.query(models.Student).filter_by(email=student_email).first()
     if app is not None and student is not None:
-        if student not in app.enrolled_students:
-            app.enrolled_students.append(student)
+        if not check_student_in_app(session, app.id, student.id):
+            # Insert the association row directly, appending to
+            # app.enrolled_students would load every student of the app
+            session.execute(
+                models.app_student_table.insert().values(app_id=app.id, student_id=student.id)
+            )
+            count_enrollment(session, app.id, student.id)
             session.commit()
+            # The membership of the user may have changed
+            forget_request_context(session)
+            forget_membership(student_email)
             return True
         else:
             return False
@@ -341,12 +920,12 @@ def check_user_in_app(session: Session, app_id: int, user_email: str) -> bool:
     user = get_user(session, user_email)
     if app is not None and user is not None:
         if user.role == "student":
-            if user.students[0] in app.enrolled_students:
+            if _check_user_in_app(session, app, user):
                 return True
             else:
                 return False
         elif user.role == "professor":
-            if user.professors[0] in get_course(session, app.binded_courses[0].id, user_email).professors:
+            if _check_user_in_app(session, app, user):
                 return True
             else:
                 return False
@@ -354,10 +933,137 @@ def check_user_in_app(session: Session, app_id: int, user_email: str) -> bool:
         return False
 
 
-def get_app_entries(session: Session, app_id: int, user_email: str, student_id: int = None) -> list[models.Entry]:
+def _app_entries_query(session: Session, app_id: int, student_id: int = None, start_time: int = None, end_time: int = None, order: str = "asc", after: tuple = None, limit: int = None, with_authors: bool = False):
+    """
+    This function builds the query of the entries of an app, filtered and ordered
+    by the database on the entries (app_id, student_id, create_at) columns.
+    The page after the (create_at, id) key given as `after` is read with a range
+    condition on the ordering key (keyset pagination) rather than an OFFSET.
+    """
+    query = session.query(models.Entry).filter(models.Entry.app_id == app_id)
+    if with_authors:
+        query = query.options(joinedload(models.Entry.student).joinedload(models.Student.users))
+    if student_id is not None:
+        query = query.filter(models.Entry.student_id == student_id)
+    if start_time is not None:
+        query = query.filter(models.Entry.create_at >= datetime.datetime.fromtimestamp(start_time))
+    if end_time is not None:
+        query = query.filter(models.Entry.create_at <= datetime.datetime.fromtimestamp(end_time))
+    if order == "desc":
+        if after is not None:
+            # The first condition lets the index seek to the cursor
+            query = query.filter(
+                models.Entry.create_at <= after[0],
+                or_(models.Entry.create_at < after[0], models.Entry.id < after[1])
+            )
+        query = query.order_by(models.Entry.create_at.desc(), models.Entry.id.desc())
+    else:
+        if after is not None:
+            query = query.filter(
+                models.Entry.create_at >= after[0],
+                or_(models.Entry.create_at > after[0], models.Entry.id > after[1])
+            )
+        query = query.order_by(models.Entry.create_at.asc(), models.Entry.id.asc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def get_app_entries(session: Session, app_id: int, user_email: str, student_id: int = None, start_time: int = None, end_time: int = None, order: str = "asc", after: tuple = None, limit: int = None, with_authors: bool = False) -> list[models.Entry]:
+    """
+    This function returns all the entries of an app. Students only get their own entries,
+    professors get the entries of every student or of the given student.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param app_id: int, the id of the app
+    @param user_email: str, the email of the user requesting the entries
+    @param student_id: int, the id of the student whose entries are returned
+    @param start_time: int, the timestamp the entries must be created at or after
+    @param end_time: int, the timestamp the entries must be created at or before
+    @param order: str, 'asc' or 'desc', the order of the entries by creation time
+    @param after: tuple, the (create_at, id) of the last entry of the previous page
+    @param limit: int, the maximum number of entries to return
+    @param with_authors: bool, if the student and user authoring each entry should be loaded with it
+    """
+    query = _visible_app_entries_query(session, app_id, user_email, student_id, start_time, end_time, order, after, limit, with_authors)
+    return query.all() if query is not None else None
+
+
+def list_app_entries(session: Session, app_id: int, user_email: str, student_id: int = None, start_time: int = None, end_time: int = None, order: str = "asc", after: tuple = None, limit: int = None) -> list:
+    """
+    This function returns the same entries as get_app_entries() as read-only rows of
+    the ENTRY_LISTING_COLUMNS, without building ORM objects, for the listings.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param app_id: int, the id of the app
+    @param user_email: str, the email of the user requesting the entries
+    @param student_id: int, the id of the student whose entries are returned
+    @param start_time: int, the timestamp the entries must be created at or after
+    @param end_time: int, the timestamp the entries must be created at or before
+    @param order: str, 'asc' or 'desc', the order of the entries by creation time
+    @param after: tuple, the (create_at, id) of the last entry of the previous page
+    @param limit: int, the maximum number of entries to return
+
+    @return: list[sqlalchemy.engine.Row], rows with the attributes of ENTRY_LISTING_COLUMNS
     """
-    This function returns all the entries of an app.
+    query = _visible_app_entries_query(session, app_id, user_email, student_id, start_time, end_time, order, after, limit)
+    return query.with_entities(*ENTRY_LISTING_COLUMNS).all() if query is not None else None
+
+
+def stream_app_entries(session: Session, app_id: int, user_email: str, student_id: int = None, start_time: int = None, end_time: int = None, order: str = "asc", with_authors: bool = False, batch_size: int = STREAM_BATCH_SIZE):
     """
+    This function returns the same entries as list_app_entries(), read from a
+    server-side cursor by batches as they are iterated, for the responses streamed
+    to the client. The access is checked at once, the entries are only read when
+    the result is iterated.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param app_id: int, the id of the app
+    @param user_email: str, the email of the user requesting the entries
+    @param student_id: int, the id of the student whose entries are returned
+    @param start_time: int, the timestamp the entries must be created at or after
+    @param end_time: int, the timestamp the entries must be created at or before
+    @param order: str, 'asc' or 'desc', the order of the entries by creation time
+    @param with_authors: bool, if the first_name and last_name of the author are added to each row
+    @param batch_size: int, the number of rows fetched from the cursor at once
+
+    @return: iterable of sqlalchemy.engine.Row, rows with the attributes of ENTRY_LISTING_COLUMNS
+    """
+    query = _visible_app_entries_query(session, app_id, user_email, student_id, start_time, end_time, order)
+    if query is None:
+        return None
+    columns = ENTRY_LISTING_COLUMNS
+    if with_authors:
+        # The id of a student is the id of its user
+        query = query.join(models.User, models.User.id == models.Entry.student_id)
+        columns += (models.User.first_name, models.User.last_name)
+    return query.with_entities(*columns).yield_per(batch_size)
+
+
+def search_app_entries(session: Session, app_id: int, user_email: str, query: str, student_id: int = None, limit: int = 20) -> list:
+    """
+    This function searches the entries of an app the user can read (see
+    get_app_entries()) for every word of the query, with the full-text index when the
+    database has one. The best matches come first.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param app_id: int, the id of the app
+    @param user_email: str, the email of the user searching
+    @param query: str, the words searched
+    @param student_id: int, the id of the student whose entries are searched
+    @param limit: int, the maximum number of entries to return
+
+    @return: list[tuple], the rows of the ENTRY_LISTING_COLUMNS of the entries found with
+        their snippet and the offsets of the matches in it, or None if the user cannot read the entries
+    """
+    entries_query = _visible_app_entries_query(session, app_id, user_email, student_id)
+    if entries_query is None:
+        return None
+    return search_entries(session, entries_query, search_terms(query), ENTRY_LISTING_COLUMNS, limit)
+
+
+def _visible_app_entries_query(session: Session, app_id: int, user_email: str, student_id: int = None, start_time: int = None, end_time: int = None, order: str = "asc", after: tuple = None, limit: int = None, with_authors: bool = False):
+    # The query of the entries of the app the user is allowed to read, or None
     app = get_app(session, app_id, user_email)
     if app is not None:
         # Check if the user is a student
@@ -367,39 +1073,26 @@ def get_app_entries(session: Session, app_id: int, user_email: str, student_id:
                 # Student can only get their own entries, 
                 # so return None if the student_id is not the 
                 # same as the user's student id
-                if student_id != user.students[0].id:
+                if int(student_id) != user.id:
                     return None
             # Check if the student is enrolled in the app
-            entries = []
-            if user.students[0] in app.enrolled_students:
+            if _check_user_in_app(session, app, user):
                 # Get the entries authored by the student
-                for entry in app.entry_list:
-                    if entry.student_id == user.students[0].id:
-                        entries.append(entry)
-                return entries
+                return _app_entries_query(session, app.id, user.id, start_time, end_time, order, after, limit, with_authors)
             else:
                 return None
         elif user is not None and user.role == "professor":
             # Check if the professor is the owner of the app
-            if user.professors[0] in get_course(session, app.binded_courses[0].id, user_email).professors:
+            if _check_user_in_app(session, app, user):
                 if student_id is not None:
-                    student = get_student_by_id(session, student_id)
-                    if student is not None:
-                        # Check if the student is enrolled in the app
-                        if student in app.enrolled_students:
-                            
-                            entries = []
-                            # Get the entries authored by the student
-                            for entry in app.entry_list:
-                                if int(entry.student_id) == int(student_id):
-                                    entries.append(entry)
-                            return entries
-                        else:
-                            return None
+                    # Check if the student is enrolled in the app
+                    if check_student_in_app(session, app.id, int(student_id)):
+                        # Get the entries authored by the student
+                        return _app_entries_query(session, app.id, int(student_id), start_time, end_time, order, after, limit, with_authors)
                     else:
                         return None
                 else:
-                    return app.entry_list
+                    return _app_entries_query(session, app.id, None, start_time, end_time, order, after, limit, with_authors)
             else:
                 return None
     else:
@@ -414,7 +1107,7 @@ def add_entry(session: Session, app_id: int, student_email: str, entry_text: str
     student = session.query(models.Student).filter_by(email=student_email).first()
     if app is not None and student is not None:
         # Check if the student is enrolled in the app
-        if student in app.enrolled_students:
+        if check_student_in_app(session, app.id, student.id):
             entry = models.Entry(
                 student_id=student.id,
                 app_id=app.id,
@@ -425,9 +1118,9 @@ def add_entry(session: Session, app_id: int, student_email: str, entry_text: str
                 update_at=update_at
             )
             session.add(entry)
-            session.commit()
-            # Add the entry to the app
-            app.entry_list.append(entry)
+            session.flush()
+            count_entries(session, app.id, student.id)
+            index_entries(session, [(entry.id, entry.content)])
             session.commit()
             return entry
         else:
@@ -436,6 +1129,57 @@ def add_entry(session: Session, app_id: int, student_email: str, entry_text: str
         return None
 
 
+def add_entries(session: Session, app_id: int, student_email: str, entries: list[dict], create_at: datetime.datetime = None) -> list[int]:
+    """
+    This function adds a batch of entries of a student to the database in one transaction.
+    The membership is checked once for the whole batch and the entries are inserted
+    with a single executemany.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param app_id: int, the id of the app
+    @param student_email: str, the email of the student
+    @param entries: list[dict], the entries to add, each with the entry_text,
+        study_start_time and study_duration_minutes keys
+    @param create_at: datetime.datetime, the creation time of the entries, defaults to now
+
+    @return: list[int], the ids of the entries added in the given order, or None if the
+        student is not enrolled in the app
+    """
+    app = get_app(session, app_id, student_email)
+    user = get_user(session, student_email)
+    if app is None or user is None or user.role != "student" or not _check_user_in_app(session, app, user):
+        return None
+    if len(entries) == 0:
+        return []
+    if create_at is None:
+        create_at = datetime.datetime.now()
+    rows = [
+        {
+            "student_id": user.id,
+            "app_id": app.id,
+            "content": entry["entry_text"],
+            "study_start_time": datetime.datetime.fromtimestamp(entry["study_start_time"]),
+            "study_duration_minutes": entry["study_duration_minutes"],
+            "create_at": create_at,
+            "update_at": create_at,
+        }
+        for entry in entries
+    ]
+    if session.get_bind().dialect.insert_executemany_returning:
+        # A multi-row INSERT ... RETURNING, the ids of its rows are allocated
+        # in the order of the rows but may not be returned in that order
+        entry_ids = sorted(session.scalars(insert(models.Entry).returning(models.Entry.id), rows))
+    else:
+        added = [models.Entry(**row) for row in rows]
+        session.add_all(added)
+        session.flush()
+        entry_ids = [entry.id for entry in added]
+    count_entries(session, app.id, user.id, delta=len(entry_ids))
+    index_entries(session, [(entry_id, row["content"]) for entry_id, row in zip(entry_ids, rows)])
+    session.commit()
+    return entry_ids
+
+
 def get_entry(session: Session, entry_id: int, user_email: str) -> models.Entry:
     """
     This function returns an entry from the database.
@@ -449,9 +1193,9 @@ def get_entry(session: Session, entry_id: int, user_email: str) -> models.Entry:
             user = get_user(session, user_email)
             if user is not None and user.role == "student":
                 # Check if the student is enrolled in the app
-                if user.students[0] in app.enrolled_students:
+                if _check_user_in_app(session, app, user):
                     # Check if the student is the owner of the entry
-                    if user.students[0].id == entry.student_id:
+                    if user.id == entry.student_id:
                         return entry
                     else:
                         return None
@@ -459,7 +1203,7 @@ def get_entry(session: Session, entry_id: int, user_email: str) -> models.Entry:
                     return None
             elif user is not None and user.role == "professor":
                 # Check if the professor is the owner of the app
-                if user.professors[0] in get_course(session, app.binded_courses[0].id, user_email).professors:
+                if _check_user_in_app(session, app, user):
                     return entry
                 else:
                     return None
@@ -476,6 +1220,8 @@ def edit_entry(session: Session, entry_id: int, user_email: str, entry_text: str
         entry.study_start_time = datetime.datetime.fromtimestamp(study_start_time)
         entry.study_duration_minutes = study_duration_minutes
         entry.update_at = update_at
+        index_entries(session, [(entry.id, entry.content)])
+        bump_versions(session, entry.app_id, entries=True)
         session.commit()
         return entry
     else:
@@ -0,0 +1,267 @@
+"""
+This file handles the identity of a request: the user behind the JWT email, its role,
+the course and the app targeted by the route, and the membership of the user in them.
+
+The context is resolved once per request by resolve_request_context() in a single
+joined query and kept in the `info` of the request-scoped session, where the helpers
+of connect.py (get_user, get_course, get_app, ...) find it instead of looking the
+same rows up again. When the memberships of the user are in the cache of membership.py,
+the query only loads the rows and the membership flags are read from the cache.
+"""
+from sqlalchemy import exists, func, select
+from sqlalchemy.orm import Session
+from . import models
+from .membership import forget_membership, load_app_course_ids, load_membership, membership_cache
+
+
+class RequestContext:
+    """
+    The user, course and app resolved for a request, with the membership flags
+    computed by the database.
+
+    @attr email: str, the email from the JWT
+    @attr user: models.User, the user, or None if the email is not registered
+    @attr course_id: int, the id of the course resolved, or None
+    @attr course: models.Course, the course, or None if it does not exist
+    @attr in_course: bool, if the user is enrolled in (student) or teaches (professor) the course
+    @attr app_id: int, the id of the app resolved, or None
+    @attr app: models.App, the app, or None if it does not exist
+    @attr app_visible: bool, if the user belongs to the course the app is bound to
+    @attr in_app: bool, if the user is enrolled in (student) or teaches a course of (professor) the app
+    @attr app_in_course: bool, if the app is bound to the course resolved
+    @attr from_cache: bool, if the membership flags were read from the membership cache
+    """
+
+    def __init__(self, email: str):
+        self.email = email
+        self.user = None
+        self.course_id = None
+        self.course = None
+        self.in_course = False
+        self.app_id = None
+        self.app = None
+        self.app_visible = False
+        self.in_app = False
+        self.app_in_course = False
+        self.from_cache = False
+
+    @property
+    def role(self) -> str:
+        return self.user.role if self.user is not None else None
+
+    def __repr__(self):
+        return f'<RequestContext email={self.email} course_id={self.course_id} app_id={self.app_id}>'
+
+
+def _to_id(value) -> int:
+    # Ids come from the URL as strings, an invalid id matches no row
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _user_in_course(table, user_column, course_id):
+    # EXISTS on the association table linking the course to the user
+    return exists().where(
+        table.c.course_id == course_id,
+        user_column == models.User.id,
+    )
+
+
+def _resolve_from_cache(session: Session, context: RequestContext) -> bool:
+    # Fill the context with the rows of the request and the flags of the cached
+    # membership, only if every flag is set: a missing membership may have been
+    # added since it was cached, so the negative answers come from the database
+    cache = membership_cache()
+    membership = cache.user(context.email)
+    if membership is None or membership.role not in ("student", "professor"):
+        return False
+    app_course_ids = None
+    if context.app_id is not None:
+        app_course_ids = cache.app_course_ids(context.app_id)
+        if app_course_ids is None:
+            return False
+        if not (membership.app_visible(app_course_ids) and membership.in_app(context.app_id, app_course_ids)):
+            return False
+        if context.course_id is not None and context.course_id not in app_course_ids:
+            return False
+    if context.course_id is not None and not membership.in_course(context.course_id):
+        return False
+    columns = [models.User]
+    query = session.query(models.User)
+    if context.course_id is not None:
+        columns.append(models.Course)
+        query = query.outerjoin(models.Course, models.Course.id == context.course_id)
+    if context.app_id is not None:
+        columns.append(models.App)
+        query = query.outerjoin(models.App, models.App.id == context.app_id)
+    row = query.with_entities(*columns).filter(models.User.email == context.email).first()
+    if row is None:
+        return False
+    if context.course_id is None and context.app_id is None:
+        context.user = row
+    else:
+        context.user = row.User
+    if context.course_id is not None:
+        context.course = row.Course
+        context.in_course = True
+    if context.app_id is not None:
+        context.app = row.App
+        context.app_visible = True
+        context.in_app = True
+        context.app_in_course = context.course_id is not None
+    context.from_cache = True
+    return True
+
+
+def _is_member(context: RequestContext) -> bool:
+    # If the user belongs to everything the request names, as the cache would tell
+    if context.user is None:
+        return False
+    if context.course_id is not None and not context.in_course:
+        return False
+    if context.app_id is not None and not (
+        context.app_visible and context.in_app and (context.course_id is None or context.app_in_course)
+    ):
+        return False
+    return True
+
+
+def resolve_request_context(session: Session, email: str, course_id: int = None, app_id: int = None) -> RequestContext:
+    """
+    This function resolves the user, the course and the app of a request with one
+    joined query, and stores the context in the session so the helpers of connect.py
+    reuse it. As the role is not known before the user is loaded, the membership
+    flags are computed for both roles and the ones of the user's role are kept.
+    When the membership cache holds the user (and the app), and the user belongs to
+    the course and the app, the flags are read from it and the query only loads
+    the rows. The collections of the rows are lazy (see models.py) and are not
+    loaded by the preamble, the helpers reading them load them.
+
+    @param session: sqlalchemy.orm.session.Session, the request-scoped session
+    @param email: str, the email from the JWT
+    @param course_id: int, the id of the course in the route, if any
+    @param app_id: int, the id of the app in the route, if any
+    """
+    context = RequestContext(email)
+    context.course_id = _to_id(course_id)
+    context.app_id = _to_id(app_id)
+    cache = membership_cache()
+    if _resolve_from_cache(session, context):
+        cache.count_hit()
+        session.info["request_context"] = context
+        return context
+    cached = cache.user(email) is not None and (
+        context.app_id is None or cache.app_course_ids(context.app_id) is not None
+    )
+    if cached:
+        # A negative answer of the cache, checked against the database
+        cache.count_fallback()
+    else:
+        cache.count_miss()
+    _resolve_from_database(session, context)
+    if cached and _is_member(context):
+        # The membership was added since it was cached (e.g. by another worker)
+        forget_membership(email, context.app_id)
+        cached = False
+    if context.user is not None and not cached:
+        # Fill the cache for the next requests of the user
+        if cache.user(email) is None:
+            load_membership(session, email)
+        if context.app is not None and cache.app_course_ids(context.app_id) is None:
+            load_app_course_ids(session, context.app_id)
+    session.info["request_context"] = context
+    return context
+
+
+def _resolve_from_database(session: Session, context: RequestContext):
+    # The rows and the membership flags of the request in one joined query
+    email = context.email
+    columns = [models.User]
+    if context.course_id is not None:
+        columns += [
+            models.Course,
+            _user_in_course(
+                models.course_student_table, models.course_student_table.c.student_id, models.Course.id
+            ).label("student_in_course"),
+            _user_in_course(
+                models.course_professor_table, models.course_professor_table.c.professor_id, models.Course.id
+            ).label("professor_in_course"),
+        ]
+    if context.app_id is not None:
+        # get_app checks the first course the app is bound to
+        first_course_id = select(func.min(models.course_app_table.c.course_id)).where(
+            models.course_app_table.c.app_id == models.App.id
+        ).scalar_subquery()
+        columns += [
+            models.App,
+            _user_in_course(
+                models.course_student_table, models.course_student_table.c.student_id, first_course_id
+            ).label("student_app_visible"),
+            _user_in_course(
+                models.course_professor_table, models.course_professor_table.c.professor_id, first_course_id
+            ).label("professor_app_visible"),
+            exists().where(
+                models.app_student_table.c.app_id == models.App.id,
+                models.app_student_table.c.student_id == models.User.id,
+            ).label("student_in_app"),
+            exists().where(
+                models.course_app_table.c.app_id == models.App.id,
+                models.course_app_table.c.course_id == models.course_professor_table.c.course_id,
+                models.course_professor_table.c.professor_id == models.User.id,
+            ).label("professor_in_app"),
+            exists().where(
+                models.course_app_table.c.app_id == models.App.id,
+                models.course_app_table.c.course_id == context.course_id,
+            ).label("app_in_course"),
+        ]
+    query = session.query(*columns).select_from(models.User)
+    if context.course_id is not None:
+        query = query.outerjoin(models.Course, models.Course.id == context.course_id)
+    if context.app_id is not None:
+        query = query.outerjoin(models.App, models.App.id == context.app_id)
+    row = query.filter(models.User.email == email).first()
+    if row is None:
+        return
+    if context.course_id is None and context.app_id is None:
+        # A single entity is returned as is
+        context.user = row
+    else:
+        context.user = row.User
+    # Keep the flags of the user's role, other roles belong to nothing
+    role = context.user.role if context.user.role in ("student", "professor") else None
+    if context.course_id is not None:
+        context.course = row.Course
+        if context.course is not None and role is not None:
+            context.in_course = bool(getattr(row, f"{role}_in_course"))
+    if context.app_id is not None:
+        context.app = row.App
+        if context.app is not None and role is not None:
+            context.app_visible = bool(getattr(row, f"{role}_app_visible"))
+            context.in_app = bool(getattr(row, f"{role}_in_app"))
+            context.app_in_course = bool(row.app_in_course)
+
+
+def cached_request_context(session: Session, email: str) -> RequestContext:
+    """
+    This function returns the context resolved for the given email in this session,
+    or None if there is none.
+
+    @param session: sqlalchemy.orm.session.Session, the request-scoped session
+    @param email: str, the email of the user
+    """
+    context = session.info.get("request_context")
+    if context is not None and context.email == email:
+        return context
+    return None
+
+
+def forget_request_context(session: Session):
+    """
+    This function drops the context of the session, after a write that may change
+    the membership of the user.
+
+    @param session: sqlalchemy.orm.session.Session, the request-scoped session
+    """
+    session.info.pop("request_context", None)
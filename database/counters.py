@@ -0,0 +1,256 @@
+"""
+This file maintains the counters of the apps: the students enrolled in each app, the
+entries submitted to each app, and the entries of each student in each app.
+
+The counters are updated by the writes of connect.py in the same transaction as the
+rows they count, so the listings read them instead of counting rows. Any new path
+adding or deleting enrollments or entries must update them too, with a negative
+delta for deletions. rebuild_counters() recomputes them from the rows, it is run by
+the migration creating them and by `scripts/reconcile_counters.py`.
+
+The same rows hold the versions of each app: the version of its entries, bumped by
+every entry added or edited, of its settings, and of its stopwords. They only grow,
+so a response built from the same versions is the same, and the routes derive their
+ETags from them (see read_app_versions()). rebuild_counters() leaves them as they are.
+
+The functions only use `execute`, so they accept a Session or a Connection.
+"""
+from sqlalchemy import func, select
+from . import models
+
+
+_app_counters = models.AppCounter.__table__
+_app_student_counters = models.AppStudentCounter.__table__
+
+
+def _count_app(connection, app_id: int) -> dict:
+    # The counters of an app computed from the rows
+    return {
+        "app_id": app_id,
+        "num_students": connection.execute(
+            select(func.count()).select_from(models.app_student_table).where(
+                models.app_student_table.c.app_id == app_id
+            )
+        ).scalar(),
+        "num_entries": connection.execute(
+            select(func.count()).select_from(models.Entry.__table__).where(
+                models.Entry.app_id == app_id
+            )
+        ).scalar(),
+    }
+
+
+def _count_app_student(connection, app_id: int, student_id: int) -> dict:
+    return {
+        "app_id": app_id,
+        "student_id": student_id,
+        "num_entries": connection.execute(
+            select(func.count()).select_from(models.Entry.__table__).where(
+                models.Entry.app_id == app_id,
+                models.Entry.student_id == student_id,
+            )
+        ).scalar(),
+    }
+
+
+def add_app_counters(connection, app_id: int):
+    """
+    This function creates the counters of a new app.
+
+    @param connection: the Session or Connection of the transaction creating the app
+    @param app_id: int, the id of the app
+    """
+    connection.execute(_app_counters.insert().values(app_id=app_id, num_students=0, num_entries=0))
+
+
+def count_enrollment(connection, app_id: int, student_id: int, delta: int = 1):
+    """
+    This function updates the counters after students joined (or left, with a
+    negative delta) an app. The rows must be written in the same transaction first.
+
+    @param connection: the Session or Connection of the transaction
+    @param app_id: int, the id of the app
+    @param student_id: int, the id of the student
+    @param delta: int, the number of students added
+    """
+    updated = connection.execute(
+        _app_counters.update().where(_app_counters.c.app_id == app_id).values(
+            num_students=_app_counters.c.num_students + delta
+        )
+    ).rowcount
+    if updated == 0:
+        # The counters of the app are missing, create them from the rows
+        connection.execute(_app_counters.insert().values(**_count_app(connection, app_id)))
+    # The entries of the student in the app are counted from now on
+    student_counted = connection.execute(
+        select(_app_student_counters.c.num_entries).where(
+            _app_student_counters.c.app_id == app_id,
+            _app_student_counters.c.student_id == student_id,
+        )
+    ).first() is not None
+    if delta > 0 and not student_counted:
+        connection.execute(_app_student_counters.insert().values(
+            **_count_app_student(connection, app_id, student_id)
+        ))
+
+
+def count_entries(connection, app_id: int, student_id: int, delta: int = 1):
+    """
+    This function updates the counters after entries were added to (or deleted
+    from, with a negative delta) an app by a student. The rows must be written
+    in the same transaction first.
+
+    @param connection: the Session or Connection of the transaction
+    @param app_id: int, the id of the app
+    @param student_id: int, the id of the student
+    @param delta: int, the number of entries added
+    """
+    updated = connection.execute(
+        _app_counters.update().where(_app_counters.c.app_id == app_id).values(
+            num_entries=_app_counters.c.num_entries + delta,
+            entries_version=_app_counters.c.entries_version + 1,
+        )
+    ).rowcount
+    if updated == 0:
+        connection.execute(_app_counters.insert().values(**_count_app(connection, app_id)))
+    updated = connection.execute(
+        _app_student_counters.update().where(
+            _app_student_counters.c.app_id == app_id,
+            _app_student_counters.c.student_id == student_id,
+        ).values(num_entries=_app_student_counters.c.num_entries + delta)
+    ).rowcount
+    if updated == 0:
+        connection.execute(_app_student_counters.insert().values(
+            **_count_app_student(connection, app_id, student_id)
+        ))
+
+
+def bump_versions(connection, app_id: int, entries: bool = False, app: bool = False, stopwords: bool = False):
+    """
+    This function bumps the versions of an app after a write which does not change
+    its counters, such as the edit of an entry or of the app. count_entries() already
+    bumps the version of the entries.
+
+    @param connection: the Session or Connection of the transaction
+    @param app_id: int, the id of the app
+    @param entries: bool, if the entries of the app changed
+    @param app: bool, if the settings of the app changed
+    @param stopwords: bool, if the stopwords of the app changed
+    """
+    values = {}
+    if entries:
+        values["entries_version"] = _app_counters.c.entries_version + 1
+    if app:
+        values["app_version"] = _app_counters.c.app_version + 1
+    if stopwords:
+        values["stopwords_version"] = _app_counters.c.stopwords_version + 1
+    if len(values) == 0:
+        return
+    updated = connection.execute(
+        _app_counters.update().where(_app_counters.c.app_id == app_id).values(**values)
+    ).rowcount
+    if updated == 0:
+        # The counters of the app are missing, create them from the rows
+        connection.execute(_app_counters.insert().values(**_count_app(connection, app_id)))
+
+
+def read_app_versions(connection, app_ids: list = None, course_id: int = None) -> list:
+    """
+    This function returns the counters and the versions of the given apps, or of
+    the apps of the given course, ordered by app id.
+
+    @param connection: the Session or Connection to use
+    @param app_ids: list, the ids of the apps
+    @param course_id: int, the id of the course whose apps are read
+
+    @return: list[sqlalchemy.engine.Row], rows with the app_id, the counters and the versions
+    """
+    query = select(
+        _app_counters.c.app_id, _app_counters.c.num_students, _app_counters.c.num_entries,
+        _app_counters.c.entries_version, _app_counters.c.app_version, _app_counters.c.stopwords_version,
+    ).order_by(_app_counters.c.app_id)
+    if app_ids is not None:
+        query = query.where(_app_counters.c.app_id.in_(app_ids))
+    if course_id is not None:
+        query = query.join(
+            models.course_app_table, models.course_app_table.c.app_id == _app_counters.c.app_id
+        ).where(models.course_app_table.c.course_id == course_id)
+    return connection.execute(query).all()
+
+
+def rebuild_counters(connection) -> dict:
+    """
+    This function recomputes every counter from the rows and fixes the ones which
+    drifted. It returns the number of counters fixed in each table. The caller
+    commits the transaction.
+
+    @param connection: the Session or Connection of the transaction
+    """
+    app_ids = connection.execute(select(models.App.id)).scalars().all()
+    expected_apps = {app_id: {"num_students": 0, "num_entries": 0} for app_id in app_ids}
+    for app_id, count in connection.execute(
+        select(models.app_student_table.c.app_id, func.count()).group_by(models.app_student_table.c.app_id)
+    ):
+        expected_apps[app_id]["num_students"] = count
+    # Students enrolled in an app have counters even without entries
+    expected_students = {
+        (app_id, student_id): 0
+        for app_id, student_id in connection.execute(
+            select(models.app_student_table.c.app_id, models.app_student_table.c.student_id)
+        )
+    }
+    for app_id, student_id, count in connection.execute(
+        select(models.Entry.app_id, models.Entry.student_id, func.count()).group_by(
+            models.Entry.app_id, models.Entry.student_id
+        )
+    ):
+        expected_apps[app_id]["num_entries"] += count
+        expected_students[(app_id, student_id)] = count
+
+    fixed = {_app_counters.name: 0, _app_student_counters.name: 0}
+    found_apps = {
+        row.app_id: {"num_students": row.num_students, "num_entries": row.num_entries}
+        for row in connection.execute(
+            select(_app_counters.c.app_id, _app_counters.c.num_students, _app_counters.c.num_entries)
+        )
+    }
+    for app_id, counters in expected_apps.items():
+        if app_id not in found_apps:
+            connection.execute(_app_counters.insert().values(app_id=app_id, **counters))
+        elif found_apps[app_id] != counters:
+            connection.execute(
+                _app_counters.update().where(_app_counters.c.app_id == app_id).values(**counters)
+            )
+        else:
+            continue
+        fixed[_app_counters.name] += 1
+    for app_id in found_apps.keys() - expected_apps.keys():
+        connection.execute(_app_counters.delete().where(_app_counters.c.app_id == app_id))
+        fixed[_app_counters.name] += 1
+
+    found_students = {
+        (row.app_id, row.student_id): row.num_entries
+        for row in connection.execute(select(_app_student_counters))
+    }
+    for (app_id, student_id), num_entries in expected_students.items():
+        if (app_id, student_id) not in found_students:
+            connection.execute(_app_student_counters.insert().values(
+                app_id=app_id, student_id=student_id, num_entries=num_entries
+            ))
+        elif found_students[(app_id, student_id)] != num_entries:
+            connection.execute(
+                _app_student_counters.update().where(
+                    _app_student_counters.c.app_id == app_id,
+                    _app_student_counters.c.student_id == student_id,
+                ).values(num_entries=num_entries)
+            )
+        else:
+            continue
+        fixed[_app_student_counters.name] += 1
+    for app_id, student_id in found_students.keys() - expected_students.keys():
+        connection.execute(_app_student_counters.delete().where(
+            _app_student_counters.c.app_id == app_id,
+            _app_student_counters.c.student_id == student_id,
+        ))
+        fixed[_app_student_counters.name] += 1
+    return fixed
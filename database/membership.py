@@ -0,0 +1,272 @@
+"""
+This file handles the cache of the memberships of the users in each worker process:
+the role of a user with the ids of the courses they belong to and of the apps they
+are enrolled in, and the ids of the courses each app is bound to. The membership
+checks of the requests are answered from it instead of the database.
+
+The memberships only grow (there is no way to leave a course or an app), so a
+membership found in the cache is always true, while a missing one may be a fact
+added since the cache was filled, by another worker for instance: the negative
+answers are checked against the database. The write helpers of connect.py drop the
+entries they change (join_course, join_app, adding_course, add_app, adding_user) so
+the worker which wrote sees the change at once, and every entry expires after a TTL.
+"""
+from collections import OrderedDict
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from . import models
+import os
+import threading
+import time
+
+
+class Membership:
+    """
+    The membership of a user.
+
+    @attr user_id: int, the id of the user
+    @attr role: str, the role of the user ('student' or 'professor')
+    @attr course_ids: frozenset, the ids of the courses the user is enrolled in (student) or teaches (professor)
+    @attr app_ids: frozenset, the ids of the apps the user is enrolled in (student only)
+    """
+    __slots__ = ("user_id", "role", "course_ids", "app_ids")
+
+    def __init__(self, user_id: int, role: str, course_ids: frozenset, app_ids: frozenset):
+        self.user_id = user_id
+        self.role = role
+        self.course_ids = course_ids
+        self.app_ids = app_ids
+
+    def in_course(self, course_id: int) -> bool:
+        return course_id in self.course_ids
+
+    def in_app(self, app_id: int, app_course_ids: frozenset) -> bool:
+        if self.role == "student":
+            return app_id in self.app_ids
+        # A professor belongs to the apps bound to a course they teach
+        return not self.course_ids.isdisjoint(app_course_ids)
+
+    def app_visible(self, app_course_ids: frozenset) -> bool:
+        # get_app checks the first course the app is bound to
+        return len(app_course_ids) > 0 and min(app_course_ids) in self.course_ids
+
+    def __repr__(self):
+        return f'<Membership user_id={self.user_id} role={self.role}>'
+
+
+class MembershipCache:
+    """
+    The bounded LRU cache of the memberships by user email, and of the courses of
+    the apps by app id, each entry expiring after the TTL.
+
+    @param max_size: int, the maximum number of users (and of apps) kept, zero disables the cache
+    @param ttl: float, the number of seconds an entry is kept
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+        self.invalidations = 0
+        self._users = OrderedDict()
+        # The emails of the users cached, by user id
+        self._emails = {}
+        self._apps = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, entries: OrderedDict, key):
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del entries[key]
+            return None
+        entries.move_to_end(key)
+        return value
+
+    def _put(self, entries: OrderedDict, key, value):
+        entries[key] = (value, time.monotonic() + self.ttl)
+        entries.move_to_end(key)
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+
+    def user(self, email: str) -> Membership:
+        with self._lock:
+            return self._get(self._users, email)
+
+    def user_by_id(self, user_id: int) -> Membership:
+        with self._lock:
+            email = self._emails.get(user_id)
+            return self._get(self._users, email) if email is not None else None
+
+    def put_user(self, email: str, membership: Membership):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._put(self._users, email, membership)
+            self._emails[membership.user_id] = email
+            if len(self._emails) > 2 * self.max_size:
+                # Drop the ids of the users evicted
+                self._emails = {user_id: email for user_id, email in self._emails.items() if email in self._users}
+
+    def app_course_ids(self, app_id: int) -> frozenset:
+        with self._lock:
+            return self._get(self._apps, app_id)
+
+    def put_app(self, app_id: int, course_ids: frozenset):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._put(self._apps, app_id, course_ids)
+
+    def forget_user(self, email: str):
+        with self._lock:
+            if self._users.pop(email, None) is not None:
+                self.invalidations += 1
+
+    def forget_app(self, app_id: int):
+        with self._lock:
+            if self._apps.pop(app_id, None) is not None:
+                self.invalidations += 1
+
+    def count_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def count_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def count_fallback(self):
+        with self._lock:
+            self.fallbacks += 1
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+            self._emails.clear()
+            self._apps.clear()
+            self.hits = self.misses = self.fallbacks = self.invalidations = 0
+
+    def stats(self) -> dict:
+        """
+        This method returns the metrics of the cache: the requests resolved from it
+        (hits), the ones which had to load the membership (misses), the ones whose
+        negative answer was checked against the database (fallbacks), the entries
+        dropped by the writes (invalidations), and the hit rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses + self.fallbacks
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "fallbacks": self.fallbacks,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+                "users": len(self._users),
+                "apps": len(self._apps),
+                "max_size": self.max_size,
+            }
+
+
+# The cache of this worker process, sized by configure_membership_cache()
+_cache = MembershipCache()
+
+
+def configure_membership_cache(max_size: int, ttl: float):
+    """
+    This function replaces the cache of the process by an empty one of the given size.
+
+    @param max_size: int, the maximum number of users (and of apps) kept, zero disables the cache
+    @param ttl: float, the number of seconds an entry is kept
+    """
+    global _cache
+    _cache = MembershipCache(max_size, ttl)
+
+
+def membership_cache() -> MembershipCache:
+    """
+    This function returns the cache of the process.
+    """
+    return _cache
+
+
+def _reset_cache_after_fork():
+    # Each worker process keeps its own cache, and its lock may have been held
+    # by another thread of the parent when it forked
+    configure_membership_cache(_cache.max_size, _cache.ttl)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_cache_after_fork)
+
+
+def load_membership(session: Session, email: str) -> Membership:
+    """
+    This function reads the membership of a user from the database and caches it.
+    It returns None if the user is not registered.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param email: str, the email of the user
+    """
+    user = session.execute(
+        select(models.User.id, models.User.role).where(models.User.email == email)
+    ).first()
+    if user is None:
+        return None
+    course_ids = frozenset()
+    app_ids = frozenset()
+    if user.role == "student":
+        course_ids = frozenset(session.scalars(
+            select(models.course_student_table.c.course_id).where(models.course_student_table.c.student_id == user.id)
+        ))
+        app_ids = frozenset(session.scalars(
+            select(models.app_student_table.c.app_id).where(models.app_student_table.c.student_id == user.id)
+        ))
+    elif user.role == "professor":
+        course_ids = frozenset(session.scalars(
+            select(models.course_professor_table.c.course_id).where(models.course_professor_table.c.professor_id == user.id)
+        ))
+    membership = Membership(user.id, user.role, course_ids, app_ids)
+    _cache.put_user(email, membership)
+    return membership
+
+
+def load_app_course_ids(session: Session, app_id: int) -> frozenset:
+    """
+    This function reads the ids of the courses an app is bound to from the database
+    and caches them. An app bound to no course (or missing) is not cached.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param app_id: int, the id of the app
+    """
+    course_ids = frozenset(session.scalars(
+        select(models.course_app_table.c.course_id).where(models.course_app_table.c.app_id == app_id)
+    ))
+    if len(course_ids) > 0:
+        _cache.put_app(app_id, course_ids)
+    return course_ids
+
+
+def forget_membership(email: str = None, app_id: int = None):
+    """
+    This function drops the membership of a user, or the courses of an app, from the
+    cache, after a write changing them.
+
+    @param email: str, the email of the user
+    @param app_id: int, the id of the app
+    """
+    if email is not None:
+        _cache.forget_user(email)
+    if app_id is not None:
+        _cache.forget_app(app_id)
+
+
+def membership_cache_stats() -> dict:
+    """
+    This function returns the metrics of the cache of the process (see MembershipCache.stats()).
+    """
+    return _cache.stats()
@@ -0,0 +1,198 @@
+"""
+This file handles the bootstrap and the migrations of the database schema.
+
+The schema is created or upgraded once by `scripts/migrate.py` (or at startup
+when `DATABASE_AUTO_MIGRATE` is set), and every version reached is recorded in
+the `schema_version` table. Workers only compare the recorded version with
+SCHEMA_VERSION when they boot and never inspect the schema while serving requests.
+
+To change the schema, update the models, add a function to MIGRATIONS keyed by the
+next version number and bump SCHEMA_VERSION. Migrations should be safe to run on a
+database where the change already exists (e.g. use `checkfirst=True`), as a legacy
+database is first completed with the tables it is missing.
+"""
+from sqlalchemy import Column, Integer, MetaData, Table, exc, func, inspect, select
+from sqlalchemy.engine import Connection, Engine
+from . import models
+from .counters import rebuild_counters
+from .search import create_search_index
+import datetime
+
+
+# The version of the schema described by the models
+SCHEMA_VERSION = 6
+
+def _create_indexes(connection: Connection, table_names: list):
+    # Create the indexes declared on the models for the given tables,
+    # skipping the ones that already exist
+    for table_name in table_names:
+        for index in models.Model.metadata.tables[table_name].indexes:
+            index.create(connection, checkfirst=True)
+
+
+def _add_access_path_indexes(connection: Connection):
+    _create_indexes(connection, [
+        "entries",
+        "stopwords",
+        "course_student",
+        "course_professor",
+        "course_app",
+        "app_student",
+        # app_entry is dropped by migration 3, its index is not needed anymore
+    ])
+
+
+# The app_entry association of schema versions 1 and 2, duplicating entries.app_id
+_legacy_app_entry_table = Table('app_entry', MetaData(),
+    Column('app_id', Integer, primary_key=True),
+    Column('entry_id', Integer, primary_key=True),
+)
+
+
+def _drop_app_entry(connection: Connection):
+    if _legacy_app_entry_table.name not in inspect(connection).get_table_names():
+        return
+    entries = models.Entry.__table__
+    app_entry = _legacy_app_entry_table
+    # Backfill the entries which would only be linked to their app by app_entry
+    connection.execute(
+        entries.update().where(entries.c.app_id.is_(None)).values(
+            app_id=select(app_entry.c.app_id).where(
+                app_entry.c.entry_id == entries.c.id
+            ).scalar_subquery()
+        )
+    )
+    # Verify both links agree before dropping one of them
+    unlinked = connection.execute(
+        select(func.count()).select_from(entries).where(entries.c.app_id.is_(None))
+    ).scalar()
+    conflicting = connection.execute(
+        select(func.count()).select_from(
+            app_entry.join(entries, entries.c.id == app_entry.c.entry_id)
+        ).where(app_entry.c.app_id != entries.c.app_id)
+    ).scalar()
+    if unlinked or conflicting:
+        raise RuntimeError(
+            f"Cannot drop app_entry: {unlinked} entries have no app and " +
+            f"{conflicting} app_entry rows disagree with entries.app_id, fix them first."
+        )
+    app_entry.drop(connection)
+
+
+def _add_counters(connection: Connection):
+    for table in (models.AppCounter.__table__, models.AppStudentCounter.__table__):
+        table.create(connection, checkfirst=True)
+    rebuild_counters(connection)
+
+
+def _add_search_index(connection: Connection):
+    # Databases without FTS5 use the LIKE fallback of search.py
+    create_search_index(connection)
+
+
+def _add_versions(connection: Connection):
+    # The versions start at 0 for the existing apps
+    counters = models.AppCounter.__table__
+    found_columns = {column["name"] for column in inspect(connection).get_columns(counters.name)}
+    for name in ("entries_version", "app_version", "stopwords_version"):
+        if name not in found_columns:
+            connection.exec_driver_sql(
+                f"ALTER TABLE {counters.name} ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0"
+            )
+
+
+# Migrations upgrading the schema to the version used as the key,
+# each one is given the connection of the migration transaction
+MIGRATIONS = {
+    2: _add_access_path_indexes,
+    3: _drop_app_entry,
+    4: _add_counters,
+    5: _add_search_index,
+    6: _add_versions,
+}
+
+# Databases created before the schema was versioned are treated as this version
+LEGACY_SCHEMA_VERSION = 1
+
+
+def current_version(connection: Connection) -> int:
+    """
+    This function returns the version recorded in the database, or None if the
+    database has not been bootstrapped yet.
+
+    @param connection: sqlalchemy.engine.Connection, the connection to use
+    """
+    try:
+        return connection.execute(
+            select(func.max(models.SchemaVersion.version))
+        ).scalar()
+    except exc.DBAPIError:
+        return None
+
+
+def _record_version(connection: Connection, version: int):
+    connection.execute(
+        models.SchemaVersion.__table__.insert().values(
+            version=version,
+            applied_at=datetime.datetime.now()
+        )
+    )
+
+
+def migrate(engine: Engine) -> tuple:
+    """
+    This function creates the schema of an empty database, or upgrades an existing
+    one to SCHEMA_VERSION. It returns the version found and the version reached.
+
+    @param engine: sqlalchemy.engine.Engine, the engine of the database to migrate
+    """
+    with engine.begin() as connection:
+        table_names = inspect(connection).get_table_names()
+        found_version = None
+        if models.SchemaVersion.__tablename__ in table_names:
+            found_version = current_version(connection)
+        if found_version is None and models.User.__tablename__ not in table_names:
+            # Empty database, create the latest schema directly,
+            # with the objects the models do not describe
+            models.Model.metadata.create_all(connection)
+            create_search_index(connection)
+            _record_version(connection, SCHEMA_VERSION)
+            return None, SCHEMA_VERSION
+        if found_version is None:
+            # The database was created before the schema was versioned,
+            # add the tables it may miss and continue from the legacy version
+            models.Model.metadata.create_all(connection)
+            found_version = LEGACY_SCHEMA_VERSION
+            _record_version(connection, found_version)
+        if found_version > SCHEMA_VERSION:
+            raise RuntimeError(
+                f"The database schema version {found_version} is newer than " +
+                f"the version {SCHEMA_VERSION} supported by this code."
+            )
+        for version in range(found_version + 1, SCHEMA_VERSION + 1):
+            MIGRATIONS[version](connection)
+            _record_version(connection, version)
+        return found_version, SCHEMA_VERSION
+
+
+def check_schema_version(engine: Engine):
+    """
+    This function checks that the database has been migrated to SCHEMA_VERSION.
+    It only reads the recorded version, so it is cheap enough to run on every boot.
+
+    @param engine: sqlalchemy.engine.Engine, the engine of the database to check
+
+    @raise RuntimeError: if the database is not bootstrapped or has another version
+    """
+    with engine.connect() as connection:
+        version = current_version(connection)
+    if version is None:
+        raise RuntimeError(
+            "The database schema is not bootstrapped, " +
+            "run `python scripts/migrate.py` first."
+        )
+    if version != SCHEMA_VERSION:
+        raise RuntimeError(
+            f"The database schema version is {version} but {SCHEMA_VERSION} is required, " +
+            "run `python scripts/migrate.py` to upgrade it."
+        )
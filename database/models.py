@@ -1,6 +1,6 @@
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import (Column, Date, Float, Boolean, ForeignKey, ForeignKeyConstraint, 
-                        TIMESTAMP, Integer, String, Table, UniqueConstraint, and_, func,
+                        Index, TIMESTAMP, Integer, String, Table, UniqueConstraint, and_, func,
                         inspect, or_)
 from sqlalchemy.orm import Mapped, backref, relationship
 from datetime import datetime
@@ -8,30 +8,36 @@ from datetime import datetime
 
 Model = declarative_base()
 
+# Loading strategy of the relationships:
+# - "joined" for many-to-one relationships that are needed with their parent,
+# - "select" (lazy) for the collections, which the request preamble and most routes
+#   never read; the helpers in connect.py reading them load them with query options
+#   (selectinload()) or as rows, and unplanned lazy loads raise when the engine runs
+#   with raiseload enabled.
+
 course_student_table = Table('course_student', Model.metadata,
     Column('course_id', Integer, ForeignKey('courses.id'), primary_key=True),
-    Column('student_id', Integer, ForeignKey('students.id'), primary_key=True)
+    Column('student_id', Integer, ForeignKey('students.id'), primary_key=True),
+    # The primary key serves course -> students, this serves student -> courses
+    Index('ix_course_student_student_id', 'student_id', 'course_id')
 )
 
 course_professor_table = Table('course_professor', Model.metadata,
     Column('course_id', Integer, ForeignKey('courses.id'), primary_key=True),
-    Column('professor_id', Integer, ForeignKey('professors.id'), primary_key=True)
+    Column('professor_id', Integer, ForeignKey('professors.id'), primary_key=True),
+    Index('ix_course_professor_professor_id', 'professor_id', 'course_id')
 )
 
 course_app_table = Table('course_app', Model.metadata,
     Column('course_id', Integer, ForeignKey('courses.id'), primary_key=True),
-    Column('app_id', Integer, ForeignKey('apps.id'), primary_key=True)
-)
-
-app_student_table = Table('app_student', Model.metadata,
     Column('app_id', Integer, ForeignKey('apps.id'), primary_key=True),
-    Column('student_id', Integer, ForeignKey('students.id'), primary_key=True)
+    Index('ix_course_app_app_id', 'app_id', 'course_id')
 )
 
-
-app_entry_table = Table('app_entry', Model.metadata,
+app_student_table = Table('app_student', Model.metadata,
     Column('app_id', Integer, ForeignKey('apps.id'), primary_key=True),
-    Column('entry_id', Integer, ForeignKey('entries.id'), primary_key=True)
+    Column('student_id', Integer, ForeignKey('students.id'), primary_key=True),
+    Index('ix_app_student_student_id', 'student_id', 'app_id')
 )
 
 
@@ -43,8 +49,8 @@ class User(Model):
     email: Mapped[str] = Column(String(50), nullable=False, unique=True)
     role: Mapped[str] = Column(String(50), nullable=False)
     
-    professors: Mapped[list['Professor']] = relationship("Professor", back_populates="users")
-    students: Mapped[list['Student']] = relationship("Student", back_populates="users")
+    professors: Mapped[list['Professor']] = relationship("Professor", back_populates="users", lazy="select")
+    students: Mapped[list['Student']] = relationship("Student", back_populates="users", lazy="select")
 
     def __repr__(self):
         return f'<User first_name={self.first_name} last_name={self.last_name} email={self.email} role={self.role}>'
@@ -54,10 +60,10 @@ class Student(Model):
     id: Mapped[int] = Column(Integer, ForeignKey('users.id'), primary_key=True)
     email: Mapped[str] = Column(String(50), nullable=False, unique=True)
     
-    users: Mapped[User] = relationship('User', back_populates='students')
-    entry_list: Mapped[list['Entry']] = relationship('Entry', back_populates='student')
-    courses: Mapped[list['Course']] = relationship('Course', secondary=course_student_table, back_populates='students')
-    enrolled_apps: Mapped[list['App']] = relationship('App', secondary=app_student_table, back_populates='enrolled_students')
+    users: Mapped[User] = relationship('User', back_populates='students', lazy='joined')
+    entry_list: Mapped[list['Entry']] = relationship('Entry', back_populates='student', lazy='select')
+    courses: Mapped[list['Course']] = relationship('Course', secondary=course_student_table, back_populates='students', lazy='select')
+    enrolled_apps: Mapped[list['App']] = relationship('App', secondary=app_student_table, back_populates='enrolled_students', lazy='select')
 
     def __repr__(self):
         return f'<Student email={self.email}>'
@@ -67,8 +73,8 @@ class Professor(Model):
     id: Mapped[int] = Column(Integer, ForeignKey('users.id'), primary_key=True)
     email: Mapped[str] = Column(String(50), nullable=False, unique=True)
     
-    users: Mapped[list['User']] = relationship('User', back_populates='professors')
-    courses: Mapped[list['Course']] = relationship('Course', secondary=course_professor_table, back_populates='professors')
+    users: Mapped[list['User']] = relationship('User', back_populates='professors', lazy='joined')
+    courses: Mapped[list['Course']] = relationship('Course', secondary=course_professor_table, back_populates='professors', lazy='select')
 
     def __repr__(self):
         return f'<Professor email={self.email}>'
@@ -79,9 +85,9 @@ class Course(Model):
     name: Mapped[str] = Column(String(50), nullable=False)
     identifier: Mapped[str] = Column(String(50), nullable=False)
     
-    students: Mapped[list['Student']] = relationship('Student', secondary=course_student_table, back_populates='courses')
-    professors: Mapped[list['Professor']] = relationship('Professor', secondary=course_professor_table, back_populates='courses')
-    apps: Mapped[list['App']] = relationship('App', secondary=course_app_table, back_populates='binded_courses')
+    students: Mapped[list['Student']] = relationship('Student', secondary=course_student_table, back_populates='courses', lazy='select')
+    professors: Mapped[list['Professor']] = relationship('Professor', secondary=course_professor_table, back_populates='courses', lazy='select')
+    apps: Mapped[list['App']] = relationship('App', secondary=course_app_table, back_populates='binded_courses', lazy='select')
     
     def __repr__(self):
         return f'<Course name={self.name} identifier={self.identifier}>'
@@ -97,10 +103,10 @@ class App(Model):
     max_students: Mapped[int] = Column(Integer, nullable=False) # Maximum number of students in the app
     template: Mapped[str] = Column(String(50), nullable=False) # Template of the app
     
-    enrolled_students: Mapped[list['Student']] = relationship('Student', secondary=app_student_table, back_populates='enrolled_apps')
-    binded_courses: Mapped[list['Course']] = relationship('Course', secondary=course_app_table, back_populates='apps')
-    entry_list: Mapped[list['Entry']] = relationship('Entry', secondary=app_entry_table, back_populates='app')
-    stopwords: Mapped[list['Stopword']] = relationship('Stopword', back_populates='app')
+    enrolled_students: Mapped[list['Student']] = relationship('Student', secondary=app_student_table, back_populates='enrolled_apps', lazy='select')
+    binded_courses: Mapped[list['Course']] = relationship('Course', secondary=course_app_table, back_populates='apps', lazy='select')
+    entry_list: Mapped[list['Entry']] = relationship('Entry', back_populates='app', lazy='select')
+    stopwords: Mapped[list['Stopword']] = relationship('Stopword', back_populates='app', lazy='select')
     
     def __repr__(self):
         return f'<App intro={self.intro} start_time={self.start_time} end_time={self.end_time} num_entries={self.num_entries} max_students={self.max_students}>'
@@ -108,13 +114,16 @@ class App(Model):
 
 class Stopword(Model):
     __tablename__ = 'stopwords'
+    __table_args__ = (
+        Index('ix_stopwords_app_id', 'app_id'),
+    )
     id: Mapped[int] = Column(Integer, primary_key=True, autoincrement=True)
     word: Mapped[str] = Column(String(50), nullable=False)
     app_id: Mapped[int] = Column(Integer, ForeignKey('apps.id'), nullable=False)
     enabled: Mapped[bool] = Column(Boolean, nullable=False, default=True) # This will be used as a flag to make sure when we change the stopword, 
                                                             # we don't delete it from the database to make the app entries consistent.
     
-    app: Mapped[App] = relationship('App', back_populates='stopwords')
+    app: Mapped[App] = relationship('App', back_populates='stopwords', lazy='select')
     
     def __repr__(self):
         return f'<Stopword word={self.word}, app_id={self.app_id}>'
@@ -122,6 +131,14 @@ class Stopword(Model):
 
 class Entry(Model):
     __tablename__ = 'entries'
+    __table_args__ = (
+        # Entries of an app, or of a student in an app, ordered by (create_at, id)
+        # as listed by get_app_entries and its keyset pagination
+        Index('ix_entries_app_id_create_at', 'app_id', 'create_at', 'id'),
+        Index('ix_entries_app_id_student_id_create_at', 'app_id', 'student_id', 'create_at', 'id'),
+        # Entries of a student across apps (Student.entry_list)
+        Index('ix_entries_student_id', 'student_id'),
+    )
     id: Mapped[int] = Column(Integer, primary_key=True, autoincrement=True)
     student_id: Mapped[int] = Column(Integer, ForeignKey('students.id'), nullable=False)
     app_id: Mapped[int] = Column(Integer, ForeignKey('apps.id'), nullable=False)
@@ -131,9 +148,45 @@ class Entry(Model):
     create_at: Mapped[datetime] = Column(TIMESTAMP, nullable=False)
     update_at: Mapped[datetime] = Column(TIMESTAMP, nullable=False)
     
-    student: Mapped[Student] = relationship('Student', back_populates='entry_list')
-    app: Mapped[App] = relationship('App', back_populates='entry_list')
+    student: Mapped[Student] = relationship('Student', back_populates='entry_list', lazy='select')
+    app: Mapped[App] = relationship('App', back_populates='entry_list', lazy='select')
     
     def __repr__(self):
         return f'<Entry content={self.content} create_at={self.create_at} update_at={self.update_at} study_start_time={self.study_start_time} study_duration_minutes={self.study_duration_minutes}>'
 
+
+# Counters maintained by the writes of connect.py in the transaction of the write,
+# so listings do not count rows; database/counters.py can rebuild them.
+class AppCounter(Model):
+    __tablename__ = 'app_counters'
+    app_id: Mapped[int] = Column(Integer, ForeignKey('apps.id'), primary_key=True)
+    num_students: Mapped[int] = Column(Integer, nullable=False, default=0) # Number of students enrolled in the app
+    num_entries: Mapped[int] = Column(Integer, nullable=False, default=0) # Number of entries submitted to the app
+    # Versions bumped by each write of the entries, of the app, and of its stopwords,
+    # the ETags of the responses are derived from them
+    entries_version: Mapped[int] = Column(Integer, nullable=False, default=0, server_default='0')
+    app_version: Mapped[int] = Column(Integer, nullable=False, default=0, server_default='0')
+    stopwords_version: Mapped[int] = Column(Integer, nullable=False, default=0, server_default='0')
+
+    def __repr__(self):
+        return f'<AppCounter app_id={self.app_id} num_students={self.num_students} num_entries={self.num_entries} entries_version={self.entries_version}>'
+
+
+class AppStudentCounter(Model):
+    __tablename__ = 'app_student_counters'
+    app_id: Mapped[int] = Column(Integer, ForeignKey('apps.id'), primary_key=True)
+    student_id: Mapped[int] = Column(Integer, ForeignKey('students.id'), primary_key=True)
+    num_entries: Mapped[int] = Column(Integer, nullable=False, default=0) # Number of entries the student submitted to the app
+
+    def __repr__(self):
+        return f'<AppStudentCounter app_id={self.app_id} student_id={self.student_id} num_entries={self.num_entries}>'
+
+
+class SchemaVersion(Model):
+    __tablename__ = 'schema_version'
+    id: Mapped[int] = Column(Integer, primary_key=True, autoincrement=True)
+    version: Mapped[int] = Column(Integer, nullable=False, unique=True) # Version of the schema reached by the migration
+    applied_at: Mapped[datetime] = Column(TIMESTAMP, nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return f'<SchemaVersion version={self.version} applied_at={self.applied_at}>'
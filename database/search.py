@@ -0,0 +1,205 @@
+"""
+This file handles the full-text search over the content of the entries.
+
+On SQLite (with the FTS5 extension, built in most distributions) the entries are
+indexed in the `entries_fts` virtual table, whose rowid is the id of the entry. The
+index is created by the migrations and kept in sync by the writes of connect.py
+(add_entry, add_entries, edit_entry) through index_entries(). The matches are ranked
+by bm25 and the snippets are built by FTS5.
+
+On other databases, or if FTS5 is missing, the search falls back to a LIKE filter
+on the entries, ordered by creation time, with the snippets built in Python.
+
+The content of the entries is stored URL quoted by the routes, it is indexed and
+searched unquoted. The snippets are returned URL quoted, like the content, with the
+[start, end) offsets of the matched terms in the quoted snippet. A quoted text has no
+character the responses escape for HTML, so the offsets hold in the text the client
+receives.
+"""
+from sqlalchemy import Column, Integer, MetaData, Table, Text, and_, column, exc, literal_column, func, select, table
+from sqlalchemy.orm import Query
+from urllib.parse import quote, unquote
+from . import models
+import re
+
+
+SEARCH_TABLE_NAME = "entries_fts"
+# Used to build the statements on the index, it is not part of the models
+# as create_all() cannot create a virtual table
+_search_table = Table(SEARCH_TABLE_NAME, MetaData(),
+    Column("rowid", Integer, primary_key=True),
+    Column("content", Text),
+)
+
+# The catalog of SQLite, read to find the index
+_sqlite_master = table("sqlite_master", column("type"), column("name"))
+
+# The markers put around the matched terms in the snippets, replaced by offsets
+_MARK_START = "\x02"
+_MARK_END = "\x03"
+# The characters the entries route leaves unquoted in the content
+_QUOTE_SAFE = " ,.?!;\n'\""
+# The number of words of a snippet
+SNIPPET_WORDS = 16
+_SNIPPET_CHARACTERS = 100
+
+
+def search_terms(query: str) -> list:
+    """
+    This function splits the query of a client into the terms searched.
+
+    @param query: str, the query of the client
+    """
+    return re.findall(r"\w+", query.lower())
+
+
+def _fts_query(terms: list) -> str:
+    # Every term must match, as a prefix, and no FTS5 operator can be injected
+    return " AND ".join(f'"{term}"*' for term in terms)
+
+
+# If each database (by URL) has the search index, read once per process
+_search_index_found = {}
+
+
+def _engine_of(connection):
+    if hasattr(connection, "get_bind"):
+        return connection.get_bind()
+    return connection.engine
+
+
+def create_search_index(connection) -> bool:
+    """
+    This function creates the search index and fills it with the existing entries.
+    It returns False if the database cannot have one (not SQLite, or no FTS5), in
+    which case the search falls back to LIKE filters.
+
+    @param connection: sqlalchemy.engine.Connection, the connection of the migration
+    """
+    if connection.dialect.name != "sqlite":
+        return False
+    try:
+        connection.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE_NAME} " +
+            "USING fts5(content, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    except exc.OperationalError:
+        # no such module: fts5
+        return False
+    connection.execute(_search_table.delete())
+    _insert_into_index(connection, connection.execute(select(models.Entry.id, models.Entry.content)).all())
+    _search_index_found[str(connection.engine.url)] = True
+    return True
+
+
+def has_search_index(connection) -> bool:
+    """
+    This function tells if the database has the search index.
+
+    @param connection: the Session or Connection to use
+    """
+    engine = _engine_of(connection)
+    url = str(engine.url)
+    if url not in _search_index_found:
+        found = False
+        if engine.dialect.name == "sqlite":
+            found = connection.execute(
+                select(_sqlite_master.c.name).where(
+                    _sqlite_master.c.type == "table",
+                    _sqlite_master.c.name == SEARCH_TABLE_NAME,
+                )
+            ).first() is not None
+        _search_index_found[url] = found
+    return _search_index_found[url]
+
+
+def _insert_into_index(connection, entries: list):
+    if len(entries) > 0:
+        connection.execute(
+            _search_table.insert(),
+            [{"rowid": entry_id, "content": unquote(content)} for entry_id, content in entries]
+        )
+
+
+def index_entries(connection, entries: list):
+    """
+    This function adds the given entries to the search index, or replaces them if
+    they are already indexed. It does nothing if the database has no search index.
+    It must be called in the transaction writing the entries.
+
+    @param connection: the Session or Connection of the transaction
+    @param entries: list, the (id, content) of the entries
+    """
+    if len(entries) == 0 or not has_search_index(connection):
+        return
+    connection.execute(
+        _search_table.delete().where(_search_table.c.rowid.in_([entry_id for entry_id, _ in entries]))
+    )
+    _insert_into_index(connection, entries)
+
+
+def _split_snippet(snippet: str) -> tuple:
+    # The quoted text of the snippet without the markers, and the offsets of the
+    # matches in it, each part is quoted on its own as quoting works by character
+    text = ""
+    highlights = []
+    for index, part in enumerate(re.split(f"[{_MARK_START}{_MARK_END}]", snippet)):
+        part = quote(part, safe=_QUOTE_SAFE)
+        if index % 2 == 1:
+            highlights.append([len(text), len(text) + len(part)])
+        text += part
+    return text, highlights
+
+
+def _build_snippet(content: str, terms: list) -> tuple:
+    # The snippet around the first match, built like the FTS5 ones
+    text = unquote(content)
+    pattern = re.compile(r"\b(?:" + "|".join(re.escape(term) for term in terms) + r")\w*", re.IGNORECASE)
+    match = pattern.search(text)
+    start = 0 if match is None else max(0, match.start() - _SNIPPET_CHARACTERS // 2)
+    end = min(len(text), start + _SNIPPET_CHARACTERS)
+    snippet = pattern.sub(lambda found: _MARK_START + found.group(0) + _MARK_END, text[start:end])
+    return _split_snippet(("…" if start > 0 else "") + snippet + ("…" if end < len(text) else ""))
+
+
+def search_entries(session, query: Query, terms: list, columns: tuple, limit: int) -> list:
+    """
+    This function searches the entries selected by a query for the given terms, every
+    term having to match (as a prefix of a word). It returns the rows of the given
+    columns with the snippet of each entry and the offsets of the matches in it, the
+    best matches first.
+
+    @param session: sqlalchemy.orm.session.Session, the session to use
+    @param query: sqlalchemy.orm.Query, the query of the entries the user may read
+    @param terms: list, the terms searched, from search_terms()
+    @param columns: tuple, the columns of the entries returned
+    @param limit: int, the maximum number of entries returned
+
+    @return: list[tuple], the (row, (snippet, highlights)) of the entries found
+    """
+    if len(terms) == 0:
+        return []
+    query = query.order_by(None)
+    if has_search_index(session):
+        index = literal_column(SEARCH_TABLE_NAME)
+        rows = query.join(
+            _search_table, _search_table.c.rowid == models.Entry.id
+        ).filter(
+            index.op("MATCH")(_fts_query(terms))
+        ).with_entities(
+            *columns,
+            func.snippet(index, 0, _MARK_START, _MARK_END, "…", SNIPPET_WORDS).label("snippet"),
+        ).order_by(
+            # The bm25 rank of FTS5, lower is better
+            literal_column(f"{SEARCH_TABLE_NAME}.rank"), models.Entry.id.desc()
+        ).limit(limit).all()
+        return [(row, _split_snippet(row.snippet)) for row in rows]
+    # The content is stored URL quoted, so are the terms to find in it
+    rows = query.filter(
+        and_(*[models.Entry.content.icontains(quote(term), autoescape=True) for term in terms])
+    ).with_entities(
+        *columns, models.Entry.content.label("indexed_content")
+    ).order_by(
+        models.Entry.create_at.desc(), models.Entry.id.desc()
+    ).limit(limit).all()
+    return [(row, _build_snippet(row.indexed_content, terms)) for row in rows]
@@ -0,0 +1,67 @@
+"""
+This file holds the connection profile used for file-based SQLite databases, so the
+workers of a deployment running on SQLite do not stall on each other.
+
+- WAL journaling lets readers and the writer work at the same time: a long read
+  (e.g. the analytics) no longer blocks the submission of entries, and the reads
+  are not blocked by a write.
+- A busy timeout makes a writer wait for the current one instead of failing with
+  "database is locked".
+- synchronous=NORMAL is durable with WAL except on power loss, where the last
+  transactions may be rolled back, and avoids a sync on every commit.
+- The memory map and the page cache keep the hot pages in memory.
+
+Each thread uses its own connection: the pool of the engine hands a connection
+to a request for its whole duration, and the connections are opened with
+check_same_thread disabled only so the pool can reuse them across threads.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+
+# The pragmas set on every new connection, in this order
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    # A negative size is in KiB
+    "cache_size": -64 * 1024,
+    "temp_store": "MEMORY",
+}
+
+
+def is_sqlite_file(uri) -> bool:
+    """
+    This function tells if the URI is a SQLite database stored in a file.
+
+    @param uri: str, the database URI
+    """
+    url = make_url(uri)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def sqlite_connect_args(busy_timeout: int) -> dict:
+    """
+    This function returns the arguments of the driver used to open the connections.
+
+    @param busy_timeout: int, the time in milliseconds a connection waits for a lock
+    """
+    return {"timeout": busy_timeout / 1000, "check_same_thread": False}
+
+
+def apply_sqlite_profile(engine: Engine, busy_timeout: int = 5000):
+    """
+    This function sets the pragmas of the profile on every connection the engine opens.
+
+    @param engine: sqlalchemy.engine.Engine, the engine of a file-based SQLite database
+    @param busy_timeout: int, the time in milliseconds a connection waits for a lock
+    """
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"PRAGMA busy_timeout = {int(busy_timeout)}")
+            for name, value in SQLITE_PRAGMAS.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
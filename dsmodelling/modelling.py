@@ -18,9 +18,14 @@ def _dist_to_dict(l):
 stopwords = nltk.corpus.stopwords.words('english')
 #Generates frequency distribution object to be used in a word cloud
 def word_cloud(text, stpw, num):
+    return(word_cloud_from_counts(word_counts(text, stpw), num))
+#Counts the words of a text for a word cloud, the counts of several texts can be updated with the ones of the next text
+def word_counts(text, stpw):
     words = tokenizer.tokenize(text)
     words = [w for w in words if w.lower() not in (stopwords+stpw)]
-    wordDist = nltk.FreqDist(words)
+    return(nltk.FreqDist(words))
+#Generates the word cloud from the counts of word_counts()
+def word_cloud_from_counts(wordDist, num):
     distObj = wordDist.most_common(num)
     return(_dist_to_dict(distObj))
 #Generates distribution to be used in a word cloud based on both frequency and proximity to a chosen word
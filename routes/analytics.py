@@ -1,11 +1,12 @@
 from flask import Blueprint, request, Response
 from urllib.parse import quote
-from config.database import database_uri
 import database.connect as database
 from flask_cors import CORS, cross_origin
-from utils.jwt_utils import validate_token_in_request, generate_token
+from database.context import RequestContext
+from utils.request_preamble import requires
 from utils.api_response_wrapper import (
     success_response,
+    streaming_success_response,
     client_error_response,
     server_error_response,
 )
@@ -16,20 +17,33 @@ from dsmodelling import lda_modelling
 # Set up the routes blueprint
 analytics_routes = Blueprint("analytics_routes", __name__)
 
+# The error responses of the preamble which differ from the default ones
+ANALYTICS_ERRORS = {
+    "user": (client_error_response, -1, 404, "User not found"),
+    "course": (client_error_response, -1, 404, "Course not found"),
+    "app": (client_error_response, -1, 404, "App not found or you are not enrolled in this app"),
+}
+
+def _analytics_version(session, context: RequestContext):
+    # The analytics are computed from the entries and the stopwords of the app
+    versions = database.get_app_versions(session=session, app_id=context.app.id)
+    if versions is None:
+        return None
+    return (versions.num_entries, versions.entries_version, versions.stopwords_version)
+
+
 @analytics_routes.route("/", methods=["GET"])
 @analytics_routes.route("", methods=["GET"])
-def get_entries_dashboard(course_id:int, app_id: int):
-    """This route will get the wordcloud object of all entries in a coures if the user is a professor"""
-    jwt_result = validate_token_in_request(request)
-    if jwt_result["code"] != 0:
-        return client_error_response(
-            data={},
-            internal_code=jwt_result["code"],
-            status_code=401,
-            message=jwt_result["message"],
-        )
-    payload = jwt_result["data"]
-    email = payload["email"]
+@requires(course=True, app=True, errors=ANALYTICS_ERRORS, version=_analytics_version)
+def get_entries_dashboard(course_id:int, app_id: int, context: RequestContext):
+    """This route will get the wordcloud object of all entries in a coures if the user is a professor
+
+    The entries are read once, from a server-side cursor: the sentences are sent as they
+    are computed, while the counts of the words of the word cloud and the points of the
+    graph are gathered, and sent after the sentences. The word counts grow with the
+    vocabulary of the app, the graph keeps one point (two numbers) per entry as the
+    sentiment of an entry is too costly to compute twice.
+    """
     # Check if the user set the parameter indicating the limit of words to be shown
     limit = request.args.get("limit")
     limit_num = 12 # Default value
@@ -42,73 +56,48 @@ def get_entries_dashboard(course_id:int, app_id: int):
             status_code=400,
             message="Invalid limit value, you must provide a number between 1 and 100",
         )
-    _, Session, _ = database.init_connection(database_uri(), echo=False)
-    session = Session()
-    user = database.get_user(session=session, email=email)
-    if user is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="User not found",
-        )
-    # Check if the given course_id and app_id are valid
-    course = database.get_course(session=session, course_id=course_id, user_email=email)
-    if course is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="Course not found",
-        )
-    app = database.get_app(session=session, app_id=app_id, user_email=email)
-    if app is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="App not found or you are not enrolled in this app",
-        )
-    entries = database.get_app_entries(session=session, app_id=app_id, user_email=email)
-    all_entries = []
-    sents = []
-    for entry in entries:
-        all_entries.append(entry.content)
-        usr = database.get_user_by_id(session, entry.student_id)
-        sents.append({
-            'sentence': modelling.get_sentence_no_word(entry.content),
-            'sentiment': modelling.sentiment(entry.content),
-            'user': usr.first_name+" "+usr.last_name,
-            'user_id': entry.student_id,
-            })
-    stopw = []
-    for stopword in app.stopwords:
-        stopw.append(stopword.word)
-    session.close()
-    return success_response(data={
-        "wordcloud": modelling.word_cloud('\n'.join(all_entries), stopw, limit_num),
-        "sentences": sents,
-        "graph": [{'x': modelling.word_count(e), 'y': modelling.sentiment(e)} for e in all_entries]
+    session = database.get_session()
+    email = context.email
+    app = context.app
+    stopw = database.list_apps_stopwords(session=session, app_ids=[app.id])[app.id]
+    word_counts = modelling.word_counts("", stopw)
+    graph = []
+
+    def sentences():
+        for entry in database.stream_app_entries(session=session, app_id=app_id, user_email=email, with_authors=True):
+            word_counts.update(modelling.word_counts(entry.content, stopw))
+            sentiment = modelling.sentiment(entry.content)
+            graph.append({'x': modelling.word_count(entry.content), 'y': sentiment})
+            yield {
+                'sentence': modelling.get_sentence_no_word(entry.content),
+                'sentiment': sentiment,
+                'user': entry.first_name+" "+entry.last_name,
+                'user_id': entry.student_id,
+                }
+
+    def wordcloud():
+        # Iterated once the sentences are sent and the counts complete
+        yield from modelling.word_cloud_from_counts(word_counts, limit_num)
+
+    return streaming_success_response(data={
+        "sentences": sentences(),
+        # Iterated once the sentences are sent and the graph complete
+        "graph": iter(graph),
+        "wordcloud": wordcloud(),
         })
 
 
 @analytics_routes.route("/word_relations/<word>", methods=["GET"])
 @analytics_routes.route("/word_relations/<word>", methods=["GET"])
-def word_clicked_dashboard(course_id:int, app_id:int, word:str):
-    """This route will get the wordcloud object of all entries in a coures if the user is a professor"""
-    jwt_result = validate_token_in_request(request)
-    if jwt_result["code"] != 0:
-        return client_error_response(
-            data={},
-            internal_code=jwt_result["code"],
-            status_code=401,
-            message=jwt_result["message"],
-        )
-    payload = jwt_result["data"]
-    email = payload["email"]
+@requires(course=True, app=True, errors=ANALYTICS_ERRORS, version=_analytics_version)
+def word_clicked_dashboard(course_id:int, app_id:int, word:str, context: RequestContext):
+    """This route will get the wordcloud object of all entries in a coures if the user is a professor
+
+    The entries are read once, from a server-side cursor, and the sentences are sent as
+    they are computed. The word cloud is made of the words around the given word in the
+    whole text of the app, where the windows span the entries, so that text is kept in
+    memory until the sentences are sent and the word cloud is sent after them.
+    """
     # Check if the user set the parameter indicating the limit of words to be shown
     limit = request.args.get("limit")
     limit_num = 12 # Default value
@@ -121,109 +110,46 @@ def word_clicked_dashboard(course_id:int, app_id:int, word:str):
             status_code=400,
             message="Invalid limit value, you must provide a number between 1 and 100",
         )
-    _, Session, _ = database.init_connection(database_uri(), echo=False)
-    session = Session()
-    user = database.get_user(session=session, email=email)
-    if user is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="User not found",
-        )
-    # Check if the given course_id and app_id are valid
-    course = database.get_course(session=session, course_id=course_id, user_email=email)
-    if course is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="Course not found",
-        )
-    app = database.get_app(session=session, app_id=app_id, user_email=email)
-    if app is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="App not found or you are not enrolled in this app",
-        )
-    entries = database.get_app_entries(session=session, app_id=app_id, user_email=email)
-    all_entries = []
-    sents = []
-    for entry in entries:
-        all_entries.append(entry.content)
-        sent = modelling.get_sentence(entry.content, word)
-        if sent is not None:
-            usr = database.get_user_by_id(session, entry.student_id)
-            sents.append({
-                'sentence': sent,
-                'sentiment': modelling.sentiment(entry.content),
-                'user': usr.first_name+" "+usr.last_name,
-                'user_id': entry.student_id,
-                })
-    stopw = []
-    for stopword in app.stopwords:
-        stopw.append(stopword.word)
-    session.close()
-    return success_response(data={
-        'wordcloud': modelling.associated_word_cloud('\n'.join(all_entries), word, stopw, limit_num),
-        'sentences': sents
+    session = database.get_session()
+    email = context.email
+    app = context.app
+    stopw = database.list_apps_stopwords(session=session, app_ids=[app.id])[app.id]
+    texts = []
+
+    def sentences():
+        for entry in database.stream_app_entries(session=session, app_id=app_id, user_email=email, with_authors=True):
+            texts.append(entry.content)
+            sent = modelling.get_sentence(entry.content, word)
+            if sent is not None:
+                yield {
+                    'sentence': sent,
+                    'sentiment': modelling.sentiment(entry.content),
+                    'user': entry.first_name+" "+entry.last_name,
+                    'user_id': entry.student_id,
+                    }
+
+    def wordcloud():
+        # Iterated once the sentences are sent and the text complete
+        yield from modelling.associated_word_cloud('\n'.join(texts), word, stopw, limit_num)
+
+    return streaming_success_response(data={
+        'sentences': sentences(),
+        'wordcloud': wordcloud(),
     })
 
 
 @analytics_routes.route("/lda_html", methods=["GET"])
 @analytics_routes.route("/lda_html/", methods=["GET"])
-def lda_html(course_id:int, app_id:int):
+@requires(course=True, app=True, errors=ANALYTICS_ERRORS, version=_analytics_version)
+def lda_html(course_id:int, app_id:int, context: RequestContext):
     """This route will get the lda visualization in html format"""
-    jwt_result = validate_token_in_request(request)
-    if jwt_result["code"] != 0:
-        return client_error_response(
-            data={},
-            internal_code=jwt_result["code"],
-            status_code=401,
-            message=jwt_result["message"],
-        )
-    payload = jwt_result["data"]
-    email = payload["email"]
-    _, Session, _ = database.init_connection(database_uri(), echo=False)
-    session = Session()
-    user = database.get_user(session=session, email=email)
-    if user is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="User not found",
-        )
-    # Check if the given course_id and app_id are valid
-    course = database.get_course(session=session, course_id=course_id, user_email=email)
-    if course is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="Course not found",
-        )
-    app = database.get_app(session=session, app_id=app_id, user_email=email)
-    if app is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="App not found or you are not enrolled in this app",
-        )
+    session = database.get_session()
+    email = context.email
+    app = context.app
     entries = database.get_app_entries(session=session, app_id=app_id, user_email=email)
     all_entries = []
     for entry in entries:
         all_entries.append(entry.content)
-    session.close()
     if len(all_entries) == 0:
         return '<h1>No entries found in this app!</h1>'
     lda_model, corpus, dictionary = lda_modelling.lda_model(all_entries, num_topics=4, passes=15)
@@ -5,10 +5,10 @@ This module provides the blueprint for the apps routes.
 """
 from flask import Blueprint, request, Response
 from urllib.parse import quote
-from config.database import database_uri
 import database.connect as database
 from flask_cors import CORS, cross_origin
-from utils.jwt_utils import validate_token_in_request, generate_token
+from database.context import RequestContext
+from utils.request_preamble import requires
 from utils.api_response_wrapper import (
     success_response,
     client_error_response,
@@ -18,54 +18,38 @@ from utils.api_response_wrapper import (
 # Set up the routes blueprint
 apps_routes = Blueprint("apps_routes", __name__)
 
+# The error responses of the preamble which differ from the default ones
+APPS_ERRORS = {
+    "role": (client_error_response, -1, 401, "User is not a professor"),
+}
+
+
+def _apps_version(session, context: RequestContext):
+    # The apps of the course change with their counters, settings and stopwords
+    return database.get_course_apps_versions(session=session, course_id=context.course.id)
+
+
+def _app_version(session, context: RequestContext):
+    return database.get_app_versions(session=session, app_id=context.app.id)
+
 
 @apps_routes.route("/", methods=["GET"])
 @apps_routes.route("", methods=["GET"])
-def get_apps(course_id: int):
+@requires(course=True, errors=APPS_ERRORS, version=_apps_version)
+def get_apps(course_id: int, context: RequestContext):
     """This route will return all the apps in the given course.
     
     Args:
         course_id: The id of the course to get the apps from.
     """
-    jwt_result = validate_token_in_request(request)
-    if jwt_result["code"] != 0:
-        return client_error_response(
-            data={},
-            internal_code=jwt_result["code"],
-            status_code=401,
-            message=jwt_result["message"],
-        )
-    payload = jwt_result["data"]
-    email = payload["email"]
-    _, Session, _ = database.init_connection(database_uri(), echo=False)
-    session = Session()
-    user = database.get_user(session=session, email=email)
-    if user is None:
-        session.close()
-        return server_error_response(
-            data={},
-            internal_code=-1,
-            status_code=500,
-            message="User not found",
-        )
-    # Check if the user is enrolled in the course
-    course = database.get_course(session=session, course_id=course_id, user_email=email)
-    if course is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="Course not found or user is not enrolled in the course",
-        )
-    apps = database.get_apps(session=session, course_id=course_id, user_email=email)
+    session = database.get_session()
+    email = context.email
+    # The apps are read as rows with their number of students,
+    # and the stopwords of all of them with a single query
+    apps = database.list_apps(session=session, course_id=course_id, user_email=email)
+    apps_stopwords = database.list_apps_stopwords(session=session, app_ids=[app.id for app in apps])
     all_apps = []
     for app in apps:
-        # Get the number of students enrolled in the app
-        num_students = len(app.enrolled_students)
-        stopwords = []
-        for stopword in app.stopwords:
-            stopwords.append(stopword.word)
         all_apps.append(
             {
                 "id": app.id,
@@ -75,63 +59,25 @@ def get_apps(course_id: int):
                 "end_time": app.end_time.timestamp(),
                 "num_entries": app.num_entries,
                 "max_students": app.max_students,
-                "num_students": num_students,
+                "num_students": app.num_students,
                 "template_link": app.template,
-                "stopwords": stopwords,
+                "stopwords": apps_stopwords[app.id],
             }
         )
-    session.close()
     return success_response(data={"apps": all_apps})
 
 
 @apps_routes.route("/", methods=["POST"])
 @apps_routes.route("", methods=["POST"])
-def create_app(course_id: int):
+@requires(course=True, role="professor", errors=APPS_ERRORS)
+def create_app(course_id: int, context: RequestContext):
     """This route will create a new app in the given course.
     
     Args:
         course_id: The id of the course to create the app in.
     """
-    jwt_result = validate_token_in_request(request)
-    if jwt_result["code"] != 0:
-        return client_error_response(
-            data={},
-            internal_code=jwt_result["code"],
-            status_code=401,
-            message=jwt_result["message"],
-        )
-    payload = jwt_result["data"]
-    email = payload["email"]
-    _, Session, _ = database.init_connection(database_uri(), echo=False)
-    session = Session()
-    user = database.get_user(session=session, email=email)
-    if user is None:
-        session.close()
-        return server_error_response(
-            data={},
-            internal_code=-1,
-            status_code=500,
-            message="User not found",
-        )
-    # Check if the user is a professor
-    if user.role != "professor":
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=401,
-            message="User is not a professor",
-        )
-    # Check if the user is enrolled in the course
-    course = database.get_course(session=session, course_id=course_id, user_email=email)
-    if course is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="Course not found or user is not enrolled in the course",
-        )
+    session = database.get_session()
+    email = context.email
     # Create the app
     data = request.get_json()
     name = data.get("name")
@@ -160,7 +106,6 @@ def create_app(course_id: int):
         stopwords=stop_words
     )
     if app is None:
-        session.close()
         return server_error_response(
             data={},
             internal_code=-1,
@@ -178,70 +123,32 @@ def create_app(course_id: int):
         "template_link": app.template,
         "stopwords": stop_words,
     }
-    session.close()
     return success_response(data={"app": returned_app})
 
 
 @apps_routes.route("/<app_id>/", methods=["GET"])
 @apps_routes.route("/<app_id>", methods=["GET"])
-def get_app(course_id: int, app_id: int):
+@requires(course=True, app=True, errors=APPS_ERRORS, version=_app_version)
+def get_app(course_id: int, app_id: int, context: RequestContext):
     """This route will return the app with the given id in the given course.
     
     Args:
         course_id: The id of the course to get the app from.
         app_id: The id of the app to get.
     """
-    jwt_result = validate_token_in_request(request)
-    if jwt_result["code"] != 0:
-        return client_error_response(
-            data={},
-            internal_code=jwt_result["code"],
-            status_code=401,
-            message=jwt_result["message"],
-        )
-    payload = jwt_result["data"]
-    email = payload["email"]
-    _, Session, _ = database.init_connection(database_uri(), echo=False)
-    session = Session()
-    user = database.get_user(session=session, email=email)
-    if user is None:
-        session.close()
-        return server_error_response(
-            data={},
-            internal_code=-1,
-            status_code=500,
-            message="User not found",
-        )
-    # Check if the user is enrolled in the course
-    course = database.get_course(session=session, course_id=course_id, user_email=email)
-    if course is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="Course not found or user is not enrolled in the course",
-        )
-    app = database.get_app(session=session, app_id=app_id, user_email=email)
-    if app is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="App not found",
-        )
+    session = database.get_session()
+    email = context.email
+    user = context.user
+    app = context.app
     # Get the students enrolled in the app
     if user.role == "professor":
         students = []
-        for student in app.enrolled_students:
+        for student in database.get_app_students(session=session, app_id=app.id):
             students.append({
                 "id": student.id,
                 "email": student.email
             })
-        stopwords = []
-        for stopword in app.stopwords:
-            stopwords.append(stopword.word)
+        stopwords = database.list_apps_stopwords(session=session, app_ids=[app.id])[app.id]
     
     returned_app = {
         "id": app.id,
@@ -254,84 +161,31 @@ def get_app(course_id: int, app_id: int):
         "template_link": app.template,
     }
     if user.role == "student":
-        enrolled = False
         # Check if the user is enrolled in the app
-        for student in app.enrolled_students:
-            if student.email == email:
-                returned_app["is_enrolled"] = True
-                # Get the user's entries count
-                entries = database.get_app_entries(session=session, app_id=app_id, user_email=email)
-                returned_app["entries_count"] = len(entries)
-                enrolled = True
-                break
-        if not enrolled:
+        if context.in_app:
+            returned_app["is_enrolled"] = True
+            # Get the user's entries count
+            returned_app["entries_count"] = database.count_student_app_entries(session=session, app_id=app.id, student_id=user.id)
+        else:
             returned_app["is_enrolled"] = False
-        session.close()
     else:
         returned_app["students"] = students
         returned_app["stopwords"] = stopwords
-        session.close()
     return success_response(data={"app": returned_app})
 
 
 @apps_routes.route("/<app_id>/", methods=["PUT"])
 @apps_routes.route("/<app_id>", methods=["PUT"])
-def edit_app(course_id: int, app_id: int):
+@requires(course=True, app=True, role="professor", errors=APPS_ERRORS)
+def edit_app(course_id: int, app_id: int, context: RequestContext):
     """This route will edit the app with the given id in the given course.
     
     Args:
         course_id: The id of the course to edit the app in.
         app_id: The id of the app to edit.
     """
-    jwt_result = validate_token_in_request(request)
-    if jwt_result["code"] != 0:
-        return client_error_response(
-            data={},
-            internal_code=jwt_result["code"],
-            status_code=401,
-            message=jwt_result["message"],
-        )
-    payload = jwt_result["data"]
-    email = payload["email"]
-    _, Session, _ = database.init_connection(database_uri(), echo=False)
-    session = Session()
-    user = database.get_user(session=session, email=email)
-    if user is None:
-        session.close()
-        return server_error_response(
-            data={},
-            internal_code=-1,
-            status_code=500,
-            message="User not found",
-        )
-    # Check if the user is a professor
-    if user.role != "professor":
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=401,
-            message="User is not a professor",
-        )
-    # Check if the user is enrolled in the course
-    course = database.get_course(session=session, course_id=course_id, user_email=email)
-    if course is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="Course not found or user is not enrolled in the course",
-        )
-    app = database.get_app(session=session, app_id=app_id, user_email=email)
-    if app is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="App not found",
-        )
+    session = database.get_session()
+    email = context.email
     # Edit the app
     data = request.get_json()
     name = data.get("name")
@@ -360,7 +214,6 @@ def edit_app(course_id: int, app_id: int):
         stopwords=stop_words
     )
     if app is None:
-        session.close()
         return server_error_response(
             data={},
             internal_code=-1,
@@ -378,66 +231,25 @@ def edit_app(course_id: int, app_id: int):
         "template_link": app.template,
         "stopwords": stop_words,
     }
-    session.close()
     return success_response(data={"app": returned_app})
 
 
 @apps_routes.route("/<app_id>/join", methods=["POST"])
 @apps_routes.route("/<app_id>/join/", methods=["POST"])
-def join_app(course_id: int, app_id: int):
+@requires(course=True, app=True, errors=APPS_ERRORS)
+def join_app(course_id: int, app_id: int, context: RequestContext):
     """This route will allow the user to join the app with the given id in the given course.
     
     Args:
         course_id: The id of the course to join the app in.
         app_id: The id of the app to join.
     """
-    jwt_result = validate_token_in_request(request)
-    if jwt_result["code"] != 0:
-        return client_error_response(
-            data={},
-            internal_code=jwt_result["code"],
-            status_code=401,
-            message=jwt_result["message"],
-        )
-    payload = jwt_result["data"]
-    email = payload["email"]
-    _, Session, _ = database.init_connection(database_uri(), echo=False)
-    session = Session()
-    user = database.get_user(session=session, email=email)
-    if user is None:
-        session.close()
-        return server_error_response(
-            data={},
-            internal_code=-1,
-            status_code=500,
-            message="User not found",
-        )
+    session = database.get_session()
+    email = context.email
+    user = context.user
+    app = context.app
     # Check if the course have the app
-    course = database.get_course(session=session, course_id=course_id, user_email=email)
-    if course is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="Course not found or user is not enrolled in the course",
-        )
-    app = database.get_app(session=session, app_id=app_id, user_email=email)
-    if app is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="App not found",
-        )
-    course_valid = False
-    for course in app.binded_courses:
-        if course.id == int(course_id):
-            course_valid = True
-            break
-    if not course_valid:
-        session.close()
+    if not context.app_in_course:
         return client_error_response(
             data={},
             internal_code=-1,
@@ -445,8 +257,7 @@ def join_app(course_id: int, app_id: int):
             message="App not found in the course",
         )
     # Check if the user is already enrolled in the app
-    if email in app.enrolled_students:
-        session.close()
+    if context.in_app:
         return client_error_response(
             data={},
             internal_code=-1,
@@ -454,8 +265,7 @@ def join_app(course_id: int, app_id: int):
             message="User is already enrolled in the app",
         )
     # Check if the user has reached the maximum number of students
-    if len(app.enrolled_students) >= app.max_students:
-        session.close()
+    if database.count_app_students(session=session, app_id=app.id) >= app.max_students:
         return client_error_response(
             data={},
             internal_code=-1,
@@ -464,12 +274,10 @@ def join_app(course_id: int, app_id: int):
         )
     app = database.join_app(session=session, app_id=app_id, student_email=email)
     if app is None:
-        session.close()
         return server_error_response(
             data={},
             internal_code=-1,
             status_code=500,
             message="Failed to join the app",
         )
-    session.close()
     return success_response(data={})
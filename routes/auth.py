@@ -21,15 +21,13 @@ Author:
     Jiacheng Zhao (John)
 """
 
-from flask import Blueprint, request, Response
+from flask import Blueprint, current_app, request, Response
 from urllib.parse import quote
 import html
-import requests
 import json
-from config.third_party_secrets import google_client_secrets
-from config.database import database_uri
 import database.connect as database
 from utils import jwt_utils
+from utils.google_oauth import GoogleOAuthError, google_oauth_client
 from utils.api_response_wrapper import (
     success_response,
     client_error_response,
@@ -59,8 +57,7 @@ def email_login():
     # Sanitize the email, with @ and . allowed
     email = quote(email, safe="@.")
     
-    _, Session, _ = database.init_connection(database_uri(), echo=False)
-    session = Session()
+    session = database.get_session()
     user = database.get_user(session, email)
     if user is not None:
         user_info = {
@@ -72,7 +69,6 @@ def email_login():
                 }
             ),
         }
-        session.close()
         return success_response(user_info, internal_code=0, status_code=200, message="")
     else:
         user_info = {
@@ -80,7 +76,6 @@ def email_login():
             "email": email,
             "jwt": jwt_utils.generate_token({"email": email}),
         }
-        session.close()
         return success_response(user_info, internal_code=0, status_code=200, message="")
 
 
@@ -100,53 +95,35 @@ def google_auth():
     code = request.args.get("code")
     # Sanitize the code to make it URL safe
     code = str(quote(code))
-    print(code)
-    # Exchange the code for an access token
-    # Use the access token to access the user id
-    token_url = "https://oauth2.googleapis.com/token"
-    google_client_secret_dict = google_client_secrets()
-    if os.getenv("FLASK_MODE") is None:
-        flask_mode = "development"
-    else:
-        flask_mode = os.getenv("FLASK_MODE")
-    if flask_mode.lower() == "production":
-        redirect_uri = request.host_url + "callback/google" # Redirect URI for production
-    else:
-        redirect_uri = google_client_secret_dict["web"]["redirect_uris"][1] # Redirect URI for development
-    data = {
-        "code": code,
-        "client_id": google_client_secret_dict["web"]["client_id"],
-        "client_secret": google_client_secret_dict["web"]["client_secret"],
-        "redirect_uri": redirect_uri,
-        "grant_type": "authorization_code",
-    }
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    response = requests.post(token_url, data=data, headers=headers)
-
-    # Check if the request was successful
-    if response.status_code != 200:
-        print("Response:", response.json())
+    # Exchange the code for the tokens of the user, then read the user's email
+    # from the ID token, or from Google if it cannot be verified locally
+    try:
+        client = google_oauth_client()
+        if os.getenv("FLASK_MODE") is None:
+            flask_mode = "development"
+        else:
+            flask_mode = os.getenv("FLASK_MODE")
+        if flask_mode.lower() == "production":
+            redirect_uri = request.host_url + "callback/google" # Redirect URI for production
+        else:
+            redirect_uri = client.redirect_uris[1] # Redirect URI for development
+        tokens = client.exchange_code(code, redirect_uri)
+        google_user = client.user_info(tokens)
+    except GoogleOAuthError as e:
+        current_app.logger.warning("Google login failed: %s (%s)", e.message, e.status_code)
         return server_error_response(
-            data=response.json(),
+            data=e.data,
             internal_code=-102,
-            status_code=500,
-            message="Failed to obtain access token",
+            status_code=e.status_code,
+            message=e.message,
         )
-    # Access the user id
-    access_token = response.json()["access_token"]
-    # Santize the access token to make it URL safe
-    access_token = quote(access_token)
-    userinfo_url = (
-        f"https://www.googleapis.com/oauth2/v1/userinfo?access_token={access_token}"
-    )
-    response = requests.get(userinfo_url)
+    email = google_user["email"]
     print("Successfully obtained Google user Info!")
-    print("User ID:", response.json()["id"])
-    print("Email:", response.json()["email"])
-    _, Session, _ = database.init_connection(database_uri(), echo=False)
-    session = Session()
+    print("User ID:", google_user["id"])
+    print("Email:", email)
+    session = database.get_session()
     # Check if the user is already registered
-    user = database.get_user(session, response.json()["email"])
+    user = database.get_user(session, email)
     if user is not None:
         user_info = {
             "isRegistered": True,
@@ -157,14 +134,11 @@ def google_auth():
                 }
             ),
         }
-        session.close()
         return success_response(user_info, internal_code=0, status_code=200, message="")
     else:
         user_info = {
             "isRegistered": False,
-            "email": response.json()["email"],
-            "jwt": jwt_utils.generate_token({"email": response.json()["email"]}),
+            "email": email,
+            "jwt": jwt_utils.generate_token({"email": email}),
         }
-        session.close()
         return success_response(user_info, internal_code=0, status_code=200, message="")
-    
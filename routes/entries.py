@@ -5,73 +5,51 @@ This module provides the blueprint for the apps routes.
 """
 from flask import Blueprint, request, Response
 from urllib.parse import quote
-from config.database import database_uri
 import database.connect as database
 from flask_cors import CORS, cross_origin
-from utils.jwt_utils import validate_token_in_request, generate_token
+from database.context import RequestContext
+from utils.request_preamble import check_context, requires
 from utils.api_response_wrapper import (
     success_response,
+    streaming_success_response,
     client_error_response,
     server_error_response,
 )
+from utils.pagination import encode_cursor, decode_cursor, page_size
 from datetime import datetime
 
 # Set up the routes blueprint
 entries_routes = Blueprint("entries_routes", __name__)
 
-@entries_routes.route("/", methods=["GET"])
-@entries_routes.route("", methods=["GET"])
-def get_entries(course_id: int, app_id: int):
-    """This route will return entries the user has submitted. Or return all entries if the user is an admin."""
-    jwt_result = validate_token_in_request(request)
-    if jwt_result["code"] != 0:
-        return client_error_response(
-            data={},
-            internal_code=jwt_result["code"],
-            status_code=401,
-            message=jwt_result["message"],
-        )
-    payload = jwt_result["data"]
-    email = payload["email"]
-    _, Session, _ = database.init_connection(database_uri(), echo=False)
-    session = Session()
-    user = database.get_user(session=session, email=email)
-    if user is None:
-        session.close()
-        return server_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="User not found",
-        )
-    # Check if the given course_id and app_id are valid
-    course = database.get_course(session=session, course_id=course_id, user_email=email)
-    if course is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="Course not found",
-        )
-    app = database.get_app(session=session, app_id=app_id, user_email=email)
-    if app is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="App not found or you are not enrolled in this app",
-        )
+# The error responses of the preamble which differ from the default ones
+ENTRIES_ERRORS = {
+    "user": (client_error_response, -1, 404, "User not found"),
+    "role": (server_error_response, -1, 500, "Right now only students can submit entries, function for professors will be added later"),
+    "course": (client_error_response, -1, 404, "Course not found"),
+    "app": (client_error_response, -1, 404, "App not found or you are not enrolled in this app"),
+}
+
+# Largest number of entries a client can submit to the batch route at once
+MAX_BATCH_SIZE = 100
+# Number of entries returned by the search route when the client gives no limit
+DEFAULT_SEARCH_SIZE = 20
+
+
+def _requested_student_id(session, context: RequestContext):
+    # The student whose entries are read: professors may ask for any student of the
+    # app or for all of them (None), students only for themselves. Returns the id
+    # and None, or None and the error response.
+    user = context.user
+    course = context.course
+    app = context.app
     # Check if the user is professor, if not, check if student_id is provided
     # if student_id is provided, check if it is the same as the user's id
     student_id = request.args.get("student_id")
     if user.role == "professor":
         if student_id is not None:
             student = database.get_student_by_id(session=session, student_id=int(student_id))
-            if student is None or student not in course.students:
-                session.close()
-                return client_error_response(
+            if student is None or not database.check_student_in_course(session=session, course_id=course.id, student_id=student.id):
+                return None, client_error_response(
                     data={},
                     internal_code=-1,
                     status_code=404,
@@ -79,18 +57,8 @@ def get_entries(course_id: int, app_id: int):
                 )
             else:
                 # Check if the student is enrolled in the app
-                if app.enrolled_students is not None:
-                    if student not in app.enrolled_students:
-                        session.close()
-                        return client_error_response(
-                            data={},
-                            internal_code=-1,
-                            status_code=403,
-                            message="The student is not enrolled in this app",
-                        )
-                else:
-                    session.close()
-                    return client_error_response(
+                if not database.check_student_in_app(session=session, app_id=app.id, student_id=student.id):
+                    return None, client_error_response(
                         data={},
                         internal_code=-1,
                         status_code=403,
@@ -101,8 +69,7 @@ def get_entries(course_id: int, app_id: int):
     else:
         if student_id is not None:
             if student_id != str(user.id):
-                session.close()
-                return client_error_response(
+                return None, client_error_response(
                     data={},
                     internal_code=-1,
                     status_code=403,
@@ -110,38 +77,196 @@ def get_entries(course_id: int, app_id: int):
                 )
         else:
             student_id = user.id
-    print(student_id)
-    entries = database.get_app_entries(session=session, app_id=app_id, user_email=email, student_id=student_id)
+    return student_id, None
+
+
+def _timestamp(value) -> float:
+    # The timestamp of a time range filter or of an entry, nan, infinities and the
+    # values out of the range of datetime are rejected as malformed ones (ValueError)
+    timestamp = float(value)
+    try:
+        datetime.fromtimestamp(timestamp)
+    except (OverflowError, OSError) as e:
+        raise ValueError(f"Timestamp out of range: {value}") from e
+    return timestamp
+
+
+def _entry_dict(entry) -> dict:
+    # The entry of a listing row as returned to the client
+    return {
+        "entry_id": entry.id,
+        "entry_content": entry.content,
+        "create_at": entry.create_at.timestamp(),
+        "student_id": entry.student_id,
+        "app_id": entry.app_id,
+        "update_at": entry.update_at.timestamp(),
+    }
+
+
+def _entries_version(session, context: RequestContext):
+    # The entries of the app change with their number and version
+    versions = database.get_app_versions(session=session, app_id=context.app.id)
+    return (versions.num_entries, versions.entries_version) if versions is not None else None
+
+
+@entries_routes.route("/", methods=["GET"])
+@entries_routes.route("", methods=["GET"])
+@requires(course=True, app=True, errors=ENTRIES_ERRORS, version=_entries_version)
+def get_entries(course_id: int, app_id: int, context: RequestContext):
+    """This route will return entries the user has submitted. Or return all entries if the user is an admin."""
+    session = database.get_session()
+    email = context.email
+    student_id, error = _requested_student_id(session, context)
+    if error is not None:
+        return error
+    # Check the optional filters, the time range is given as timestamps
+    # of the creation time and the order can be either asc or desc
+    start_time = request.args.get("start_time")
+    end_time = request.args.get("end_time")
+    order = request.args.get("order", "asc")
+    try:
+        start_time = _timestamp(start_time) if start_time is not None else None
+        end_time = _timestamp(end_time) if end_time is not None else None
+    except ValueError:
+        return client_error_response(
+            data={},
+            internal_code=-1,
+            status_code=400,
+            message="Invalid time range, start_time and end_time must be timestamps",
+        )
+    if order not in ("asc", "desc"):
+        return client_error_response(
+            data={},
+            internal_code=-1,
+            status_code=400,
+            message="Invalid order value, you must provide either asc or desc",
+        )
+    # The entries are paginated when the client gives a limit or a cursor,
+    # the next page starts after the entry encoded in next_cursor
+    limit = request.args.get("limit")
+    cursor = request.args.get("cursor")
+    paginated = limit is not None or cursor is not None
+    after = None
+    try:
+        limit_num = page_size(limit) if paginated else None
+        if cursor is not None:
+            after = decode_cursor(cursor)
+    except ValueError as e:
+        return client_error_response(
+            data={},
+            internal_code=-1,
+            status_code=400,
+            message=str(e),
+        )
+    if not paginated:
+        # All the entries are asked for (an export of the app for instance), they
+        # are streamed from a server-side cursor instead of being held in memory
+        entries = database.stream_app_entries(
+            session=session,
+            app_id=app_id,
+            user_email=email,
+            student_id=student_id,
+            start_time=start_time,
+            end_time=end_time,
+            order=order,
+        )
+        if entries is None:
+            return client_error_response(
+                data={},
+                internal_code=-1,
+                status_code=403,
+                message="You are not enrolled in this app",
+            )
+        return streaming_success_response(data={
+            "entries": (_entry_dict(entry) for entry in entries),
+            "next_cursor": None,
+        })
+    entries = database.list_app_entries(
+        session=session,
+        app_id=app_id,
+        user_email=email,
+        student_id=student_id,
+        start_time=start_time,
+        end_time=end_time,
+        order=order,
+        after=after,
+        # Read one more entry to know if there is a next page
+        limit=limit_num + 1
+    )
+    next_cursor = None
+    if len(entries) > limit_num:
+        entries = entries[:limit_num]
+        next_cursor = encode_cursor(entries[-1].create_at, entries[-1].id)
+    all_entries = [_entry_dict(entry) for entry in entries]
+    return success_response(data={"entries": all_entries, "next_cursor": next_cursor})
+
+
+@entries_routes.route("/search", methods=["GET"])
+@entries_routes.route("/search/", methods=["GET"])
+@requires(course=True, app=True, errors=ENTRIES_ERRORS)
+def search_entries(course_id: int, app_id: int, context: RequestContext):
+    """This route will return the entries matching every word of the `q` parameter, the best
+    matches first, with a snippet of each entry and the [start, end) offsets of the matched words
+    in it. The snippet is URL quoted like the content of the entries, the offsets are in the quoted
+    snippet. The entries searched are the ones get_entries returns for the same `student_id`."""
+    session = database.get_session()
+    email = context.email
+    query = request.args.get("q", "")
+    if len(database.search_terms(query)) == 0:
+        return client_error_response(
+            data={},
+            internal_code=-1,
+            status_code=400,
+            message="The search query is required",
+        )
+    try:
+        limit_num = page_size(request.args.get("limit", str(DEFAULT_SEARCH_SIZE)))
+    except ValueError as e:
+        return client_error_response(
+            data={},
+            internal_code=-1,
+            status_code=400,
+            message=str(e),
+        )
+    student_id, error = _requested_student_id(session, context)
+    if error is not None:
+        return error
+    results = database.search_app_entries(
+        session=session,
+        app_id=app_id,
+        user_email=email,
+        query=query,
+        student_id=student_id,
+        limit=limit_num
+    )
+    if results is None:
+        return client_error_response(
+            data={},
+            internal_code=-1,
+            status_code=403,
+            message="You are not enrolled in this app",
+        )
     all_entries = []
-    for entry in entries:
+    for entry, (snippet, highlights) in results:
         all_entries.append(
             {
                 "entry_id": entry.id,
-                "entry_content": entry.content,
+                "snippet": snippet,
+                "highlights": highlights,
                 "create_at": entry.create_at.timestamp(),
                 "student_id": entry.student_id,
                 "app_id": entry.app_id,
                 "update_at": entry.update_at.timestamp(),
             }
         )
-    session.close()
     return success_response(data={"entries": all_entries})
 
 
 @entries_routes.route("/", methods=["POST"])
 @entries_routes.route("", methods=["POST"])
-def new_entry(course_id: int, app_id: int):
+@requires(user=False, errors=ENTRIES_ERRORS)
+def new_entry(course_id: int, app_id: int, context: RequestContext):
     """This route will create a new entry."""
-    jwt_result = validate_token_in_request(request)
-    if jwt_result["code"] != 0:
-        return client_error_response(
-            data={},
-            internal_code=jwt_result["code"],
-            status_code=401,
-            message=jwt_result["message"],
-        )
-    payload = jwt_result["data"]
-    email = payload["email"]
     entry_text = request.json.get("entry_text")
     study_start_time = request.json.get("study_start_time")
     study_duration_minutes = request.json.get("study_duration_minutes")
@@ -152,48 +277,14 @@ def new_entry(course_id: int, app_id: int):
             status_code=400,
             message="Content is required",
         )
-    _, Session, _ = database.init_connection(database_uri(), echo=False)
-    session = Session()
-    user = database.get_user(session=session, email=email)
-    if user is None:
-        session.close()
-        return server_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="User not found",
-        )
-    # Check if the user is professor
-    if user.role == "professor":
-        session.close()
-        return server_error_response(
-            data={},
-            internal_code=-1,
-            status_code=500,
-            message="Right now only students can submit entries, function for professors will be added later",
-        )
-    # Check if the given course_id and app_id are valid
-    course = database.get_course(session=session, course_id=course_id, user_email=email)
-    if course is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="Course not found",
-        )
-    app = database.get_app(session=session, app_id=app_id, user_email=email)
-    if app is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="App not found or you are not enrolled in this app",
-        )
+    # The body is checked before the user, the course and the app, as the clients expect
+    error = check_context(context, course=True, app=True, role="student", errors=ENTRIES_ERRORS)
+    if error is not None:
+        return error
+    session = database.get_session()
+    email = context.email
     # Check if the user joined the app
-    if not database.check_user_in_app(session=session, app_id=app_id, user_email=email):
-        session.close()
+    if not context.in_app:
         return client_error_response(
             data={},
             internal_code=-1,
@@ -205,98 +296,132 @@ def new_entry(course_id: int, app_id: int):
     # Add the entry to the database
     entry = database.add_entry(session=session, student_email=email, app_id=app_id, entry_text=entry_text, study_start_time=study_start_time, study_duration_minutes=study_duration_minutes)
     if entry is None:
-        session.close()
         return server_error_response(
             data={},
             internal_code=-1,
             status_code=500,
             message="Failed to add the entry",
         )
-    session.close()
     return success_response(data={})
 
 
-@entries_routes.route("/<entry_id>", methods=["GET"])
-@entries_routes.route("/<entry_id>/", methods=["GET"])
-def get_entry(course_id: int, app_id: int, entry_id: int):
-    """This route will return a single entry."""
-    jwt_result = validate_token_in_request(request)
-    if jwt_result["code"] != 0:
+@entries_routes.route("/batch", methods=["POST"])
+@entries_routes.route("/batch/", methods=["POST"])
+@requires(course=True, app=True, role="student", errors=ENTRIES_ERRORS)
+def new_entries_batch(course_id: int, app_id: int, context: RequestContext):
+    """This route will create the entries queued by a client in one transaction.
+
+    The body is {"entries": [{"entry_text", "study_start_time", "study_duration_minutes"}, ...]},
+    the result of each entry is returned in the same order, and only the valid entries are added.
+    """
+    data = request.get_json(silent=True)
+    items = data.get("entries") if isinstance(data, dict) else None
+    if not isinstance(items, list) or len(items) == 0:
         return client_error_response(
             data={},
-            internal_code=jwt_result["code"],
-            status_code=401,
-            message=jwt_result["message"],
+            internal_code=-1,
+            status_code=400,
+            message="Entries are required",
         )
-    payload = jwt_result["data"]
-    email = payload["email"]
-    _, Session, _ = database.init_connection(database_uri(), echo=False)
-    session = Session()
-    user = database.get_user(session=session, email=email)
-    if user is None:
-        session.close()
-        return server_error_response(
+    if len(items) > MAX_BATCH_SIZE:
+        return client_error_response(
             data={},
             internal_code=-1,
-            status_code=404,
-            message="User not found",
+            status_code=400,
+            message=f"Too many entries, you can submit at most {MAX_BATCH_SIZE} entries at once",
         )
-    # Check if the given course_id and app_id are valid
-    course = database.get_course(session=session, course_id=course_id, user_email=email)
-    if course is None:
-        session.close()
+    session = database.get_session()
+    email = context.email
+    # Check if the user joined the app
+    if not context.in_app:
         return client_error_response(
             data={},
             internal_code=-1,
-            status_code=404,
-            message="Course not found",
+            status_code=403,
+            message="You are not enrolled in this app",
         )
-    app = database.get_app(session=session, app_id=app_id, user_email=email)
-    if app is None:
-        session.close()
-        return client_error_response(
+    results = []
+    valid_entries = []
+    for index, item in enumerate(items):
+        message = _batch_item_error(item)
+        if message is not None:
+            results.append({"index": index, "status": "error", "message": message})
+            continue
+        results.append({"index": index, "status": "created"})
+        valid_entries.append({
+            # Santize the content before adding it to the database
+            "entry_text": quote(item["entry_text"], safe=" ,.?!;\n\'\""),
+            "study_start_time": item["study_start_time"],
+            "study_duration_minutes": item["study_duration_minutes"],
+        })
+    entry_ids = database.add_entries(session=session, app_id=app_id, student_email=email, entries=valid_entries)
+    if entry_ids is None:
+        return server_error_response(
             data={},
             internal_code=-1,
-            status_code=404,
-            message="App not found or you are not enrolled in this app",
+            status_code=500,
+            message="Failed to add the entries",
         )
+    # The ids are returned in the order the entries were given
+    added = iter(entry_ids)
+    for result in results:
+        if result["status"] == "created":
+            result["entry_id"] = next(added)
+    return success_response(data={"results": results})
+
+
+def _batch_item_error(item) -> str:
+    # The message explaining why an entry of a batch is rejected, or None if it is valid
+    if not isinstance(item, dict):
+        return "Entry must be an object"
+    if not isinstance(item.get("entry_text"), str):
+        return "Content is required"
+    study_start_time = item.get("study_start_time")
+    if isinstance(study_start_time, bool) or not isinstance(study_start_time, (int, float)):
+        return "Invalid study_start_time, it must be a timestamp"
+    try:
+        _timestamp(study_start_time)
+    except ValueError:
+        return "Invalid study_start_time, it must be a timestamp"
+    study_duration_minutes = item.get("study_duration_minutes")
+    if isinstance(study_duration_minutes, bool) or not isinstance(study_duration_minutes, int):
+        return "Invalid study_duration_minutes, it must be a number of minutes"
+    return None
+
+
+@entries_routes.route("/<entry_id>", methods=["GET"])
+@entries_routes.route("/<entry_id>/", methods=["GET"])
+@requires(course=True, app=True, errors=ENTRIES_ERRORS)
+def get_entry(course_id: int, app_id: int, entry_id: int, context: RequestContext):
+    """This route will return a single entry."""
+    session = database.get_session()
+    email = context.email
+    app = context.app
+    # Students only get their own entries, professors the entries of their apps
     entry = database.get_entry(session=session, entry_id=entry_id, user_email=email)
-    if entry is None and user.role != "professor":
-        session.close()
+    if entry is None or entry.app_id != app.id:
         return client_error_response(
             data={},
             internal_code=-1,
             status_code=404,
             message="Entry not found or you are not the author of this entry",
         )
-    elif user.role == "professor":
-        entry = database.get_entry(session=session, entry_id=entry_id)
-        if entry is None:
-            session.close()
-            return client_error_response(
-                data={},
-                internal_code=-1,
-                status_code=404,
-                message="Entry not found",
-            )
-    session.close()
-    return success_response(data={"entry": entry})
+    returned_entry = {
+        "entry_id": entry.id,
+        "entry_content": entry.content,
+        "create_at": entry.create_at.timestamp(),
+        "student_id": entry.student_id,
+        "app_id": entry.app_id,
+        "update_at": entry.update_at.timestamp(),
+    }
+    return success_response(data={"entry": returned_entry})
 
 
 @entries_routes.route("/<entry_id>", methods=["PUT"])
 @entries_routes.route("/<entry_id>/", methods=["PUT"])
-def update_entry(course_id: int, app_id: int, entry_id: int):
+@requires(user=False, errors=ENTRIES_ERRORS)
+def update_entry(course_id: int, app_id: int, entry_id: int, context: RequestContext):
     """This route will update a single entry."""
-    jwt_result = validate_token_in_request(request)
-    if jwt_result["code"] != 0:
-        return client_error_response(
-            data={},
-            internal_code=jwt_result["code"],
-            status_code=401,
-            message=jwt_result["message"],
-        )
-    payload = jwt_result["data"]
-    email = payload["email"]
     content = request.json.get("content")
     study_start_time = request.json.get("study_start_time")
     study_duration_minutes = request.json.get("study_duration_minutes")
@@ -307,48 +432,14 @@ def update_entry(course_id: int, app_id: int, entry_id: int):
             status_code=400,
             message="Content is required",
         )
-    _, Session, _ = database.init_connection(database_uri(), echo=False)
-    session = Session()
-    user = database.get_user(session=session, email=email)
-    if user is None:
-        session.close()
-        return server_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="User not found",
-        )
-    # Check if the user is professor
-    if user.role == "professor":
-        session.close()
-        return server_error_response(
-            data={},
-            internal_code=-1,
-            status_code=500,
-            message="Right now only students can submit entries, function for professors will be added later",
-        )
-    # Check if the given course_id and app_id are valid
-    course = database.get_course(session=session, course_id=course_id, user_email=email)
-    if course is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="Course not found",
-        )
-    app = database.get_app(session=session, app_id=app_id, user_email=email)
-    if app is None:
-        session.close()
-        return client_error_response(
-            data={},
-            internal_code=-1,
-            status_code=404,
-            message="App not found or you are not enrolled in this app",
-        )
+    # The body is checked before the user, the course and the app, as the clients expect
+    error = check_context(context, course=True, app=True, role="student", errors=ENTRIES_ERRORS)
+    if error is not None:
+        return error
+    session = database.get_session()
+    email = context.email
     entry = database.get_entry(session=session, entry_id=entry_id, user_email=email)
     if entry is None:
-        session.close()
         return client_error_response(
             data={},
             internal_code=-1,
@@ -360,13 +451,11 @@ def update_entry(course_id: int, app_id: int, entry_id: int):
     # Update the entry in the database
     entry = database.edit_entry(session=session, entry_id=entry_id, user_email=email, entry_text=content, study_start_time=study_start_time, study_duration_minutes=study_duration_minutes)
     if entry is None:
-        session.close()
         return server_error_response(
             data={},
             internal_code=-1,
             status_code=500,
             message="Failed to update the entry",
         )
-    session.close()
     return success_response(data={})
 
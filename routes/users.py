@@ -24,9 +24,10 @@ from urllib.parse import quote
 import html
 import requests
 import json
-from config.database import database_uri
 import database.connect as database
 from utils.jwt_utils import validate_token_in_request, generate_token
+from database.context import RequestContext
+from utils.request_preamble import requires
 from utils.api_response_wrapper import (
     success_response,
     client_error_response,
@@ -38,29 +39,12 @@ users_routes = Blueprint("users_routes", __name__)
 
 @users_routes.route("/", methods=["GET"])
 @users_routes.route("", methods=["GET"])
-def get_user_info():
+@requires()
+def get_user_info(context: RequestContext):
     """This route will return the user information."""
-    jwt_result = validate_token_in_request(request)
-    if jwt_result["code"] != 0:
-        return client_error_response(
-            data={},
-            internal_code=jwt_result["code"],
-            status_code=401,
-            message=jwt_result["message"],
-        )
-    payload = jwt_result["data"]
-    email = payload["email"]
-    _, Session, _ = database.init_connection(database_uri(), echo=False)
-    session = Session()
-    user = database.get_user(session=session, email=email)
-    if user is None:
-        session.close()
-        return server_error_response(
-            data={},
-            internal_code=-1,
-            status_code=500,
-            message="User not found",
-        )
+    session = database.get_session()
+    email = context.email
+    user = context.user
     user_info = {
         "firstName": user.first_name,
         "lastName": user.last_name,
@@ -72,11 +56,10 @@ def get_user_info():
         student = database.get_student(session=session, user_email=email)
         user_info["student"] = {
             "email": student.email,
-            "courses": [course.id for course in student.courses],
-            "enrolledApps": [app.id for app in student.enrolled_apps],
+            "courses": database.get_student_course_ids(session=session, student_id=student.id),
+            "enrolledApps": database.get_student_app_ids(session=session, student_id=student.id),
         }
             
-    session.close()
     return success_response(data={"user": user_info})
     
     
@@ -107,11 +90,9 @@ def register():
             status_code=400,
             message="Missing required fields",
         )
-    _, Session, _ = database.init_connection(database_uri(), echo=False)
-    session = Session()
+    session = database.get_session()
     user = database.get_user(session=session, email=email)
     if user is not None:
-        session.close()
         return client_error_response(
             data={},
             internal_code=-402,
@@ -119,7 +100,6 @@ def register():
             message="User already exists",
         )
     if email != payload["email"]:
-        session.close()
         return client_error_response(
             data={},
             internal_code=-403,
@@ -133,7 +113,6 @@ def register():
         email=email,
         role=role,
     )
-    session.close()
     return success_response(
         data={
             "jwt": generate_token(
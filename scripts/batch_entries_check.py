@@ -0,0 +1,61 @@
+"""
+This script will check, on a temporary SQLite database, the results of the route
+adding a batch of entries when some of them are invalid: an entry whose
+study_start_time is not a timestamp a datetime can hold (out of its range, NaN,
+infinities) is reported as the error of that entry, and the other entries are
+still added.
+
+The script exits with a non-zero status if a step fails.
+
+Usage:
+    python3 scripts/batch_entries_check.py
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import connect as database
+from database.migrations import migrate
+from scripts.benchmark_listings import populate
+from scripts.raiseload_check import check, create_app
+from utils.jwt_utils import generate_token
+import tempfile
+import time
+
+
+STUDENT_EMAIL = "student@example.com"
+# The JSON numbers, as the client sends them (NaN and Infinity are accepted by the parser)
+INVALID_TIMES = ("1e30", "-1e30", "NaN", "Infinity", "-Infinity")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        engine, Session = database.init_engine(f"sqlite:///{os.path.join(directory, 'batch_entries.sqlite')}")
+        migrate(engine)
+        populate(engine, 1, 1)
+        client = create_app().test_client()
+        headers = {
+            "Authorization": "Bearer " + generate_token({"email": STUDENT_EMAIL}),
+            "Content-Type": "application/json",
+        }
+        items = [f'{{"entry_text": "valid", "study_start_time": {time.time()}, "study_duration_minutes": 10}}']
+        items += [
+            f'{{"entry_text": "invalid", "study_start_time": {value}, "study_duration_minutes": 10}}'
+            for value in INVALID_TIMES
+        ]
+        body = '{"entries": [' + ", ".join(items) + "]}"
+        response = client.post("/courses/1/apps/1/entries/batch", data=body, headers=headers)
+        check(response.status_code == 200 and response.is_json, f"the batch is answered with its results ({response.status_code})")
+        results = response.get_json()["data"]["results"]
+        check(results[0]["status"] == "created", "the valid entry is added")
+        for value, result in zip(INVALID_TIMES, results[1:]):
+            check(result["status"] == "error" and "study_start_time" in result["message"],
+                  f"the entry starting at {value} is reported as invalid")
+        with Session() as session:
+            entries = database.list_app_entries(session=session, app_id=1, user_email=STUDENT_EMAIL)
+            check(sorted(entry.content for entry in entries) == ["Entry number 0", "valid"], "only the valid entry is stored")
+        engine.dispose()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
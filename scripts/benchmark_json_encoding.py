@@ -0,0 +1,112 @@
+"""
+This script will compare the encoding of the API responses before the encoders of
+`utils/json_encoder.py` (`json.dumps()` then `html.escape()` over the whole
+body, then the encoding of the string to UTF-8 by Flask) with the encoders, over
+generated payloads like the ones of the entries and of the analytics routes.
+
+The body of each encoder is checked to decode to the same payload as the one of
+the current path, and the median time of each encoding is printed.
+
+Usage:
+    python3 scripts/benchmark_json_encoding.py [number of entries] [runs]
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.json_encoder import JSONEncoder, OrjsonEncoder, orjson
+from urllib.parse import quote
+import html
+import json
+import random
+import statistics
+import time
+
+
+WORDS = (
+    "today I worked on the project with my team and we talked about the design of "
+    "the app, it was hard <but> fun & I learned a lot about testing the code "
+    "before the deadline of the week, tomorrow we will meet again"
+).split()
+
+
+def sentence(length: int) -> str:
+    return " ".join(random.choice(WORDS) for _ in range(length))
+
+
+def entries_payload(num_entries: int) -> dict:
+    # As returned by the entries routes, the content is stored URL quoted
+    return {"entries": [
+        {
+            "entry_id": i,
+            "title": sentence(6),
+            "content": quote(sentence(random.randint(50, 400))),
+            "create_at": 1700000000.0 + i * 60,
+            "update_at": 1700000000.0 + i * 60,
+            "student_id": i % 40 + 2,
+            "app_id": 1,
+        }
+        for i in range(num_entries)
+    ]}
+
+
+def analytics_payload(num_entries: int) -> dict:
+    # As returned by the wordcloud route of the analytics
+    return {
+        "wordcloud": [{"text": word, "value": random.randint(1, 500)} for word in set(WORDS)],
+        "sentences": [
+            {
+                "sentence": sentence(20),
+                "sentiment": round(random.uniform(-1, 1), 2),
+                "user": "First Last",
+                "user_id": i % 40 + 2,
+            }
+            for i in range(num_entries)
+        ],
+        "graph": [{"x": random.randint(50, 400), "y": round(random.uniform(-1, 1), 2)} for _ in range(num_entries)],
+    }
+
+
+def current_encode(payload) -> bytes:
+    return html.escape(json.dumps(payload), quote=False).encode()
+
+
+def median_ms(encode, payload, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        encode(payload)
+        times.append((time.perf_counter() - started_at) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    num_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    random.seed(0)
+    encoders = [("current", current_encode), ("json", JSONEncoder().encode)]
+    if orjson is not None:
+        encoders.append(("orjson", OrjsonEncoder().encode))
+    else:
+        print("orjson is not installed, only the encoder of the standard library is measured")
+    payloads = [
+        ("entries", entries_payload(num_entries)),
+        ("analytics", analytics_payload(num_entries)),
+    ]
+    print(f"{'payload':>10} {'encoder':>10} {'median ms':>10} {'speedup':>8} {'body KB':>8}")
+    for payload_name, payload in payloads:
+        payload = {"code": 0, "message": "", "data": payload}
+        expected = json.loads(current_encode(payload))
+        baseline = None
+        for encoder_name, encode in encoders:
+            body = encode(payload)
+            if json.loads(body) != expected:
+                print(f"The {encoder_name} encoder does not return the same {payload_name} payload")
+                sys.exit(1)
+            elapsed = median_ms(encode, payload, runs)
+            baseline = baseline or elapsed
+            print(f"{payload_name:>10} {encoder_name:>10} {elapsed:>10.2f} {baseline / elapsed:>7.1f}x {len(body) / 1024:>8.0f}")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
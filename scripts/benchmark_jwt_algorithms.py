@@ -0,0 +1,65 @@
+"""
+This script will compare the JWT algorithms the server supports (RS256, ES256
+and EdDSA) by the number of tokens signed and verified per second, with keys
+generated in memory and a payload like the one of the login tokens.
+
+The verification is done without the cache of the verified tokens, as for the
+first request of each token (see `benchmark_token_cache.py`).
+
+Usage:
+    python3 scripts/benchmark_jwt_algorithms.py [duration of each measure in seconds]
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.jwt import SUPPORTED_ALGORITHMS
+from scripts.jwt_cert_creation import generate_private_key
+import datetime
+import jwt
+import time
+
+
+def payload() -> dict:
+    return {
+        "email": "student@example.com",
+        "exp": datetime.datetime.now(tz=datetime.timezone.utc) + datetime.timedelta(hours=1),
+    }
+
+
+def operations_per_second(operation, duration: float) -> float:
+    # Run the operation for about the given duration, by batches to keep the
+    # clock out of the measure
+    count = 0
+    batch = 10
+    started_at = time.perf_counter()
+    while True:
+        for _ in range(batch):
+            operation()
+        count += batch
+        elapsed = time.perf_counter() - started_at
+        if elapsed >= duration:
+            return count / elapsed
+        batch = min(batch * 2, 1000)
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    print(f"{'algorithm':>10} {'sign/s':>12} {'verify/s':>12} {'token size':>12}")
+    for algorithm in SUPPORTED_ALGORITHMS:
+        private_key = generate_private_key(algorithm)
+        public_key = private_key.public_key()
+        token = jwt.encode(payload(), private_key, algorithm=algorithm, headers={"kid": "benchmark"})
+        signs = operations_per_second(
+            lambda: jwt.encode(payload(), private_key, algorithm=algorithm, headers={"kid": "benchmark"}),
+            duration,
+        )
+        verifies = operations_per_second(
+            lambda: jwt.decode(token, public_key, algorithms=[algorithm]),
+            duration,
+        )
+        print(f"{algorithm:>10} {signs:>12.0f} {verifies:>12.0f} {len(token):>12}")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
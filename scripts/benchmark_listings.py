@@ -0,0 +1,158 @@
+"""
+This script will compare, on a temporary SQLite database, the listing helpers
+returning read-only rows (list_app_entries, list_apps, list_courses) with the ORM
+helpers they replace in the routes (get_app_entries, get_apps, get_courses), both
+including the building of the dictionaries returned to the client.
+
+Each run uses a new session, as a request does, and the median time and the memory
+allocated at the peak of the run are printed for each helper.
+
+Usage:
+    python3 scripts/benchmark_listings.py [number of entries] [number of apps] [runs]
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import connect as database
+from database import models
+from database.counters import rebuild_counters
+from database.migrations import migrate
+import datetime
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+
+PROFESSOR_EMAIL = "professor@example.com"
+
+
+def populate(engine, num_entries: int, num_apps: int):
+    now = datetime.datetime.now()
+    with engine.begin() as connection:
+        connection.execute(models.User.__table__.insert(), [
+            {"id": 1, "first_name": "P", "last_name": "P", "email": PROFESSOR_EMAIL, "role": "professor"},
+            {"id": 2, "first_name": "S", "last_name": "S", "email": "student@example.com", "role": "student"},
+        ])
+        connection.execute(models.Professor.__table__.insert(), [{"id": 1, "email": PROFESSOR_EMAIL}])
+        connection.execute(models.Student.__table__.insert(), [{"id": 2, "email": "student@example.com"}])
+        connection.execute(models.Course.__table__.insert(), [{"id": 1, "name": "Course", "identifier": "C 1"}])
+        connection.execute(models.course_professor_table.insert(), [{"course_id": 1, "professor_id": 1}])
+        connection.execute(models.course_student_table.insert(), [{"course_id": 1, "student_id": 2}])
+        connection.execute(models.App.__table__.insert(), [
+            {"id": app_id, "name": f"App {app_id}", "intro": "Intro", "start_time": now, "end_time": now,
+             "num_entries": 10, "max_students": 100, "template": "template"}
+            for app_id in range(1, num_apps + 1)
+        ])
+        connection.execute(models.course_app_table.insert(), [
+            {"course_id": 1, "app_id": app_id} for app_id in range(1, num_apps + 1)
+        ])
+        connection.execute(models.Stopword.__table__.insert(), [
+            {"app_id": app_id, "word": word, "enabled": True}
+            for app_id in range(1, num_apps + 1) for word in ("the", "a", "an")
+        ])
+        connection.execute(models.app_student_table.insert(), [{"app_id": 1, "student_id": 2}])
+        connection.execute(models.Entry.__table__.insert(), [
+            {"student_id": 2, "app_id": 1, "content": f"Entry number {i}", "study_start_time": now,
+             "study_duration_minutes": 10, "create_at": now + datetime.timedelta(seconds=i),
+             "update_at": now + datetime.timedelta(seconds=i)}
+            for i in range(num_entries)
+        ])
+        rebuild_counters(connection)
+
+
+def entries_orm(session):
+    return [
+        {"entry_id": entry.id, "entry_content": entry.content, "create_at": entry.create_at.timestamp(),
+         "student_id": entry.student_id, "app_id": entry.app_id, "update_at": entry.update_at.timestamp()}
+        for entry in database.get_app_entries(session=session, app_id=1, user_email=PROFESSOR_EMAIL)
+    ]
+
+
+def entries_rows(session):
+    return [
+        {"entry_id": entry.id, "entry_content": entry.content, "create_at": entry.create_at.timestamp(),
+         "student_id": entry.student_id, "app_id": entry.app_id, "update_at": entry.update_at.timestamp()}
+        for entry in database.list_app_entries(session=session, app_id=1, user_email=PROFESSOR_EMAIL)
+    ]
+
+
+def apps_orm(session):
+    apps = database.get_apps(session=session, course_id=1, user_email=PROFESSOR_EMAIL)
+    num_students = database.count_apps_students(session=session, app_ids=[app.id for app in apps])
+    return [
+        {"id": app.id, "name": app.name, "intro": app.intro, "start_time": app.start_time.timestamp(),
+         "end_time": app.end_time.timestamp(), "num_entries": app.num_entries, "max_students": app.max_students,
+         "num_students": num_students[app.id], "template_link": app.template,
+         "stopwords": [stopword.word for stopword in app.stopwords]}
+        for app in apps
+    ]
+
+
+def apps_rows(session):
+    apps = database.list_apps(session=session, course_id=1, user_email=PROFESSOR_EMAIL)
+    stopwords = database.list_apps_stopwords(session=session, app_ids=[app.id for app in apps])
+    return [
+        {"id": app.id, "name": app.name, "intro": app.intro, "start_time": app.start_time.timestamp(),
+         "end_time": app.end_time.timestamp(), "num_entries": app.num_entries, "max_students": app.max_students,
+         "num_students": app.num_students, "template_link": app.template, "stopwords": stopwords[app.id]}
+        for app in apps
+    ]
+
+
+def courses_orm(session):
+    return [
+        {"course_number": course.identifier, "course_name": course.name, "course_id": course.id}
+        for course in database.get_courses(session=session, user_email=PROFESSOR_EMAIL)
+    ]
+
+
+def courses_rows(session):
+    return [
+        {"course_number": course.identifier, "course_name": course.name, "course_id": course.id}
+        for course in database.list_courses(session=session, user_email=PROFESSOR_EMAIL)
+    ]
+
+
+def measure(Session, listing, runs: int) -> tuple:
+    durations = []
+    for _ in range(runs):
+        with Session() as session:
+            started_at = time.perf_counter()
+            listing(session)
+            durations.append(time.perf_counter() - started_at)
+    with Session() as session:
+        tracemalloc.start()
+        result = listing(session)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return statistics.median(durations), peak, result
+
+
+def main(num_entries=5000, num_apps=200, runs=20):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'benchmark.sqlite')}")
+        migrate(engine)
+        populate(engine, num_entries, num_apps)
+        Session = sessionmaker(bind=engine)
+        print(f"{num_entries} entries, {num_apps} apps, median of {runs} runs")
+        print(f"{'listing':<10}{'helper':<18}{'time (ms)':>12}{'peak (KiB)':>12}")
+        for name, orm_listing, rows_listing in (
+            ("entries", entries_orm, entries_rows),
+            ("apps", apps_orm, apps_rows),
+            ("courses", courses_orm, courses_rows),
+        ):
+            orm_time, orm_peak, orm_result = measure(Session, orm_listing, runs)
+            rows_time, rows_peak, rows_result = measure(Session, rows_listing, runs)
+            # Both paths must return the same listing
+            assert orm_result == rows_result, f"The {name} listings differ"
+            print(f"{name:<10}{'ORM objects':<18}{orm_time * 1000:>12.2f}{orm_peak / 1024:>12.0f}")
+            print(f"{name:<10}{'rows':<18}{rows_time * 1000:>12.2f}{rows_peak / 1024:>12.0f}")
+        engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(arg) for arg in sys.argv[1:4])))
@@ -0,0 +1,95 @@
+"""
+This script will compare, on a temporary SQLite database, the memory allocated at
+the peak of the listing of all the entries of an app when the response is built in
+memory (list_app_entries() and success_response(), as the paginated listing does)
+and when it is streamed (stream_app_entries() and streaming_success_response(), as
+the listing of all the entries does), for growing numbers of entries.
+
+The body of the streamed response is read by chunks, as the server sends it, and
+checked to decode to the same payload as the one built in memory.
+
+Usage:
+    python3 scripts/benchmark_streaming.py [size of the content of the entries in bytes]
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask import Flask
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+from database import connect as database
+from database import models
+from database.migrations import migrate
+from scripts.benchmark_listings import PROFESSOR_EMAIL, populate
+from utils.api_response_wrapper import success_response, streaming_success_response
+import json
+import tempfile
+import time
+import tracemalloc
+
+
+def entry_dict(entry) -> dict:
+    return {
+        "entry_id": entry.id, "entry_content": entry.content, "create_at": entry.create_at.timestamp(),
+        "student_id": entry.student_id, "app_id": entry.app_id, "update_at": entry.update_at.timestamp(),
+    }
+
+
+def buffered_body(session) -> bytes:
+    entries = database.list_app_entries(session=session, app_id=1, user_email=PROFESSOR_EMAIL)
+    response = success_response(data={"entries": [entry_dict(entry) for entry in entries], "next_cursor": None})
+    return response.get_data()
+
+
+def streamed_body(session, keep: bool = False) -> bytes:
+    entries = database.stream_app_entries(session=session, app_id=1, user_email=PROFESSOR_EMAIL)
+    response = streaming_success_response(data={
+        "entries": (entry_dict(entry) for entry in entries),
+        "next_cursor": None,
+    })
+    # The chunks are dropped once sent, unless the body is kept to be checked
+    chunks = []
+    for chunk in response.response:
+        if keep:
+            chunks.append(chunk)
+    response.close()
+    return b"".join(chunks)
+
+
+def measure(Session, listing) -> tuple:
+    with Session() as session:
+        tracemalloc.start()
+        started_at = time.perf_counter()
+        listing(session)
+        elapsed = time.perf_counter() - started_at
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(content_size=1000):
+    app = Flask(__name__)
+    print(f"Entries of {content_size} bytes")
+    print(f"{'entries':>8}{'response':>12}{'time (ms)':>12}{'peak (KiB)':>12}")
+    for num_entries in (1000, 10000, 50000):
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_engine(f"sqlite:///{os.path.join(directory, 'benchmark.sqlite')}")
+            migrate(engine)
+            populate(engine, num_entries, 1)
+            with engine.begin() as connection:
+                connection.execute(update(models.Entry).values(content=models.Entry.content + " " + "x" * content_size))
+            Session = sessionmaker(bind=engine)
+            # The streamed body is iterated in a request, as the server does
+            with app.test_request_context():
+                with Session() as session:
+                    assert json.loads(buffered_body(session)) == json.loads(streamed_body(session, keep=True)), \
+                        "The streamed response differs"
+                for name, listing in (("buffered", buffered_body), ("streamed", streamed_body)):
+                    elapsed, peak = measure(Session, listing)
+                    print(f"{num_entries:>8}{name:>12}{elapsed * 1000:>12.0f}{peak / 1024:>12.0f}")
+            engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(arg) for arg in sys.argv[1:2])))
@@ -0,0 +1,70 @@
+"""
+This script will compare the cost of validating JWT tokens with and without the
+cache of the verified tokens (utils/token_cache.py), with the keys and the
+settings of `config/secret`.
+
+A session is simulated by a number of clients, each presenting its own token for
+a number of requests. The median time of a validation is printed for both ways,
+with the metrics of the cache.
+
+Usage:
+    python3 scripts/benchmark_token_cache.py [number of clients] [requests per client] [runs]
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import jwt_utils
+from config.runtime import runtime_config
+import datetime
+import random
+import statistics
+import time
+
+
+def make_tokens(num_clients: int) -> list:
+    expires_at = datetime.datetime.now(tz=datetime.timezone.utc) + datetime.timedelta(hours=1)
+    return [
+        jwt_utils.generate_token({"email": f"student{client}@example.com", "exp": expires_at})
+        for client in range(num_clients)
+    ]
+
+
+def run(tokens: list, requests_per_client: int, use_cache: bool) -> float:
+    # The requests of the clients are interleaved, as on a server
+    requests = tokens * requests_per_client
+    random.shuffle(requests)
+    started_at = time.perf_counter()
+    for token in requests:
+        if jwt_utils.validate_token(token, use_cache=use_cache)["code"] != 0:
+            raise RuntimeError("A token of the benchmark is not valid.")
+    return (time.perf_counter() - started_at) / len(requests)
+
+
+def main():
+    num_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    requests_per_client = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    config = runtime_config()
+    print(f"{num_clients} clients, {requests_per_client} requests each, {runs} runs, "
+          f"{config.key_ring.signing_algorithm} keys, cache of {config.jwt_cache_size} tokens")
+    tokens = make_tokens(num_clients)
+    results = {}
+    for use_cache in (False, True):
+        timings = []
+        for _ in range(runs):
+            # Each run starts with an empty cache, as a new worker does
+            jwt_utils._verified_token_cache().clear()
+            timings.append(run(tokens, requests_per_client, use_cache))
+        results[use_cache] = statistics.median(timings)
+        name = "with cache" if use_cache else "without cache"
+        print(f"{name:>14}: {results[use_cache] * 1e6:10.1f} us per validation, "
+              f"{1 / results[use_cache]:10.0f} validations/s")
+    stats = jwt_utils.token_cache_stats()
+    print(f"cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions, "
+          f"hit rate {stats['hit_rate']:.1%} (last run)")
+    print(f"speedup: {results[False] / results[True]:.1f}x")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 import os
 import sys
-from dotenv import load_dotenv, set_key
+from dotenv import load_dotenv, set_key, dotenv_values
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from scripts.jwt_cert_creation import jwt_create
+from scripts.migrate import migrate_database
 
 
 # Define the path of the config file
@@ -115,6 +116,11 @@ if not skip_flask_host:
     set_key(DOTENV_PATH, "FLASK_HOST", flask_host)
     print("The host for the Flask app has been successfully set.")
 
+print()
+print("Setting up the database schema...")
+# Create or upgrade the database schema with the configured database URI
+migrate_database(dotenv_values(DOTENV_PATH)["DATABASE_URI"])
+
 print()
 print("Done with setting up the environment variables!")
 print("You can now run the app using the following command after activating the virtual environment and " +
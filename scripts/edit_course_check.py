@@ -0,0 +1,63 @@
+"""
+This script will check, on a temporary SQLite database, the order of the checks of
+the route editing a course, as the clients expect it: a body missing the course name
+or number is answered with a 400 before the course is checked, then a course the
+user does not belong to with a 404, and a student with a 403.
+
+The script exits with a non-zero status if a step fails.
+
+Usage:
+    python3 scripts/edit_course_check.py
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import connect as database
+from database import models
+from database.migrations import migrate
+from scripts.benchmark_listings import PROFESSOR_EMAIL, populate
+from scripts.raiseload_check import check, create_app
+from utils.jwt_utils import generate_token
+import tempfile
+
+
+STUDENT_EMAIL = "student@example.com"
+OTHER_PROFESSOR_EMAIL = "other.professor@example.com"
+FULL_BODY = {"courseName": "Renamed course", "courseNumber": "C 2"}
+MISSING_BODY = {"courseName": "Renamed course"}
+
+# (email, course id, body, expected status code)
+CASES = (
+    (OTHER_PROFESSOR_EMAIL, 1, MISSING_BODY, 400),
+    (OTHER_PROFESSOR_EMAIL, 99, MISSING_BODY, 400),
+    (OTHER_PROFESSOR_EMAIL, 1, FULL_BODY, 404),
+    (OTHER_PROFESSOR_EMAIL, 99, FULL_BODY, 404),
+    (STUDENT_EMAIL, 1, MISSING_BODY, 400),
+    (STUDENT_EMAIL, 1, FULL_BODY, 403),
+    (PROFESSOR_EMAIL, 1, MISSING_BODY, 400),
+    (PROFESSOR_EMAIL, 1, FULL_BODY, 200),
+)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        engine, _ = database.init_engine(f"sqlite:///{os.path.join(directory, 'edit_course.sqlite')}")
+        migrate(engine)
+        populate(engine, 1, 1)
+        with engine.begin() as connection:
+            connection.execute(models.User.__table__.insert(), [
+                {"id": 3, "first_name": "O", "last_name": "P", "email": OTHER_PROFESSOR_EMAIL, "role": "professor"},
+            ])
+            connection.execute(models.Professor.__table__.insert(), [{"id": 3, "email": OTHER_PROFESSOR_EMAIL}])
+        client = create_app().test_client()
+        for email, course_id, body, status_code in CASES:
+            headers = {"Authorization": "Bearer " + generate_token({"email": email})}
+            response = client.put(f"/courses/{course_id}", json=body, headers=headers)
+            check(response.status_code == status_code,
+                  f"PUT /courses/{course_id} by {email} with {sorted(body)} is answered with {status_code} ({response.status_code})")
+        engine.dispose()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
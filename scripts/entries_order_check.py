@@ -0,0 +1,69 @@
+"""
+This script will check, on a temporary SQLite database, the order of the checks of
+the routes adding and editing an entry, as the clients expect it: a body missing the
+content is answered with a 400 before the user, the course and the app are checked,
+then an unknown user with a 404, a professor with a 500, and a course or an app the
+student does not belong to with a 404.
+
+The script exits with a non-zero status if a step fails.
+
+Usage:
+    python3 scripts/entries_order_check.py
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import connect as database
+from database import models
+from database.migrations import migrate
+from scripts.benchmark_listings import PROFESSOR_EMAIL, populate
+from scripts.raiseload_check import check, create_app
+from utils.jwt_utils import generate_token
+import tempfile
+import time
+
+
+STUDENT_EMAIL = "student@example.com"
+OUTSIDER_EMAIL = "outsider@example.com"
+UNKNOWN_EMAIL = "unknown@example.com"
+
+# (email, URL, expected status code without and with the content)
+CASES = (
+    (PROFESSOR_EMAIL, "/courses/1/apps/1/entries", 400, 500),
+    (OUTSIDER_EMAIL, "/courses/1/apps/1/entries", 400, 404),
+    (UNKNOWN_EMAIL, "/courses/1/apps/1/entries", 400, 404),
+    (STUDENT_EMAIL, "/courses/99/apps/1/entries", 400, 404),
+    (STUDENT_EMAIL, "/courses/1/apps/99/entries", 400, 404),
+    (STUDENT_EMAIL, "/courses/1/apps/1/entries", 400, 200),
+)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        engine, _ = database.init_engine(f"sqlite:///{os.path.join(directory, 'entries_order.sqlite')}")
+        migrate(engine)
+        populate(engine, 1, 1)
+        with engine.begin() as connection:
+            connection.execute(models.User.__table__.insert(), [
+                {"id": 4, "first_name": "O", "last_name": "S", "email": OUTSIDER_EMAIL, "role": "student"},
+            ])
+            connection.execute(models.Student.__table__.insert(), [{"id": 4, "email": OUTSIDER_EMAIL}])
+        client = create_app().test_client()
+        for email, url, missing_status_code, status_code in CASES:
+            headers = {"Authorization": "Bearer " + generate_token({"email": email})}
+            # The new entry, then the edit of the entry added by populate()
+            for method, entry_url, content_field in (("POST", url, "entry_text"), ("PUT", f"{url}/1", "content")):
+                body = {"study_start_time": time.time(), "study_duration_minutes": 10}
+                response = client.open(entry_url, method=method, json=body, headers=headers)
+                check(response.status_code == missing_status_code,
+                      f"{method} {entry_url} by {email} without content is answered with {missing_status_code} ({response.status_code})")
+                body[content_field] = "A walk in the forest"
+                response = client.open(entry_url, method=method, json=body, headers=headers)
+                check(response.status_code == status_code,
+                      f"{method} {entry_url} by {email} is answered with {status_code} ({response.status_code})")
+        engine.dispose()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
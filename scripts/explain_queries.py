@@ -0,0 +1,129 @@
+"""
+This script will print the query plans of the queries issued by the routes on
+their hot paths, so it can be checked that they are served by the indexes declared
+in `database/models.py` instead of full table scans.
+
+On SQLite, a plan step scanning a whole table (`SCAN <table>` without an index)
+is reported, and the script exits with a non-zero status if any hot query has one.
+On other databases, the plans are printed as returned by `EXPLAIN`.
+
+Usage:
+    python3 scripts/explain_queries.py [database URI]
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import exists, func, select
+from sqlalchemy.orm import Session
+from config.database import database_uri, database_sqlite_profile, database_sqlite_busy_timeout
+from database.connect import init_engine, _app_entries_query
+from database.migrations import check_schema_version
+from database import models
+import datetime
+
+
+def hot_queries(session: Session) -> dict:
+    # Values do not matter for the plans, only the shape of the queries
+    app_id, student_id, course_id = 1, 1, 1
+    after = (datetime.datetime(2024, 1, 1), 1)
+    return {
+        "user by email": select(models.User).where(models.User.email == "user@example.com"),
+        "student in course": select(exists().where(
+            models.course_student_table.c.course_id == course_id,
+            models.course_student_table.c.student_id == student_id,
+        )),
+        "professor in course": select(exists().where(
+            models.course_professor_table.c.course_id == course_id,
+            models.course_professor_table.c.professor_id == student_id,
+        )),
+        "student in app": select(exists().where(
+            models.app_student_table.c.app_id == app_id,
+            models.app_student_table.c.student_id == student_id,
+        )),
+        "professor in app": select(exists().where(
+            models.course_app_table.c.app_id == app_id,
+            models.course_app_table.c.course_id == models.course_professor_table.c.course_id,
+            models.course_professor_table.c.professor_id == student_id,
+        )),
+        "students of app (count)": select(func.count()).select_from(models.app_student_table).where(
+            models.app_student_table.c.app_id == app_id
+        ),
+        "courses of student": select(models.Course).join(
+            models.course_student_table, models.course_student_table.c.course_id == models.Course.id
+        ).where(models.course_student_table.c.student_id == student_id),
+        "courses of professor": select(models.Course).join(
+            models.course_professor_table, models.course_professor_table.c.course_id == models.Course.id
+        ).where(models.course_professor_table.c.professor_id == student_id),
+        "apps of course": select(models.App).join(
+            models.course_app_table, models.course_app_table.c.app_id == models.App.id
+        ).where(models.course_app_table.c.course_id == course_id),
+        "courses of app": select(models.Course).join(
+            models.course_app_table, models.course_app_table.c.course_id == models.Course.id
+        ).where(models.course_app_table.c.app_id == app_id),
+        "apps of student": select(models.App).join(
+            models.app_student_table, models.app_student_table.c.app_id == models.App.id
+        ).where(models.app_student_table.c.student_id == student_id),
+        "stopwords of app": select(models.Stopword).where(models.Stopword.app_id == app_id),
+        "entries of app": _app_entries_query(session, app_id).statement,
+        "entries of app (page)": _app_entries_query(session, app_id, order="desc", after=after, limit=100).statement,
+        "entries of student in app": _app_entries_query(session, app_id, student_id).statement,
+        "entries of student in app (page)": _app_entries_query(session, app_id, student_id, after=after, limit=100).statement,
+        "entries of student": select(models.Entry).where(models.Entry.student_id == student_id),
+    }
+
+
+def explain(connection, statement) -> list:
+    compiled = statement.compile(dialect=connection.dialect)
+    if connection.dialect.name == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        prefix = "EXPLAIN "
+    if compiled.positiontup is not None:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    # Let the driver bind plain values, the plan does not depend on them
+    if isinstance(params, tuple):
+        params = tuple(str(value) if isinstance(value, datetime.datetime) else value for value in params)
+    else:
+        params = {key: str(value) if isinstance(value, datetime.datetime) else value for key, value in params.items()}
+    rows = connection.exec_driver_sql(prefix + str(compiled), params).fetchall()
+    if connection.dialect.name == "sqlite":
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    return [" ".join(str(column) for column in row) for row in rows]
+
+
+def is_full_scan(step: str) -> bool:
+    # e.g. "SCAN entries" is a full scan, "SCAN entries USING INDEX ..." is not
+    return step.startswith("SCAN ") and " USING " not in step and "CONSTANT ROW" not in step
+
+
+def main(uri=None):
+    engine, Session = init_engine(
+        uri if uri is not None else database_uri(),
+        echo=False,
+        sqlite_profile=database_sqlite_profile(),
+        sqlite_busy_timeout=database_sqlite_busy_timeout(),
+    )
+    check_schema_version(engine)
+    full_scans = []
+    with Session() as session, engine.connect() as connection:
+        for name, statement in hot_queries(session).items():
+            print(f"== {name}")
+            for step in explain(connection, statement):
+                print(f"   {step}")
+                if connection.dialect.name == "sqlite" and is_full_scan(step):
+                    full_scans.append(name)
+            print()
+    if full_scans:
+        print("Queries with full table scans:")
+        for name in full_scans:
+            print(f" - {name}")
+        return 1
+    print("No hot query does a full table scan.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1] if len(sys.argv) > 1 else None))
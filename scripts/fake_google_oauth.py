@@ -0,0 +1,106 @@
+"""
+This script will run a local server standing in for the Google OAuth2 endpoints
+used by the login (token, user info and certificates), so the login can be
+tested and load-tested offline.
+
+Any code is accepted and exchanged for an access token and an ID token signed by
+a key generated when the server starts. The email of the user is the code if it
+looks like an email, `<code>@example.com` otherwise. The codes starting with
+`invalid` are refused, as Google refuses a used or expired code.
+
+Point the backend at it with `GOOGLE_OAUTH_BASE_URL=http://localhost:<port>` in
+the `.env` file. The backend still reads `config/secret/client_secret.json`, any
+client id and secret can be used.
+
+Usage:
+    python3 scripts/fake_google_oauth.py [port] [delay in seconds of each response]
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask import Flask, jsonify, request
+from scripts.jwt_cert_creation import generate_private_key
+import datetime
+import hashlib
+import json
+import jwt
+import secrets
+import time
+from urllib.parse import unquote
+
+
+KEY_ID = "fake-google-key"
+
+
+def create_app(delay: float = 0) -> Flask:
+    app = Flask(__name__)
+    private_key = generate_private_key("RS256")
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update({"kid": KEY_ID, "alg": "RS256", "use": "sig"})
+    # The emails of the access tokens given
+    access_tokens = {}
+
+    @app.before_request
+    def slow_down():
+        if delay > 0:
+            time.sleep(delay)
+
+    @app.route("/token", methods=["POST"])
+    def token():
+        # The backend sends the code URL quoted
+        code = unquote(request.form.get("code", ""))
+        if code == "" or code.startswith("invalid"):
+            return jsonify({"error": "invalid_grant", "error_description": "Bad Request"}), 400
+        email = code if "@" in code else f"{code}@example.com"
+        access_token = secrets.token_urlsafe(32)
+        access_tokens[access_token] = email
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        id_token = jwt.encode({
+            "iss": request.host_url.rstrip("/"),
+            "aud": request.form.get("client_id"),
+            "sub": hashlib.sha256(email.encode()).hexdigest()[:21],
+            "email": email,
+            "email_verified": True,
+            "iat": now,
+            "exp": now + datetime.timedelta(hours=1),
+        }, private_key, algorithm="RS256", headers={"kid": KEY_ID})
+        return jsonify({
+            "access_token": access_token,
+            "expires_in": 3599,
+            "scope": "openid https://www.googleapis.com/auth/userinfo.email",
+            "token_type": "Bearer",
+            "id_token": id_token,
+        })
+
+    @app.route("/userinfo", methods=["GET"])
+    def userinfo():
+        access_token = request.headers.get("Authorization", "").split(" ")[-1]
+        email = access_tokens.get(access_token)
+        if email is None:
+            return jsonify({"error": {"code": 401, "message": "Invalid Credentials"}}), 401
+        return jsonify({
+            "id": hashlib.sha256(email.encode()).hexdigest()[:21],
+            "email": email,
+            "verified_email": True,
+        })
+
+    @app.route("/certs", methods=["GET"])
+    def certs():
+        response = jsonify({"keys": [jwk]})
+        response.headers["Cache-Control"] = "public, max-age=3600"
+        return response
+
+    return app
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 5050
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0
+    print(f"Fake Google OAuth2 server on http://localhost:{port}, {delay}s per response")
+    print(f"Set GOOGLE_OAUTH_BASE_URL=http://localhost:{port} to log in with it")
+    create_app(delay).run(host="localhost", port=port, threaded=True)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
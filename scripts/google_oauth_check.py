@@ -0,0 +1,89 @@
+"""
+This script will check the fallbacks of the Google OAuth2 client against the local
+server of `scripts/fake_google_oauth.py`: when the ID token cannot be verified
+locally, because it was tampered with or because the certificates endpoint answers
+an error page instead of JSON, the user info is read from Google, and the warning
+logged does not quote the token.
+
+The script exits with a non-zero status if a step fails.
+
+Usage:
+    python3 scripts/google_oauth_check.py
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask import Flask, request
+from werkzeug.serving import make_server
+from scripts.fake_google_oauth import create_app
+from utils.google_oauth import GoogleOAuthClient
+import logging
+import threading
+
+
+EMAIL = "student@example.com"
+CLIENT_SECRETS = {"web": {"client_id": "client", "client_secret": "secret", "redirect_uris": ["http://localhost"]}}
+
+
+def check(condition: bool, message: str):
+    if not condition:
+        print("FAILED:", message)
+        sys.exit(1)
+    print("OK:", message)
+
+
+class _Records(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def main():
+    fake_google = create_app()
+    html_certs = {"enabled": False}
+
+    @fake_google.before_request
+    def answer_html_certs():
+        if html_certs["enabled"] and request.path == "/certs":
+            return "<html><body>502 Bad Gateway</body></html>", 200, {"Content-Type": "text/html"}
+
+    server = make_server("localhost", 0, fake_google, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    app = Flask(__name__)
+    records = _Records()
+    app.logger.addHandler(records)
+    app.logger.setLevel(logging.WARNING)
+    try:
+        with app.app_context():
+            base_url = f"http://localhost:{server.server_port}"
+            client = GoogleOAuthClient(CLIENT_SECRETS, base_url=base_url, retries=0)
+            tokens = client.exchange_code(EMAIL, "http://localhost")
+            check(client.user_info(tokens)["email"] == EMAIL and records.messages == [],
+                  "the user of a valid ID token is read from the token")
+
+            # A tampered signature
+            header, payload, signature = tokens["id_token"].split(".")
+            tampered = dict(tokens, id_token=f"{header}.{payload}.{signature[::-1]}")
+            check(client.user_info(tampered)["email"] == EMAIL, "the user of a tampered ID token is read from Google")
+            check(len(records.messages) == 1 and all(part not in records.messages[0] for part in (header, payload, signature[::-1])),
+                  f"the warning does not quote the token ({records.messages})")
+
+            # An error page from the certificates endpoint
+            records.messages.clear()
+            html_certs["enabled"] = True
+            client = GoogleOAuthClient(CLIENT_SECRETS, base_url=base_url, retries=0)
+            tokens = client.exchange_code(EMAIL, "http://localhost")
+            check(client.user_info(tokens)["email"] == EMAIL,
+                  "the user is read from Google when the certificates are an error page")
+            check(len(records.messages) == 1 and "GoogleOAuthError" in records.messages[0],
+                  f"the certificates error is logged as a warning ({records.messages})")
+    finally:
+        server.shutdown()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
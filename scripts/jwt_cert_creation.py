@@ -1,20 +1,50 @@
 """
-This script will generate a new RSA key pair in the PEM format to make sure
-JWT tokens are signed and verified securely. 
+This script will generate a new key pair in the PEM format to make sure
+JWT tokens are signed and verified securely. The keys are RSA keys (RS256)
+by default, P-256 keys (ES256) and Ed25519 keys (EdDSA) are cheaper to sign
+and verify with (see `benchmark_jwt_algorithms.py`).
+
+Usage:
+    python3 scripts/jwt_cert_creation.py [algorithm] [kid]
+
+    With a kid, the keys are written to `jwt_private.<kid>.pem` and
+    `jwt_public.<kid>.pem`, to be added to the key ring next to the current
+    keys (see `config/runtime.py`), then used by setting `JWT_ALGORITHM` and
+    `JWT_SIGNING_KID`.
 
 References:
     - https://stackoverflow.com/a/39126754
     - https://stackoverflow.com/a/22449476
 """
 from cryptography.hazmat.primitives import serialization as crypto_serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
 from cryptography.hazmat.backends import default_backend as crypto_default_backend
 import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.jwt import SUPPORTED_ALGORITHMS
+
+
+def generate_private_key(algorithm="RS256"):
+    """Generate a private key for the given JWT algorithm."""
+    if algorithm == "RS256":
+        return rsa.generate_private_key(
+            backend=crypto_default_backend(),
+            public_exponent=65537,
+            key_size=2048
+        )
+    if algorithm == "ES256":
+        return ec.generate_private_key(ec.SECP256R1(), backend=crypto_default_backend())
+    if algorithm == "EdDSA":
+        return ed25519.Ed25519PrivateKey.generate()
+    raise ValueError(f"The algorithm must be one of {', '.join(SUPPORTED_ALGORITHMS)}, not {algorithm}.")
+
 
 def jwt_create(
         export_path=os.path.join(os.path.dirname(__file__), "..", "config", "secret"),
         private_key_file_name="jwt_private.pem", 
-        public_key_file_name="jwt_public.pem"
+        public_key_file_name="jwt_public.pem",
+        algorithm="RS256"
     ):
     # Check if the directory exists
     if not os.path.exists(export_path):
@@ -28,11 +58,7 @@ def jwt_create(
             print("Exiting...")
             exit(0)
 
-    key = rsa.generate_private_key(
-        backend=crypto_default_backend(),
-        public_exponent=65537,
-        key_size=2048
-    )
+    key = generate_private_key(algorithm)
 
     private_key = key.private_bytes(
         crypto_serialization.Encoding.PEM,
@@ -54,8 +80,20 @@ def jwt_create(
         file.write(public_key)
         os.chmod(os.path.join(export_path, public_key_file_name), 0o644)
     
-    print("The JWT private and public keys have been successfully created.")
+    print(f"The JWT private and public keys ({algorithm}) have been successfully created.")
 
 
 if __name__ == "__main__":
-    jwt_create()
+    algorithm = sys.argv[1] if len(sys.argv) > 1 else "RS256"
+    if algorithm not in SUPPORTED_ALGORITHMS:
+        print(f"The algorithm must be one of {', '.join(SUPPORTED_ALGORITHMS)}.")
+        exit(1)
+    if len(sys.argv) > 2:
+        kid = sys.argv[2]
+        jwt_create(
+            private_key_file_name=f"jwt_private.{kid}.pem",
+            public_key_file_name=f"jwt_public.{kid}.pem",
+            algorithm=algorithm
+        )
+    else:
+        jwt_create(algorithm=algorithm)
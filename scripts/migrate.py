@@ -0,0 +1,32 @@
+"""
+This script will create the database schema if the database is empty, or
+upgrade it to the schema version expected by the backend. It should be run
+once after setting up the configuration and after every update of the code,
+before starting the server.
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.database import database_uri, database_sqlite_profile, database_sqlite_busy_timeout
+from database.connect import init_engine
+from database.migrations import migrate
+
+
+def migrate_database(uri=None):
+    engine, _ = init_engine(
+        uri if uri is not None else database_uri(),
+        echo=False,
+        sqlite_profile=database_sqlite_profile(),
+        sqlite_busy_timeout=database_sqlite_busy_timeout(),
+    )
+    found_version, reached_version = migrate(engine)
+    if found_version is None:
+        print(f"The database schema has been created at version {reached_version}.")
+    elif found_version == reached_version:
+        print(f"The database schema is already at version {reached_version}.")
+    else:
+        print(f"The database schema has been upgraded from version {found_version} to {reached_version}.")
+
+
+if __name__ == "__main__":
+    migrate_database()
@@ -0,0 +1,66 @@
+"""
+This script will check, on a temporary SQLite database, the number of SQL statements
+the request preamble runs: once the membership cache holds the user and the app, a
+request naming a course and an app must resolve them with the one joined query,
+without loading the collections of the app (its courses, its stopwords) which the
+routes read only when they need them.
+
+The script exits with a non-zero status if a step fails.
+
+Usage:
+    python3 scripts/preamble_check.py
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask import Flask
+from sqlalchemy import event
+from database import connect as database
+from database.context import RequestContext
+from database.migrations import migrate
+from scripts.benchmark_listings import PROFESSOR_EMAIL, populate
+from scripts.raiseload_check import check
+from utils.jwt_utils import generate_token
+from utils.request_preamble import requires
+import tempfile
+
+
+STUDENT_EMAIL = "student@example.com"
+
+
+def create_app(statements: list) -> Flask:
+    app = Flask(__name__)
+    database.init_app(app)
+
+    # Only the preamble runs, the statements of the route are not counted
+    @app.route("/courses/<course_id>/apps/<app_id>/entries")
+    @requires(course=True, app=True)
+    def preamble(course_id: int, app_id: int, context: RequestContext):
+        return {"statements": len(statements)}
+
+    return app
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        engine, _ = database.init_engine(f"sqlite:///{os.path.join(directory, 'preamble.sqlite')}")
+        migrate(engine)
+        populate(engine, 1, 1)
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        client = create_app(statements).test_client()
+        for email in (PROFESSOR_EMAIL, STUDENT_EMAIL):
+            headers = {"Authorization": "Bearer " + generate_token({"email": email})}
+            # The first request fills the membership cache
+            client.get("/courses/1/apps/1/entries", headers=headers)
+            statements.clear()
+            response = client.get("/courses/1/apps/1/entries", headers=headers)
+            count = response.get_json()["statements"]
+            check(response.status_code == 200 and count == 1,
+                  f"the warm preamble of {email} runs one statement ({count}: {[statement[:40] for statement in statements]})")
+        engine.dispose()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
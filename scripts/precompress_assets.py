@@ -0,0 +1,91 @@
+"""
+This script will write the precompressed siblings of the static assets of the
+client: `<asset>.gz` with gzip and, when the `brotli` package is installed,
+`<asset>.br` with brotli, both at their highest level since they are compressed
+once. The server sends them instead of the assets to the clients accepting their
+encoding (see `utils/static_assets.py`), so it should be run after each build of
+the client.
+
+Only the text assets (HTML, JavaScript, CSS, JSON, SVG, ...) are compressed, the
+images and fonts already are. The siblings which would not be smaller than their
+asset are removed, and the ones up to date are kept.
+
+Usage:
+    python3 scripts/precompress_assets.py [directory of the assets, defaults to client/]
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.static_assets import PRECOMPRESSED_SUFFIXES
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_EXTENSIONS = frozenset([
+    ".html", ".js", ".mjs", ".css", ".json", ".map", ".svg", ".txt", ".xml", ".ico", ".wasm", ".webmanifest",
+])
+# The assets smaller than this fit in a packet, compressing them saves nothing
+MIN_SIZE = 256
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    # No timestamp, so an unchanged asset gives the same file
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def precompress(path: str) -> tuple:
+    # Write the siblings of an asset, returns its size and the size of each sibling
+    with open(path, "rb") as asset:
+        data = asset.read()
+    sizes = {}
+    for encoding, suffix in PRECOMPRESSED_SUFFIXES:
+        sibling = path + suffix
+        if encoding == "br" and brotli is None:
+            continue
+        if os.path.exists(sibling) and os.path.getmtime(sibling) >= os.path.getmtime(path):
+            sizes[encoding] = os.path.getsize(sibling)
+            continue
+        compressed = compress(data, encoding)
+        if len(compressed) >= len(data):
+            if os.path.exists(sibling):
+                os.remove(sibling)
+            continue
+        with open(sibling, "wb") as file:
+            file.write(compressed)
+        sizes[encoding] = len(compressed)
+    return len(data), sizes
+
+
+def main():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.path.join(root, "client")
+    if brotli is None:
+        print("The brotli package is not installed, only the gzip siblings are written")
+    totals = {"identity": 0}
+    count = 0
+    for folder, _, filenames in os.walk(directory):
+        for filename in sorted(filenames):
+            path = os.path.join(folder, filename)
+            extension = os.path.splitext(filename)[1].lower()
+            if extension not in COMPRESSIBLE_EXTENSIONS or os.path.getsize(path) < MIN_SIZE:
+                continue
+            size, sizes = precompress(path)
+            count += 1
+            totals["identity"] += size
+            for encoding, compressed_size in sizes.items():
+                totals[encoding] = totals.get(encoding, 0) + compressed_size
+            print(os.path.relpath(path, directory), size, " ".join(f"{encoding}={compressed_size}" for encoding, compressed_size in sizes.items()))
+    print(f"{count} assets precompressed in {directory}")
+    for encoding, size in totals.items():
+        print(f"{encoding:>10}: {size / 1024:.0f} KiB")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+This script will check, on a temporary SQLite database, that the listing routes
+work when the engine raises on the unplanned lazy loads (DATABASE_RAISELOAD), as
+the tests run it: the listings selecting columns (list_* helpers of connect.py)
+must not be given the loader options of the entities.
+
+The courses, apps and entries routes are requested with a JWT of the professor,
+an app is edited with its stopwords, then a lazy load which no query planned is checked to still raise. The script
+exits with a non-zero status if a step fails.
+
+Usage:
+    python3 scripts/raiseload_check.py
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask import Flask
+from sqlalchemy.exc import InvalidRequestError
+from database import connect as database
+from database.migrations import migrate
+from routes.courses import courses_routes
+from routes.apps import apps_routes
+from routes.entries import entries_routes
+from scripts.benchmark_listings import PROFESSOR_EMAIL, populate
+from utils.jwt_utils import generate_token
+import tempfile
+import time
+
+
+LISTINGS = (
+    "/courses",
+    "/courses/1",
+    "/courses/1/apps",
+    "/courses/1/apps/1",
+    "/courses/1/apps/1/entries",
+    "/courses/1/apps/1/entries?limit=2",
+    "/courses/1/apps/1/entries/search?q=number",
+)
+
+
+def check(condition: bool, message: str):
+    if not condition:
+        print("FAILED:", message)
+        sys.exit(1)
+    print("OK:", message)
+
+
+def create_app() -> Flask:
+    app = Flask(__name__)
+    database.init_app(app)
+    app.register_blueprint(courses_routes, url_prefix="/courses")
+    app.register_blueprint(apps_routes, url_prefix="/courses/<course_id>/apps")
+    app.register_blueprint(entries_routes, url_prefix="/courses/<course_id>/apps/<app_id>/entries")
+    return app
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        engine, Session = database.init_engine(f"sqlite:///{os.path.join(directory, 'raiseload.sqlite')}", raiseload=True)
+        migrate(engine)
+        populate(engine, 5, 3)
+        client = create_app().test_client()
+        headers = {"Authorization": "Bearer " + generate_token({"email": PROFESSOR_EMAIL})}
+        for url in LISTINGS:
+            response = client.get(url, headers=headers)
+            # Read the streamed responses as well
+            body = response.get_data(as_text=True)
+            check(response.status_code == 200, f"GET {url} with raiseload ({response.status_code} {body[:200]})")
+        # The edit of an app reads and changes its stopwords
+        app_settings = {
+            "name": "App 1", "intro": "Intro", "start_time": time.time(), "end_time": time.time() + 3600,
+            "num_entries": 10, "max_students": 100, "template_link": "template", "stop_words": "the, walk",
+        }
+        response = client.put("/courses/1/apps/1", json=app_settings, headers=headers)
+        check(response.status_code == 200, f"PUT /courses/1/apps/1 with raiseload ({response.status_code})")
+        response = client.get("/courses/1/apps/1", headers=headers)
+        check(response.get_json()["data"]["app"]["stopwords"] == ["the", "a", "an", "walk"],
+              "the stopwords of the app are edited with raiseload")
+        with Session() as session:
+            entry = database.get_app_entries(session=session, app_id=1, user_email=PROFESSOR_EMAIL)[0]
+            try:
+                entry.student
+                raised = False
+            except InvalidRequestError:
+                raised = True
+            check(raised, "an unplanned lazy load still raises")
+        engine.dispose()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
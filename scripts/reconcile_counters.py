@@ -0,0 +1,34 @@
+"""
+This script will rebuild the counters of the apps (students enrolled and entries
+per app, entries per student in each app) from the rows they count, and print how
+many counters had drifted. The counters are kept up to date by the backend, this
+script is meant to be run after fixing data by hand or if a count looks wrong.
+
+Usage:
+    python3 scripts/reconcile_counters.py [database URI]
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config.database import database_uri, database_sqlite_profile, database_sqlite_busy_timeout
+from database.connect import init_engine, reconcile_counters
+from database.migrations import check_schema_version
+
+
+def main(uri=None):
+    engine, Session = init_engine(
+        uri if uri is not None else database_uri(),
+        echo=False,
+        sqlite_profile=database_sqlite_profile(),
+        sqlite_busy_timeout=database_sqlite_busy_timeout(),
+    )
+    check_schema_version(engine)
+    with Session() as session:
+        fixed = reconcile_counters(session)
+    for table_name, count in fixed.items():
+        print(f"{table_name}: {count} counters fixed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1] if len(sys.argv) > 1 else None))
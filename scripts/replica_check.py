@@ -0,0 +1,146 @@
+"""
+This script will check the routing of the read replicas locally, using copies of a
+temporary SQLite database as the stand-in replicas. As the copies are never updated,
+a read served by a replica does not see the writes made after the copy, which shows
+where each read went.
+
+It checks that:
+    - the GET requests of a blueprint given to read_from_replicas() use the replicas in turn,
+    - the other requests and every write use the primary,
+    - a client which wrote keeps reading from the primary (and reads its own writes)
+      for DATABASE_REPLICA_LAG seconds, then goes back to the replicas.
+
+Usage:
+    python3 scripts/replica_check.py
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask import Blueprint, Flask, jsonify
+from sqlalchemy import create_engine, event
+from database import connect as database
+from database import models
+from database.migrations import migrate
+import datetime
+import shutil
+import tempfile
+import time
+
+
+STUDENT_EMAIL = "student@example.com"
+REPLICA_LAG = 1.0
+
+
+def populate(uri: str):
+    engine = create_engine(uri)
+    migrate(engine)
+    now = datetime.datetime.now()
+    with engine.begin() as connection:
+        connection.execute(models.User.__table__.insert(), [
+            {"id": 1, "first_name": "S", "last_name": "S", "email": STUDENT_EMAIL, "role": "student"},
+        ])
+        connection.execute(models.Student.__table__.insert(), [{"id": 1, "email": STUDENT_EMAIL}])
+        connection.execute(models.App.__table__.insert(), [
+            {"id": 1, "name": "App", "intro": "Intro", "start_time": now, "end_time": now,
+             "num_entries": 10, "max_students": 10, "template": "template"},
+        ])
+        connection.execute(models.Course.__table__.insert(), [{"id": 1, "name": "Course", "identifier": "C 1"}])
+        connection.execute(models.course_student_table.insert(), [{"course_id": 1, "student_id": 1}])
+        connection.execute(models.course_app_table.insert(), [{"course_id": 1, "app_id": 1}])
+        connection.execute(models.app_student_table.insert(), [{"app_id": 1, "student_id": 1}])
+    engine.dispose()
+
+
+def create_app() -> Flask:
+    # The routes only read on GET, as the routes of the backend do
+    check_routes = Blueprint("check_routes", __name__)
+
+    @check_routes.route("/entries", methods=["GET"])
+    def list_entries():
+        session = database.get_session()
+        entries = database.list_app_entries(session=session, app_id=1, user_email=STUDENT_EMAIL)
+        return jsonify([entry.content for entry in entries])
+
+    @check_routes.route("/entries", methods=["POST"])
+    def add_entry():
+        session = database.get_session()
+        database.add_entry(
+            session=session,
+            app_id=1,
+            student_email=STUDENT_EMAIL,
+            entry_text="written after the copy",
+            study_start_time=time.time(),
+            study_duration_minutes=1,
+            create_at=datetime.datetime.now(),
+            update_at=datetime.datetime.now(),
+        )
+        return jsonify([])
+
+    database.read_from_replicas(check_routes)
+    app = Flask(__name__)
+    database.init_app(app)
+    app.register_blueprint(check_routes)
+    return app
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        primary = os.path.join(directory, "primary.sqlite")
+        populate(f"sqlite:///{primary}")
+        replicas = []
+        for index in range(2):
+            replica = os.path.join(directory, f"replica{index}.sqlite")
+            shutil.copyfile(primary, replica)
+            replicas.append(f"sqlite:///{replica}")
+        engine, _ = database.init_engine(
+            f"sqlite:///{primary}", replica_uris=replicas, replica_lag=REPLICA_LAG
+        )
+        names = {engine: "primary"}
+        for index, replica_engine in enumerate(database.get_replica_engines()):
+            names[replica_engine] = f"replica{index}"
+        statements = []
+        for routed_engine, name in names.items():
+            event.listen(
+                routed_engine, "before_cursor_execute",
+                lambda *args, name=name: statements.append(name)
+            )
+
+        def request(client, method: str) -> tuple:
+            statements.clear()
+            response = client.open("/entries", method=method)
+            assert response.status_code == 200, response.get_data(as_text=True)
+            return sorted(set(statements)), response.get_json()
+
+        app = create_app()
+        writer = app.test_client()
+        reader = app.test_client()
+
+        used = [request(reader, "GET")[0] for _ in range(4)]
+        assert used == [["replica0"], ["replica1"], ["replica0"], ["replica1"]], used
+        print("GET requests use the replicas in turn:", used)
+
+        used, _ = request(writer, "POST")
+        assert used == ["primary"], used
+        print("POST requests use the primary:", used)
+
+        used, entries = request(writer, "GET")
+        assert used == ["primary"] and entries == ["written after the copy"], (used, entries)
+        print("The writer reads its own write from the primary:", used, entries)
+
+        used, entries = request(reader, "GET")
+        assert used != ["primary"] and entries == [], (used, entries)
+        print("Other clients keep reading the (stale) replicas:", used, entries)
+
+        time.sleep(REPLICA_LAG + 0.1)
+        used, _ = request(writer, "GET")
+        assert used != ["primary"], used
+        print(f"After {REPLICA_LAG}s the writer reads from the replicas again:", used)
+
+        for routed_engine in names:
+            routed_engine.dispose()
+    print("Replica routing OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
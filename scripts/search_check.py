@@ -0,0 +1,84 @@
+"""
+This script will check, on a temporary SQLite database, the full-text search of the
+entries as a web worker runs it: the database is migrated first, then the process
+forgets what the migration learnt about the search index, as a worker which did
+not run `scripts/migrate.py` knows nothing of it.
+
+Entries are then added and edited through the helpers of connect.py, which keep the
+index in sync, and searched, with the index and with the LIKE fallback. The offsets of
+the matches must hold in the snippets as the client receives them, encoded by the
+response wrapper. The script exits with a non-zero status if a step fails.
+
+Usage:
+    python3 scripts/search_check.py
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import connect as database
+from database import search
+from database.migrations import migrate
+from scripts.benchmark_listings import PROFESSOR_EMAIL, populate
+from utils.json_encoder import json_encoder
+from urllib.parse import quote, unquote
+import json
+import tempfile
+import time
+
+
+STUDENT_EMAIL = "student@example.com"
+
+
+def check(condition: bool, message: str):
+    if not condition:
+        print("FAILED:", message)
+        sys.exit(1)
+    print("OK:", message)
+
+
+def check_highlights(session, name: str):
+    results = database.search_app_entries(session, 1, PROFESSOR_EMAIL, "forest")
+    check(len(results) == 1, f"the entry with HTML characters is found ({name})")
+    _, (snippet, highlights) = results[0]
+    # As the client receives it
+    received = json.loads(json_encoder().encode({"snippet": snippet}))["snippet"]
+    check(received == snippet, f"the snippet is not changed by the response ({name})")
+    check("%26" in received and "%3C" in received, f"the snippet is URL quoted like the content ({name})")
+    check([unquote(received[start:end]) for start, end in highlights] == ["forest"],
+          f"the offsets point at the match after the HTML characters ({name})")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'search.sqlite')}")
+        migrate(engine)
+        populate(engine, 1, 1)
+        # As a worker which did not run the migration
+        search._search_index_found.clear()
+        Session = sessionmaker(bind=engine)
+        with Session() as session:
+            # The routes store the content URL quoted
+            entry = database.add_entry(session, 1, STUDENT_EMAIL, quote("A walk on the beach"), time.time(), 10)
+            check(entry is not None, "an entry is added without the index known")
+            entry = database.edit_entry(session, entry.id, STUDENT_EMAIL, quote("A walk in the forest"), time.time(), 10)
+            check(entry is not None, "an entry is edited without the index known")
+            entry_id = entry.id
+            check(search.has_search_index(session), "the search index is found")
+        with Session() as session:
+            results = database.search_app_entries(session, 1, PROFESSOR_EMAIL, "forest")
+            check(len(results) == 1, "the edited entry is found")
+            check(database.search_app_entries(session, 1, PROFESSOR_EMAIL, "beach") == [], "the old content is not found")
+        with Session() as session:
+            database.edit_entry(session, entry_id, STUDENT_EMAIL, quote("Tom & Jerry <3 > a walk in the forest"), time.time(), 10)
+        with Session() as session:
+            check_highlights(session, "index")
+            search._search_index_found[str(engine.url)] = False
+            check_highlights(session, "LIKE fallback")
+        engine.dispose()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
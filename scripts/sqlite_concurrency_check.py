@@ -0,0 +1,112 @@
+"""
+This script will check, on a temporary SQLite database, that a long read (such as
+the analytics reading every entry of an app) does not block the submission of
+entries when the connections use the profile of `database/sqlite_profile.py`.
+
+The same scenario is run with the driver defaults (rollback journal) and with the
+profile (WAL): a reader slowly goes through every entry while a writer adds entries,
+each in its own transaction, as the entries route does. The latency of the writes is
+printed for both, and the script exits with a non-zero status if a write with the
+profile waited on the reader or failed with "database is locked".
+
+Usage:
+    python3 scripts/sqlite_concurrency_check.py [seconds the read lasts]
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sqlalchemy import create_engine, exc
+from database import models
+from database.migrations import migrate
+from database.sqlite_profile import apply_sqlite_profile, sqlite_connect_args
+import datetime
+import tempfile
+import threading
+import time
+
+
+BUSY_TIMEOUT = 5000
+NUM_ENTRIES = 5000
+NUM_WRITES = 20
+# A write with the profile must not wait for the reader, only for the disk
+MAX_WRITE_LATENCY = 0.5
+
+
+def entry_row(index: int) -> dict:
+    now = datetime.datetime.now()
+    return {
+        "student_id": 1, "app_id": 1, "content": f"Entry number {index}", "study_start_time": now,
+        "study_duration_minutes": 10, "create_at": now, "update_at": now,
+    }
+
+
+def create_database(path: str):
+    engine = create_engine(f"sqlite:///{path}")
+    migrate(engine)
+    with engine.begin() as connection:
+        connection.execute(models.Entry.__table__.insert(), [entry_row(i) for i in range(NUM_ENTRIES)])
+    engine.dispose()
+
+
+def slow_read(engine, duration: float, started: threading.Event):
+    # Go through every entry in one statement, which keeps the read open
+    with engine.connect() as connection:
+        result = connection.exec_driver_sql("SELECT id, content FROM entries")
+        pause = duration / (NUM_ENTRIES / 100)
+        for index, _ in enumerate(result):
+            if index == 0:
+                started.set()
+            if index % 100 == 0:
+                time.sleep(pause)
+
+
+def run(engine, read_duration: float) -> tuple:
+    started = threading.Event()
+    reader = threading.Thread(target=slow_read, args=(engine, read_duration, started))
+    reader.start()
+    started.wait()
+    latencies, errors = [], []
+    for index in range(NUM_WRITES):
+        started_at = time.perf_counter()
+        try:
+            with engine.begin() as connection:
+                connection.execute(models.Entry.__table__.insert(), [entry_row(NUM_ENTRIES + index)])
+        except exc.OperationalError as e:
+            errors.append(str(e.orig))
+        latencies.append(time.perf_counter() - started_at)
+    reader_running = reader.is_alive()
+    reader.join()
+    return latencies, errors, reader_running
+
+
+def main(read_duration=2.0):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, with_profile in (("driver defaults", False), ("sqlite profile", True)):
+            path = os.path.join(directory, f"{'profile' if with_profile else 'default'}.sqlite")
+            create_database(path)
+            engine = create_engine(f"sqlite:///{path}", connect_args=sqlite_connect_args(BUSY_TIMEOUT))
+            if with_profile:
+                apply_sqlite_profile(engine, busy_timeout=BUSY_TIMEOUT)
+            with engine.connect() as connection:
+                journal_mode = connection.exec_driver_sql("PRAGMA journal_mode").scalar()
+            latencies, errors, reader_running = run(engine, read_duration)
+            engine.dispose()
+            results[name] = (latencies, errors)
+            print(f"{name} (journal_mode={journal_mode}):")
+            print(f"   {NUM_WRITES} writes during a {read_duration}s read, " +
+                  f"max latency {max(latencies) * 1000:.1f} ms, " +
+                  f"median {sorted(latencies)[len(latencies) // 2] * 1000:.1f} ms, " +
+                  f"{len(errors)} errors, reader still running after the writes: {reader_running}")
+            for error in sorted(set(errors)):
+                print(f"   error: {error}")
+    latencies, errors = results["sqlite profile"]
+    if errors or max(latencies) > MAX_WRITE_LATENCY:
+        print("Writes were blocked by the reader with the SQLite profile.")
+        return 1
+    print("Readers do not block the submission of entries with the SQLite profile.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(float(arg) for arg in sys.argv[1:2])))
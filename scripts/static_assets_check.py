@@ -0,0 +1,70 @@
+"""
+This script will check, on a temporary folder of assets, the cache headers of the
+static assets of the client: only the names holding a hexadecimal hash of the
+content are cached for a year, the names only carrying a version or a size are
+revalidated on each use like `index.html`.
+
+The script exits with a non-zero status if a step fails.
+
+Usage:
+    python3 scripts/static_assets_check.py
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask import Flask
+from utils.static_assets import (
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATED_CACHE_CONTROL,
+    init_static_assets,
+    is_fingerprinted,
+)
+import tempfile
+
+
+FINGERPRINTED = (
+    "assets/index-4f3a9c2b.js",
+    "assets/index.4f3a9c2b.css",
+    "assets/vendor-0123456789abcdef.js",
+)
+NOT_FINGERPRINTED = (
+    "index.html",
+    "assets/roboto-v30-latin-regular.js",
+    "apple-touch-icon-180x180.png",
+    "assets/index-BkzQ2x_L.js",
+    "assets/polyfills-legacy.js",
+)
+
+
+def check(condition: bool, message: str):
+    if not condition:
+        print("FAILED:", message)
+        sys.exit(1)
+    print("OK:", message)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        for filename in FINGERPRINTED + NOT_FINGERPRINTED:
+            path = os.path.join(directory, filename)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as asset:
+                asset.write(filename)
+        app = Flask(__name__, static_folder=directory, static_url_path="")
+        init_static_assets(app)
+        client = app.test_client()
+        for filenames, fingerprinted, cache_control in (
+            (FINGERPRINTED, True, IMMUTABLE_CACHE_CONTROL),
+            (NOT_FINGERPRINTED, False, REVALIDATED_CACHE_CONTROL),
+        ):
+            for filename in filenames:
+                check(is_fingerprinted(filename) == fingerprinted, f"{filename} is{'' if fingerprinted else ' not'} fingerprinted")
+                response = client.get(f"/{filename}")
+                check(response.status_code == 200 and response.headers["Cache-Control"] == cache_control,
+                      f"{filename} is served with {cache_control}")
+                response.close()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+This script will check, on a temporary SQLite database, the time range filter of
+the listing of the entries: the start_time and end_time which are not timestamps a
+datetime can hold (nan, infinities, values out of its range) must be answered with
+the 400 of the malformed ones instead of failing in the database helpers.
+
+The script exits with a non-zero status if a step fails.
+
+Usage:
+    python3 scripts/time_range_check.py
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import connect as database
+from database.migrations import migrate
+from scripts.benchmark_listings import PROFESSOR_EMAIL, populate
+from scripts.raiseload_check import check, create_app
+from utils.jwt_utils import generate_token
+import tempfile
+import time
+
+
+INVALID_TIMES = ("abc", "nan", "inf", "-inf", "1e20", "-1e20")
+INVALID_TIME_MESSAGE = "Invalid time range, start_time and end_time must be timestamps"
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        engine, _ = database.init_engine(f"sqlite:///{os.path.join(directory, 'time_range.sqlite')}")
+        migrate(engine)
+        populate(engine, 5, 1)
+        client = create_app().test_client()
+        headers = {"Authorization": "Bearer " + generate_token({"email": PROFESSOR_EMAIL})}
+        for name in ("start_time", "end_time"):
+            for value in INVALID_TIMES:
+                for limit in ("", "&limit=2"):
+                    url = f"/courses/1/apps/1/entries?{name}={value}{limit}"
+                    response = client.get(url, headers=headers)
+                    body = response.get_json(silent=True) or {}
+                    check(response.status_code == 400 and body.get("message") == INVALID_TIME_MESSAGE,
+                          f"GET {url} is rejected ({response.status_code})")
+        url = f"/courses/1/apps/1/entries?start_time=0&end_time={time.time() + 3600}"
+        response = client.get(url, headers=headers)
+        check(response.status_code == 200 and len(response.get_json()["data"]["entries"]) == 5,
+              f"GET {url} lists the entries ({response.status_code})")
+        engine.dispose()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
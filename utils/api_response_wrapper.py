@@ -1,9 +1,15 @@
 """
 This file contains helper methods to wrap the API response in a standard format for the client.
 
+The responses are encoded by the encoder of `utils/json_encoder.py`, which escapes
+their strings for HTML. The large collections can be streamed to the client as
+they are read, with streaming_success_response().
+
 
 Functions:
     success_response(): This method will wrap the successful API response in a standard format for the client.
+    streaming_success_response(): This method will wrap the successful API response in a standard format for the client,
+        streaming its collections.
     client_error_response(): This method will wrap the client error API response in a standard format for the client.
     server_error_response(): This method will wrap the server error API response in a standard format for the client.
 
@@ -12,9 +18,12 @@ Author:
     Jiacheng Zhao (John)
 """
 
-from flask import Response
-import html
-import json
+from collections.abc import Iterator
+from flask import Response, stream_with_context
+from utils.json_encoder import json_encoder
+
+# The streamed responses are written to the client by chunks of about this size
+STREAM_CHUNK_SIZE = 64 * 1024
 
 
 def success_response(
@@ -42,21 +51,67 @@ def success_response(
     if internal_code != 0:
         raise ValueError("The internal code of a successful response must be 0.")
     return Response(
-        response=html.escape(
-            json.dumps(
-                {
-                    "code": internal_code,
-                    "message": message,
-                    "data": data,
-                }
-            ),
-            quote=False,
+        response=json_encoder().encode(
+            {
+                "code": internal_code,
+                "message": message,
+                "data": data,
+            }
         ),
         status=status_code,
         mimetype="application/json",
     )
 
 
+def streaming_success_response(data: dict, message: str = "", chunk_size: int = STREAM_CHUNK_SIZE) -> Response:
+    """This method will wrap the successful API response in a standard format for the client,
+    like success_response(), but the values of the data which are iterators (such as
+    generators) are written as JSON arrays while they are iterated, one item at a time.
+
+    Only the item being encoded and a chunk of the body are held in memory, so the
+    iterators should read their items from a server-side cursor, such as the one of
+    `database.stream_app_entries()`. They are iterated after the route returned, with
+    the context of the request (and its database session) kept until the end.
+
+    Args:
+        data (dict): The data to be sent to the client, its values are encoded in order.
+        message (str): The message of the response.
+        chunk_size (int): The number of bytes written to the client at once.
+
+    Returns:
+        Response: The streamed API response, ready to be sent to the client.
+    """
+    encode = json_encoder().encode
+
+    def body():
+        chunk = bytearray(encode({"code": 0, "message": message})[:-1])
+        chunk += b',"data":{'
+        for index, (key, value) in enumerate(data.items()):
+            if index > 0:
+                chunk += b","
+            chunk += encode(key) + b":"
+            if not isinstance(value, Iterator):
+                chunk += encode(value)
+                continue
+            chunk += b"["
+            for item_index, item in enumerate(value):
+                if item_index > 0:
+                    chunk += b","
+                chunk += encode(item)
+                if len(chunk) >= chunk_size:
+                    yield bytes(chunk)
+                    chunk.clear()
+            chunk += b"]"
+        chunk += b"}}"
+        yield bytes(chunk)
+
+    return Response(
+        response=stream_with_context(body()),
+        status=200,
+        mimetype="application/json",
+    )
+
+
 def client_error_response(
     data: dict, internal_code: int, status_code: int = 400, message: str = ""
 ) -> Response:
@@ -88,15 +143,12 @@ def client_error_response(
             "The internal code of a client error response must be a negative integer."
         )
     return Response(
-        response=html.escape(
-            json.dumps(
-                {
-                    "code": internal_code,
-                    "message": message,
-                    "data": data,
-                }
-            ),
-            quote=False,
+        response=json_encoder().encode(
+            {
+                "code": internal_code,
+                "message": message,
+                "data": data,
+            }
         ),
         status=status_code,
         mimetype="application/json",
@@ -134,15 +186,12 @@ def server_error_response(
             "The internal code of a server error response must be a negative integer."
         )
     return Response(
-        response=html.escape(
-            json.dumps(
-                {
-                    "code": internal_code,
-                    "message": message,
-                    "data": data,
-                }
-            ),
-            quote=False,
+        response=json_encoder().encode(
+            {
+                "code": internal_code,
+                "message": message,
+                "data": data,
+            }
         ),
         status=status_code,
         mimetype="application/json",
@@ -0,0 +1,147 @@
+"""
+This file contains the compression of the API responses, negotiated with the
+`Accept-Encoding` header of the client: brotli when the `brotli` package is
+installed and the client accepts it, gzip otherwise.
+
+Only the JSON responses are compressed, from a minimum size as compressing a
+small body costs more than it saves. The streamed responses, whose size is not
+known, are compressed as they are sent. The static assets are not compressed by
+the workers, they are served from the files precompressed by
+`scripts/precompress_assets.py` (see `utils/static_assets.py`).
+
+A compressed response keeps its ETag as a weak one, since its bytes depend on the
+encoding, so a request sending it back in If-None-Match is still answered with
+a 304.
+
+
+Functions:
+    accepted_encoding(): This method will negotiate the encoding of a response with the client.
+    compressor(): This method will return a compressor for an encoding.
+    init_compression(): This method will compress the API responses of a Flask app.
+"""
+from flask import Flask, request
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# The encodings the server can compress with, the preferred one first
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+COMPRESSIBLE_MIMETYPES = frozenset(["application/json"])
+
+
+def accepted_encoding(encodings: tuple = ENCODINGS) -> str:
+    """This method will negotiate the encoding of the response of the current
+    request with the client.
+
+    Args:
+        encodings (tuple): The encodings available, the preferred one first.
+
+    Returns:
+        str: The encoding with the highest quality for the client, None if it
+            accepts none of them.
+    """
+    if len(encodings) == 0:
+        return None
+    return request.accept_encodings.best_match(encodings)
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        # The gzip container, rather than the raw deflate stream
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self, level: int):
+        # Brotli goes up to 11, its qualities 4 to 6 compress like gzip 6 to 9 but faster
+        self._compressor = brotli.Compressor(quality=min(max(level - 1, 0), 11))
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def compressor(encoding: str, level: int = 6):
+    """This method will return a compressor for an encoding.
+
+    Args:
+        encoding (str): The encoding, `gzip` or `br`.
+        level (int): The level of compression, from 1 (fastest) to 9 (smallest).
+
+    Returns:
+        object: The compressor, its `compress(data)` method returns the
+            compressed bytes available so far and its `finish()` method the
+            remaining ones.
+    """
+    if encoding == "br":
+        return _BrotliCompressor(level)
+    return _GzipCompressor(level)
+
+
+def _compress_stream(chunks, encoding: str, level: int):
+    stream_compressor = compressor(encoding, level)
+    try:
+        for chunk in chunks:
+            compressed = stream_compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield stream_compressor.finish()
+    finally:
+        # Release the request context kept by the stream if the client left
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def init_compression(app: Flask, min_size: int = 1024, level: int = 6):
+    """This method will compress the JSON responses of a Flask app when the
+    client accepts it.
+
+    Args:
+        app (Flask): The Flask app.
+        min_size (int): The number of bytes from which the responses are compressed.
+        level (int): The level of compression, from 1 (fastest) to 9 (smallest),
+            zero disables the compression.
+    """
+    if level <= 0:
+        return
+
+    @app.after_request
+    def compress_response(response):
+        if (
+            response.status_code < 200
+            or response.status_code in (204, 304)
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = accepted_encoding()
+        if encoding is None:
+            return response
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, encoding, level)
+            response.headers.pop("Content-Length", None)
+        else:
+            body = response.get_data()
+            if len(body) < min_size:
+                return response
+            body_compressor = compressor(encoding, level)
+            response.set_data(body_compressor.compress(body) + body_compressor.finish())
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag is not None and not weak:
+            response.set_etag(etag, weak=True)
+        return response
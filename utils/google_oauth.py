@@ -0,0 +1,270 @@
+"""
+This file contains the client of the Google OAuth2 endpoints used by the login.
+
+The client keeps a pool of keep-alive connections to Google for each worker
+process, bounds every request with a timeout and retries the failed ones with an
+exponential backoff. The code of the login is only exchanged once: the token
+request is retried after a connection error, never after Google answered.
+
+When Google returns an ID token with the access token, its signature and claims
+are verified locally against the certificates of Google, cached as long as Google
+allows, which saves the round trip of the user info request.
+
+
+Classes:
+    GoogleOAuthError: The error raised when the login with Google fails.
+    GoogleOAuthClient: The client of the Google OAuth2 endpoints.
+
+
+Functions:
+    google_oauth_client(): This method will return the client of this worker process.
+"""
+from flask import current_app
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import jwt
+import os
+import re
+import requests
+import threading
+import time
+from config.third_party_secrets import (
+    google_client_secrets,
+    google_oauth_base_url,
+    google_oauth_retries,
+    google_oauth_timeout,
+    google_oauth_verify_id_token,
+)
+
+
+GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
+GOOGLE_USERINFO_URL = "https://www.googleapis.com/oauth2/v1/userinfo"
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+# The certificates are kept this long when Google does not tell
+DEFAULT_CERTS_MAX_AGE = 3600
+# A token signed by an unknown key refreshes the certificates at most this often
+CERTS_MIN_REFRESH_INTERVAL = 60
+
+
+class GoogleOAuthError(Exception):
+    """The error raised when the login with Google fails.
+
+    Args:
+        message (str): The message for the client.
+        status_code (int): The status code of the response, a 5XX one.
+        data (dict): The data for the client, such as the error returned by Google.
+    """
+
+    def __init__(self, message: str, status_code: int = 500, data: dict = None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.data = data if data is not None else {}
+
+
+def _json_or_empty(response) -> dict:
+    try:
+        return response.json()
+    except ValueError:
+        return {}
+
+
+class GoogleOAuthClient:
+    """The client of the Google OAuth2 endpoints.
+
+    Args:
+        client_secrets (dict): The client secrets provided by Google.
+        base_url (str): The URL of a server standing in for Google, defaults to None.
+        timeout (float): The number of seconds a request may take to connect, then to respond.
+        retries (int): The number of times a failed request is retried.
+        verify_id_token (bool): If the ID token is verified locally when there is one.
+        pool_size (int): The number of keep-alive connections kept to each host.
+    """
+
+    def __init__(self, client_secrets: dict, base_url: str = None, timeout: float = 5, retries: int = 2,
+                 verify_id_token: bool = True, pool_size: int = 10):
+        self.client_id = client_secrets["web"]["client_id"]
+        self.client_secret = client_secrets["web"]["client_secret"]
+        self.redirect_uris = client_secrets["web"]["redirect_uris"]
+        if base_url is None:
+            self.token_url, self.userinfo_url, self.certs_url = GOOGLE_TOKEN_URL, GOOGLE_USERINFO_URL, GOOGLE_CERTS_URL
+            self.issuers = GOOGLE_ISSUERS
+        else:
+            self.token_url, self.userinfo_url, self.certs_url = (
+                f"{base_url}/token", f"{base_url}/userinfo", f"{base_url}/certs"
+            )
+            self.issuers = (base_url,)
+        self.timeout = (timeout, timeout)
+        self.verify_id_token = verify_id_token
+        # Connection errors are retried for every request, the error responses
+        # only for the GET requests, as the code of the login is single use
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.2,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._certs = None
+        self._certs_fetched_at = 0
+        self._certs_expire_at = 0
+        self._certs_lock = threading.Lock()
+
+    def _request(self, method: str, url: str, **kwargs):
+        try:
+            return self.session.request(method, url, timeout=self.timeout, **kwargs)
+        except requests.Timeout:
+            raise GoogleOAuthError("Google did not respond in time", status_code=504)
+        except requests.RequestException:
+            raise GoogleOAuthError("Failed to reach Google", status_code=502)
+
+    def exchange_code(self, code: str, redirect_uri: str) -> dict:
+        """This method will exchange the code of the login for the tokens of the user.
+
+        Args:
+            code (str): The code returned by Google to the client.
+            redirect_uri (str): The redirect URI the code was returned to.
+
+        Returns:
+            dict: The response of Google, with the access token and, if the
+                `openid` scope was asked, the ID token.
+
+        Raises:
+            GoogleOAuthError: If Google refused the code or could not be reached.
+        """
+        response = self._request("POST", self.token_url, data={
+            "code": code,
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "redirect_uri": redirect_uri,
+            "grant_type": "authorization_code",
+        })
+        tokens = _json_or_empty(response)
+        if response.status_code != 200 or "access_token" not in tokens:
+            raise GoogleOAuthError("Failed to obtain access token", data=tokens)
+        return tokens
+
+    def user_info(self, tokens: dict) -> dict:
+        """This method will return the id and the email of the user of the tokens,
+        from the ID token when it can be verified, from Google otherwise.
+
+        Args:
+            tokens (dict): The tokens returned by exchange_code().
+
+        Returns:
+            dict: The `id` and the `email` of the user.
+
+        Raises:
+            GoogleOAuthError: If Google did not return the user info.
+        """
+        if self.verify_id_token and "id_token" in tokens:
+            try:
+                claims = self.verify(tokens["id_token"])
+                if claims.get("email_verified") and "email" in claims:
+                    return {"id": claims["sub"], "email": claims["email"]}
+            except (jwt.PyJWTError, GoogleOAuthError) as e:
+                # The access token is still valid for the user info, only the kind of
+                # the error is logged as its message may quote the token
+                current_app.logger.warning(
+                    "Failed to verify the Google ID token locally (%s), reading the user info from Google",
+                    type(e).__name__,
+                )
+        response = self._request(
+            "GET", self.userinfo_url, headers={"Authorization": f"Bearer {tokens['access_token']}"}
+        )
+        user_info = _json_or_empty(response)
+        if response.status_code != 200 or "email" not in user_info:
+            raise GoogleOAuthError("Failed to obtain the user info", data=user_info)
+        return {"id": user_info.get("id"), "email": user_info["email"]}
+
+    def _certificates(self, refresh: bool = False) -> jwt.PyJWKSet:
+        with self._certs_lock:
+            now = time.time()
+            expired = self._certs is None or now >= self._certs_expire_at
+            if refresh and now - self._certs_fetched_at >= CERTS_MIN_REFRESH_INTERVAL:
+                expired = True
+            if expired:
+                response = self._request("GET", self.certs_url)
+                if response.status_code != 200:
+                    raise GoogleOAuthError("Failed to obtain the certificates of Google", status_code=502)
+                try:
+                    certs = response.json()
+                except ValueError:
+                    certs = None
+                if not isinstance(certs, dict):
+                    # Such as an error page answered by a proxy
+                    raise GoogleOAuthError("Failed to obtain the certificates of Google", status_code=502)
+                max_age = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+                self._certs = jwt.PyJWKSet.from_dict(certs)
+                self._certs_fetched_at = now
+                self._certs_expire_at = now + (int(max_age.group(1)) if max_age else DEFAULT_CERTS_MAX_AGE)
+            return self._certs
+
+    def verify(self, id_token: str) -> dict:
+        """This method will verify the signature and the claims (issuer, audience,
+        expiration) of an ID token of Google and return its claims.
+
+        Args:
+            id_token (str): The ID token.
+
+        Returns:
+            dict: The claims of the ID token.
+
+        Raises:
+            jwt.PyJWTError: If the ID token is not valid.
+            GoogleOAuthError: If the certificates of Google could not be obtained.
+        """
+        kid = jwt.get_unverified_header(id_token).get("kid")
+        certs = self._certificates()
+        if kid not in [key.key_id for key in certs.keys]:
+            # Google rotated its keys since they were cached
+            certs = self._certificates(refresh=True)
+        try:
+            key = certs[kid]
+        except KeyError:
+            raise jwt.InvalidTokenError("Unknown key id")
+        claims = jwt.decode(id_token, key.key, algorithms=["RS256"], audience=self.client_id)
+        if claims.get("iss") not in self.issuers:
+            raise jwt.InvalidIssuerError("Invalid issuer")
+        return claims
+
+
+# The client of this worker process, created on first use
+_client = None
+
+
+def google_oauth_client() -> GoogleOAuthClient:
+    """This method will return the client of the Google OAuth2 endpoints of this
+    worker process, created on first use with the settings of the environment.
+
+    Returns:
+        GoogleOAuthClient: The client.
+
+    Raises:
+        FileNotFoundError: If the client secrets of Google are not found.
+    """
+    global _client
+    if _client is None:
+        _client = GoogleOAuthClient(
+            google_client_secrets(),
+            base_url=google_oauth_base_url(),
+            timeout=google_oauth_timeout(),
+            retries=google_oauth_retries(),
+            verify_id_token=google_oauth_verify_id_token(),
+        )
+    return _client
+
+
+def _reset_client_after_fork():
+    # The pooled connections of the parent process must not be shared with the child
+    global _client
+    _client = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_client_after_fork)
@@ -0,0 +1,146 @@
+"""
+This file contains the JSON encoders of the API responses.
+
+The responses are escaped for HTML (`&`, `<` and `>`), as the client may render
+the content of the entries. In JSON, these characters can only be found inside
+the strings, so the encoders escape the bytes of the body once, right after the
+encoding, which escapes the string values (and keys) only. The body is returned
+as is when there is nothing to escape, and only its bytes from the first character
+to escape are rewritten otherwise.
+
+The encoder of `orjson` is used when the library is installed, it encodes to
+bytes directly and is several times faster than the standard library on large
+payloads. Both encoders serialize the datetimes (and dates and times) natively,
+in the ISO 8601 format.
+
+
+Classes:
+    JSONEncoder: The encoder of the standard library, the base of the encoders.
+    OrjsonEncoder: The encoder of the `orjson` library.
+
+
+Functions:
+    escape_html(): This method will escape the HTML characters of an encoded body.
+    default_json_encoder(): This method will return the fastest encoder installed.
+    json_encoder(): This method will return the encoder of the responses.
+    set_json_encoder(): This method will replace the encoder of the responses.
+"""
+import datetime
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# The HTML characters and their escapes, `&` first so the escapes are not escaped again
+_HTML_ESCAPES = ((b"&", b"&amp;"), (b"<", b"&lt;"), (b">", b"&gt;"))
+
+
+def escape_html(body: bytes) -> bytes:
+    """This method will escape the HTML characters (`&`, `<` and `>`) of an
+    encoded JSON body, as `html.escape(body, quote=False)` does.
+
+    Args:
+        body (bytes): The encoded JSON body.
+
+    Returns:
+        bytes: The escaped body, the same object if there is nothing to escape.
+    """
+    # The bytes are searched with find() rather than a regular expression, which
+    # is many times slower on large bodies, and the bytes before the first
+    # character to escape are not rewritten by the replacements
+    positions = [position for position in (body.find(character) for character, _ in _HTML_ESCAPES) if position >= 0]
+    if len(positions) == 0:
+        return body
+    start = min(positions)
+    escaped = body[start:] if start > 0 else body
+    for character, escape in _HTML_ESCAPES:
+        if character in escaped:
+            escaped = escaped.replace(character, escape)
+    return body[:start] + escaped if start > 0 else escaped
+
+
+def _default(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class JSONEncoder:
+    """The encoder of the standard library, the base of the encoders. Its
+    output is the same as `json.dumps()`.
+    """
+
+    name = "json"
+
+    def encode(self, payload) -> bytes:
+        """This method will encode the payload to JSON, escaped for HTML.
+
+        Args:
+            payload: The payload to encode, made of dicts, lists, strings,
+                numbers, booleans, None and datetimes.
+
+        Raises:
+            TypeError: If the payload holds a value which cannot be encoded.
+
+        Returns:
+            bytes: The encoded payload, in UTF-8.
+        """
+        return escape_html(json.dumps(payload, default=_default).encode())
+
+
+class OrjsonEncoder(JSONEncoder):
+    """The encoder of the `orjson` library. Its output is compact and in UTF-8
+    rather than ASCII, which the clients decode the same.
+
+    Raises:
+        ImportError: If `orjson` is not installed.
+    """
+
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("The orjson library is not installed.")
+
+    def encode(self, payload) -> bytes:
+        # The keys which are not strings are converted as json.dumps() does
+        return escape_html(orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS))
+
+
+def default_json_encoder() -> JSONEncoder:
+    """This method will return the fastest encoder installed.
+
+    Returns:
+        JSONEncoder: The encoder of `orjson` if it is installed, the one of
+            the standard library otherwise.
+    """
+    if orjson is not None:
+        return OrjsonEncoder()
+    return JSONEncoder()
+
+
+# The encoder of the responses
+_encoder = default_json_encoder()
+
+
+def json_encoder() -> JSONEncoder:
+    """This method will return the encoder of the responses.
+
+    Returns:
+        JSONEncoder: The encoder.
+    """
+    return _encoder
+
+
+def set_json_encoder(encoder: JSONEncoder):
+    """This method will replace the encoder of the responses.
+
+    Args:
+        encoder (JSONEncoder): The encoder, any object with an `encode(payload)`
+            method returning the escaped body in bytes.
+    """
+    global _encoder
+    _encoder = encoder
@@ -4,16 +4,54 @@ This file contains the utility functions for JWT token generation and validation
 Functions:
     generate_token(): This method will generate a JWT token from the payload.
     validate_token(): This method will validate the JWT token and return the payload.
+    validate_token_in_request(): This method will validate the JWT token of a flask request.
+    token_cache_stats(): This method will return the metrics of the cache of the verified tokens.
 
 Author:
     Jiacheng Zhao (John)
 """
 import jwt
-from config.jwt import jwt_algorithm, jwt_private_key, jwt_public_key
+import os
+from config.runtime import runtime_config
+from utils.token_cache import VerifiedTokenCache, token_digest
+
+
+# The tokens verified by this worker process, created on first use
+_token_cache = None
+
+
+def _verified_token_cache() -> VerifiedTokenCache:
+    global _token_cache
+    if _token_cache is None:
+        config = runtime_config()
+        _token_cache = VerifiedTokenCache(max_size=config.jwt_cache_size, max_age=config.jwt_cache_max_age)
+    return _token_cache
+
+
+def _reset_token_cache_after_fork():
+    # Each worker process keeps its own cache, and its lock may have been held
+    # by another thread of the parent when it forked
+    global _token_cache
+    _token_cache = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_token_cache_after_fork)
+
+
+def token_cache_stats() -> dict:
+    """This method will return the metrics of the cache of the verified tokens
+    of this worker process.
+
+    Returns:
+        dict: The hits, misses, evictions, hit rate and size of the cache.
+    """
+    return _verified_token_cache().stats()
 
 
 def generate_token(payload: dict) -> str:
-    """This method will generate a JWT token from the payload.
+    """This method will generate a JWT token from the payload, signed by the
+    signing key of the key ring, whose kid is put in the header of the token.
 
     Args:
         payload (dict): The payload to be included in the token.
@@ -21,28 +59,55 @@ def generate_token(payload: dict) -> str:
     Returns:
         str: The generated JWT token.
     """
-    return jwt.encode(payload, jwt_private_key(), algorithm=jwt_algorithm())
+    key_ring = runtime_config().key_ring
+    return jwt.encode(
+        payload, key_ring.signing_key, algorithm=key_ring.signing_algorithm, headers={"kid": key_ring.signing_kid}
+    )
 
 
-def validate_token(token: str) -> dict:
-    """This method will validate the JWT token and return the payload.
+def validate_token(token: str, use_cache: bool = True) -> dict:
+    """This method will validate the JWT token and return the payload. The token
+    is verified with the key of the key ring matching the kid in its header, unless
+    it was already verified with the same key ring and has not expired since.
 
     Args:
         token (str): The JWT token to be validated.
+        use_cache (bool): If the cache of the verified tokens can be used, defaults to True.
 
     Returns:
-        dict: The payload of the token with code and message indicating if the token is valid.
+        dict: The payload of the token with code and message indicating if the token is valid,
+            and `cached` telling if the token was found in the cache.
             0: Valid token.
             -104: Token Expired.
             -105: Invalid Token.
             -1: Error that is not handled correctly.
     """
     try:
-        payload = jwt.decode(token, jwt_public_key(), algorithms=[jwt_algorithm()])
+        key_ring = runtime_config().key_ring
+        if use_cache:
+            digest = token_digest(token)
+            payload = _verified_token_cache().get(digest, key_ring)
+            if payload is not None:
+                return {
+                    "code": 0,
+                    "message": "",
+                    "data": dict(payload),
+                    "cached": True,
+                }
+        kid = jwt.get_unverified_header(token).get("kid")
+        public_key = key_ring.public_key(kid)
+        if public_key is None:
+            # Unknown or retired key
+            raise jwt.InvalidTokenError("Unknown key id")
+        # Only the algorithm of the key is accepted, whatever the header says
+        payload = jwt.decode(token, public_key, algorithms=[key_ring.key_algorithm(kid)])
+        if use_cache:
+            _verified_token_cache().put(digest, dict(payload), key_ring)
         return {
             "code": 0,
             "message": "",
             "data": payload,
+            "cached": False,
         }
     except jwt.ExpiredSignatureError:
         return {
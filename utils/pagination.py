@@ -0,0 +1,74 @@
+"""
+This file contains the helper methods for the keyset (cursor) pagination of listings.
+
+A cursor marks the last row of a page by the values of the ordering key, so the next
+page is read with a range condition on the index instead of an OFFSET, and deep pages
+cost the same as the first one. Cursors are opaque to the client.
+
+Functions:
+    encode_cursor(): This method will encode the ordering key of the last row of a page.
+    decode_cursor(): This method will decode a cursor given by the client.
+    page_size(): This method will read and check the page size given by the client.
+"""
+from datetime import datetime
+import base64
+import json
+
+
+# Page size used when the client asks for pagination without a limit
+DEFAULT_PAGE_SIZE = 100
+# Largest page size a client can ask for
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(create_at: datetime, row_id: int) -> str:
+    """This method will encode the ordering key of the last row of a page.
+
+    Args:
+        create_at (datetime): The creation time of the row.
+        row_id (int): The id of the row, used to break ties on the creation time.
+
+    Returns:
+        str: The URL safe cursor.
+    """
+    raw = json.dumps([create_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """This method will decode a cursor given by the client.
+
+    Args:
+        cursor (str): The cursor returned with the previous page.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+
+    Returns:
+        tuple: The creation time (datetime) and the id (int) of the last row of the previous page.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        create_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(create_at), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def page_size(limit: str) -> int:
+    """This method will read and check the page size given by the client.
+
+    Args:
+        limit (str): The limit query parameter, or None to use the default page size.
+
+    Raises:
+        ValueError: If the limit is not a number between 1 and MAX_PAGE_SIZE.
+
+    Returns:
+        int: The page size.
+    """
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    if not limit.isdigit() or int(limit) < 1 or int(limit) > MAX_PAGE_SIZE:
+        raise ValueError(f"Invalid limit value, you must provide a number between 1 and {MAX_PAGE_SIZE}")
+    return int(limit)
@@ -0,0 +1,186 @@
+"""
+This file contains the preamble shared by the routes of the blueprints: validate the JWT,
+resolve the user, the course and the app of the request in one joined query, and check
+that the user is allowed to reach them.
+
+The routes reading data which changes rarely can give the version of that data: their
+responses then carry an ETag, and a request whose If-None-Match matches it is answered
+with a 304 before the route runs.
+
+
+Functions:
+    requires(): This method will build the decorator running the preamble before a route.
+    check_context(): This method will run the checks of the preamble on a resolved context.
+
+
+Usage:
+    The decorated route receives the resolved database.context.RequestContext as the
+    `context` keyword argument. The error responses default to DEFAULT_ERRORS, a blueprint
+    can replace some of them to keep the responses its clients expect.
+    Example:
+        @apps_routes.route("/<app_id>", methods=["PUT"])
+        @requires(course=True, app=True, role="professor")
+        def edit_app(course_id, app_id, context):
+            ...
+"""
+from flask import g, make_response, request
+from functools import wraps
+import hashlib
+import time
+import database.connect as database
+from utils.jwt_utils import validate_token_in_request
+from utils.json_encoder import json_encoder
+from utils.api_response_wrapper import (
+    client_error_response,
+    server_error_response,
+)
+
+
+# The response of each failed check of the preamble, as
+# (response method, internal code, status code, message)
+DEFAULT_ERRORS = {
+    "user": (server_error_response, -1, 500, "User not found"),
+    "role": (client_error_response, -1, 403, "User does not have the correct role"),
+    "course": (client_error_response, -1, 404, "Course not found or user is not enrolled in the course"),
+    "app": (client_error_response, -1, 404, "App not found"),
+}
+
+
+def _error_response(errors: dict, check: str):
+    response_method, internal_code, status_code, message = errors[check]
+    return response_method(
+        data={},
+        internal_code=internal_code,
+        status_code=status_code,
+        message=message,
+    )
+
+
+def _entity_tag(email: str, version) -> str:
+    # The response of a route only depends on its URL, on the user and on the version
+    # of its data, and the encoder is part of the bytes sent
+    key = repr((
+        request.path,
+        sorted(request.args.items(multi=True)),
+        email,
+        json_encoder().name,
+        version,
+    ))
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def _context_error(context, user: bool, course: bool, app: bool, role: str, errors: dict):
+    # The error response of the first check the context fails, or None
+    if user and context.user is None:
+        return _error_response(errors, "user")
+    if role is not None and context.role != role:
+        return _error_response(errors, "role")
+    if course and not context.in_course:
+        return _error_response(errors, "course")
+    if app and (context.app is None or not context.app_visible):
+        return _error_response(errors, "app")
+    return None
+
+
+def check_context(context, user: bool = True, course: bool = False, app: bool = False, role: str = None,
+                  errors: dict = None):
+    """This method will run the checks of the preamble on the context given to a route.
+
+    The routes which validate their body before the user, the course and the app leave
+    the checks out of requires() and run them with this method once the body is valid.
+
+    Args:
+        context (RequestContext): The context resolved by the preamble.
+        user (bool): If the user of the JWT must be registered, defaults to True.
+        course (bool): If the user must belong to the course of the URL, defaults to False.
+        app (bool): If the app of the URL must exist and be visible to the user, defaults to False.
+        role (str): The role the user must have ('student' or 'professor'), defaults to None
+            to allow both.
+        errors (dict): The error responses replacing the ones of DEFAULT_ERRORS.
+
+    Returns:
+        Response: The error response of the first failed check, None if they all pass.
+    """
+    route_errors = dict(DEFAULT_ERRORS)
+    if errors is not None:
+        route_errors.update(errors)
+    return _context_error(context, user, course, app, role, route_errors)
+
+
+def requires(user: bool = True, course: bool = False, app: bool = False, role: str = None, errors: dict = None,
+             version=None):
+    """This method will build the decorator running the preamble before a route.
+
+    The course and the app in the URL of the route are always resolved, so the database
+    helpers called by the route can reuse them, but they are only checked when asked.
+
+    Args:
+        user (bool): If the user of the JWT must be registered, defaults to True.
+        course (bool): If the user must belong to the course of the URL, defaults to False.
+        app (bool): If the app of the URL must exist and be visible to the user, defaults to False.
+        role (str): The role the user must have ('student' or 'professor'), defaults to None
+            to allow both.
+        errors (dict): The error responses replacing the ones of DEFAULT_ERRORS.
+        version (function): The function returning the version of the data of the route,
+            given the session and the RequestContext, or None if it is unknown. Any value
+            which changes whenever the response would change can be used, such as the
+            rows of database.get_app_versions(). Defaults to None for no ETag.
+
+    Returns:
+        function: The decorator.
+    """
+    route_errors = dict(DEFAULT_ERRORS)
+    if errors is not None:
+        route_errors.update(errors)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            started_at = time.perf_counter()
+            jwt_result = validate_token_in_request(request)
+            jwt_duration = time.perf_counter() - started_at
+            if jwt_result["code"] != 0:
+                return client_error_response(
+                    data={},
+                    internal_code=jwt_result["code"],
+                    status_code=401,
+                    message=jwt_result["message"],
+                )
+            started_at = time.perf_counter()
+            context = database.resolve_request_context(
+                session=database.get_session(),
+                email=jwt_result["data"]["email"],
+                course_id=kwargs.get("course_id"),
+                app_id=kwargs.get("app_id"),
+            )
+            g.preamble_duration = time.perf_counter() - started_at
+            error = _context_error(context, user, course, app, role, route_errors)
+            if error is not None:
+                return error
+            etag = None
+            if version is not None:
+                data_version = version(database.get_session(), context)
+                if data_version is not None:
+                    etag = _entity_tag(context.email, data_version)
+            if etag is not None and request.if_none_match.contains_weak(etag):
+                # The client already has the response, skip the route
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, context=context, **kwargs))
+            if etag is not None and response.status_code in (200, 304):
+                response.set_etag(etag)
+                # The responses depend on the user, and must be revalidated
+                response.headers["Cache-Control"] = "private, no-cache"
+                response.vary.add("Authorization")
+            # Expose the cost of the preamble to the browser and the monitoring,
+            # and if the token and the membership were found in their caches
+            token_cache = "hit" if jwt_result.get("cached") else "miss"
+            membership_cache = "hit" if context.from_cache else "miss"
+            response.headers.add(
+                "Server-Timing",
+                f'preamble;dur={g.preamble_duration * 1000:.2f};desc="membership cache {membership_cache}", '
+                f'jwt;dur={jwt_duration * 1000:.2f};desc="cache {token_cache}"',
+            )
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,109 @@
+"""
+This file contains the serving of the static assets of the client (the build of
+the SPA in `client/`).
+
+The assets are served from their `.br` or `.gz` sibling when the client accepts
+the encoding and the sibling is up to date, the workers never compress them. The
+siblings are written by `scripts/precompress_assets.py` after each build of the
+client.
+
+The fingerprinted assets, whose name holds a hexadecimal hash of their content
+(such as `assets/index-4f3a9c2b.js`), never change under the same name: they are cached
+by the browsers for a year without revalidation. The other files, such as
+`index.html`, are revalidated on each use with their ETag.
+
+
+Functions:
+    is_fingerprinted(): This method will tell if the name of an asset holds a hash of its content.
+    send_static_asset(): This method will return the response serving an asset.
+    init_static_assets(): This method will serve the static folder of a Flask app with send_static_asset().
+"""
+from flask import Flask, Response, request, send_from_directory
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+import mimetypes
+import os
+import re
+
+
+# The precompressed siblings of an asset, the preferred encoding first
+PRECOMPRESSED_SUFFIXES = (("br", ".br"), ("gzip", ".gz"))
+# A hexadecimal hash of 8 or more characters before the extension, as the build
+# tools of the client name the assets, so the names only carrying a version or a
+# size (`roboto-v30-latin-regular.js`, `apple-touch-icon-180x180.png`) do not match
+FINGERPRINT_PATTERN = re.compile(r"[.-][0-9a-f]{8,}\.[A-Za-z0-9]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATED_CACHE_CONTROL = "no-cache"
+
+
+def is_fingerprinted(filename: str) -> bool:
+    """This method will tell if the name of an asset holds a hash of its content.
+
+    Args:
+        filename (str): The path of the asset.
+
+    Returns:
+        bool: True if the name of the asset is fingerprinted.
+    """
+    return FINGERPRINT_PATTERN.search(os.path.basename(filename)) is not None
+
+
+def _precompressed_encodings(path: str) -> dict:
+    # The siblings of the asset written after its last change, by encoding
+    modified_at = os.path.getmtime(path)
+    siblings = {}
+    for encoding, suffix in PRECOMPRESSED_SUFFIXES:
+        try:
+            if os.path.getmtime(path + suffix) >= modified_at:
+                siblings[encoding] = suffix
+        except OSError:
+            continue
+    return siblings
+
+
+def send_static_asset(directory: str, filename: str) -> Response:
+    """This method will return the response serving an asset, from its
+    precompressed sibling when the client accepts its encoding.
+
+    Args:
+        directory (str): The directory of the assets.
+        filename (str): The path of the asset in the directory.
+
+    Raises:
+        NotFound: If the asset does not exist.
+
+    Returns:
+        Response: The response serving the asset, answering the conditional
+            and range requests.
+    """
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    siblings = _precompressed_encodings(path)
+    encoding = request.accept_encodings.best_match(tuple(siblings)) if len(siblings) > 0 else None
+    if encoding is not None:
+        response = send_from_directory(directory, filename + siblings[encoding], mimetype=mimetype)
+        response.headers["Content-Encoding"] = encoding
+    else:
+        response = send_from_directory(directory, filename, mimetype=mimetype)
+    if len(siblings) > 0:
+        response.vary.add("Accept-Encoding")
+    if is_fingerprinted(filename):
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response.headers["Cache-Control"] = REVALIDATED_CACHE_CONTROL
+    return response
+
+
+def init_static_assets(app: Flask):
+    """This method will serve the static folder of a Flask app with
+    send_static_asset() instead of `send_static_file()`.
+
+    Args:
+        app (Flask): The Flask app, with a static folder.
+    """
+    def static(filename):
+        return send_static_asset(app.static_folder, filename)
+
+    app.view_functions["static"] = static
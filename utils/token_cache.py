@@ -0,0 +1,124 @@
+"""
+This file contains the cache of the verified JWT tokens, so a token presented
+again by a client is not verified (signature, claims) again on every request.
+
+The tokens are kept by their SHA-256 digest, never in clear, in a bounded LRU
+cache of each worker process. An entry expires at the `exp` of its token or after
+the maximum age of the cache, whichever comes first, and is only valid for the key
+ring which verified it: a reload of the keys (rotation, retired key) makes the
+tokens verified again.
+
+
+Classes:
+    VerifiedTokenCache: The bounded LRU cache of the verified tokens.
+
+
+Functions:
+    token_digest(): This method will compute the key of a token in the cache.
+"""
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+
+
+def token_digest(token: str) -> bytes:
+    """This method will compute the key of a token in the cache.
+
+    Args:
+        token (str): The JWT token.
+
+    Returns:
+        bytes: The SHA-256 digest of the token.
+    """
+    return hashlib.sha256(token.encode()).digest()
+
+
+class VerifiedTokenCache:
+    """The bounded LRU cache of the payloads of the verified tokens, by digest.
+
+    Args:
+        max_size (int): The maximum number of tokens kept, the least recently
+            used one is evicted beyond it. Zero disables the cache.
+        max_age (float): The maximum number of seconds a token is kept.
+    """
+
+    def __init__(self, max_size: int = 4096, max_age: float = 300):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # digest -> (payload, expires_at, key_ring)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: bytes, key_ring) -> dict:
+        """This method will return the payload of a verified token, or None if
+        the token is not in the cache, has expired, or was verified by another
+        key ring.
+
+        Args:
+            digest (bytes): The digest of the token.
+            key_ring (KeyRing): The current key ring.
+
+        Returns:
+            dict: The payload of the token, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                payload, expires_at, entry_key_ring = entry
+                if expires_at > time.time() and entry_key_ring is key_ring:
+                    self._entries.move_to_end(digest)
+                    self.hits += 1
+                    return payload
+                del self._entries[digest]
+            self.misses += 1
+            return None
+
+    def put(self, digest: bytes, payload: dict, key_ring):
+        """This method will keep the payload of a token verified by the key ring.
+
+        Args:
+            digest (bytes): The digest of the token.
+            payload (dict): The payload of the token.
+            key_ring (KeyRing): The key ring which verified the token.
+        """
+        if self.max_size <= 0:
+            return
+        expires_at = time.time() + self.max_age
+        if isinstance(payload.get("exp"), (int, float)):
+            expires_at = min(expires_at, payload["exp"])
+        with self._lock:
+            self._entries[digest] = (payload, expires_at, key_ring)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """This method will remove every token and reset the metrics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> dict:
+        """This method will return the metrics of the cache.
+
+        Returns:
+            dict: The number of hits, misses and evictions, the hit rate,
+                and the current and maximum sizes of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+            }